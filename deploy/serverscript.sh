@@ -33,6 +33,17 @@ pip3 install -r requirements.txt
 echo "make and run migrations"
 ./manage.py migrate --settings=djangoproject.settings.production
 
+# the caches shared by all processes are database tables
+./manage.py createcachetable --settings=djangoproject.settings.production
+
+### notification worker ###
+# notification jobs normally run in the web process when their request commits
+# cron runs processnotifications every minute to take any job that was left behind, see toptenlists/fanout.py
+# flock stops a slow run from overlapping the next one
+echo "install notification worker cron job"
+CRON_JOB="* * * * * cd $APP_DIR$PROJECT_DIR && . ./.env && flock -n /tmp/mytoptens-processnotifications.lock ${APP_DIR}venv36/bin/python ./manage.py processnotifications --once --settings=djangoproject.settings.production >> $HOME/processnotifications.log 2>&1"
+( crontab -l 2>/dev/null | grep -v "manage.py processnotifications" ; echo "$CRON_JOB" ) | crontab -
+
 echo "update node packages"
 ### update node packages ###
 cd $FRONTEND_DIR
@@ -66,6 +66,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'toptenlists.metrics.RequestMetricsMiddleware', # only used if TOPTENLISTS_METRICS is True
 ]
 
 ROOT_URLCONF = 'djangoproject.urls'
@@ -160,7 +161,7 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static/')
 # Django rest framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.CachedTokenAuthentication', # TokenAuthentication with the tokens cached, see users/authentication.py
         #'rest_framework.authentication.BasicAuthentication',
         #'rest_framework.authentication.SessionAuthentication',
     ],
@@ -196,6 +197,85 @@ AUTHENTICATION_BACKENDS = (
     "allauth.account.auth_backends.AuthenticationBackend",
 )
 
+# search backend for topTenLists, topTenItems and reusableItems, see toptenlists/search.py
+# None chooses MySQL full text search for MySQL, otherwise an in-memory inverted index
+TOPTENLISTS_SEARCH_BACKEND = None
+TOPTENLISTS_SEARCH_MAX_RESULTS = 300 # best matches the user may see returned by the in-memory index
+
+# seconds before each process reloads its type-ahead suggestions for reusableItems, see toptenlists/suggest.py
+TOPTENLISTS_SUGGEST_MAX_AGE = 300
+
+# serialized topTenLists for anonymous users are cached, see toptenlists/cache.py
+# local memory is per process, so production.py uses the database cache, which all processes share
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'toptenlists': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'toptenlists',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+}
+
+TOPTENLISTS_CACHE = 'toptenlists'
+
+# whether each user's email address is verified is cached here, see users/verified.py
+# confirming, saving or deleting an email address deletes its user's status; otherwise it expires after USERS_VERIFIED_EMAIL_TIMEOUT seconds
+USERS_CACHE = 'default'
+USERS_VERIFIED_EMAIL_TIMEOUT = 3600
+
+# authentication tokens and their users are cached in each process and in USERS_CACHE, see users/authentication.py
+# USERS_CACHE is only used for tokens if it is shared by all processes, as in production.py
+# a token deleted on logout, or whose user changes, is forgotten at once by this process and USERS_CACHE
+# but other processes may still accept it from memory for up to USERS_TOKEN_CACHE_LOCAL_TIMEOUT seconds
+USERS_TOKEN_CACHE_SIZE = 10000 # tokens kept in each process
+USERS_TOKEN_CACHE_LOCAL_TIMEOUT = 10
+USERS_TOKEN_CACHE_TIMEOUT = 300
+
+# seconds before a cached topTenList expires. Changes invalidate it immediately
+TOPTENLISTS_CACHE_TIMEOUT = 3600
+
+# notifications to the users of a reusableItem are created in the background, see toptenlists/fanout.py
+# each job is started in a thread when its request commits; the processnotifications command, run from cron, takes any job left behind
+TOPTENLISTS_NOTIFICATION_RUN_ON_COMMIT = True
+TOPTENLISTS_NOTIFICATION_STALE_WARNING = 900 # seconds a job may wait before notificationqueue and manage.py check --database warn
+TOPTENLISTS_NOTIFICATION_CHUNK_SIZE = 500 # users notified in each transaction
+TOPTENLISTS_NOTIFICATION_MAX_ATTEMPTS = 5 # a job is marked failed after this many attempts
+TOPTENLISTS_NOTIFICATION_RETRY_DELAY = 30 # seconds before the first retry, doubled for each further retry
+TOPTENLISTS_NOTIFICATION_LEASE = 600 # seconds before a job whose worker has stopped is taken by another worker
+
+# seconds before cached notification counts are counted again, see toptenlists/counters.py
+# the counts are only cached when the toptenlists cache is shared by all processes
+TOPTENLISTS_NOTIFICATION_COUNT_TIMEOUT = 300
+
+# new notifications can be pushed to users by a long poll and server-sent events, see toptenlists/stream.py
+# each waiting user holds a server thread, so this is off unless the server has many concurrent threads, see deploy/README.md
+# while it is off, the client polls every 10 seconds
+TOPTENLISTS_NOTIFICATION_PUSH = False
+# messages are kept in the toptenlists cache, which production.py shares between processes
+# 'toptenlists.pubsub.InMemoryPubSub' only reaches users connected to the process that created the notification
+TOPTENLISTS_PUBSUB_BACKEND = 'toptenlists.pubsub.CachePubSub'
+TOPTENLISTS_PUBSUB_INTERVAL = 0.5 # seconds between reads of the cache by each waiting client
+TOPTENLISTS_PUBSUB_MESSAGE_TIMEOUT = 300 # seconds a message is kept by CachePubSub for a client to collect
+TOPTENLISTS_NOTIFICATION_WAIT_MAX = 55 # longest long poll, in seconds
+TOPTENLISTS_NOTIFICATION_STREAM_MAX = 300 # seconds before a stream of server-sent events is closed and the browser reconnects
+TOPTENLISTS_NOTIFICATION_STREAM_KEEPALIVE = 15 # seconds between messages on an idle stream
+
+# reads of topTenLists, search results and notifications are serialized by compiled plans instead of DRF's fields, see toptenlists/compiled.py
+TOPTENLISTS_COMPILED_SERIALIZERS = True
+
+# a vote on a change request is retried this many times if the database reports a deadlock or lock, see toptenlists/voting.py
+TOPTENLISTS_VOTE_ATTEMPTS = 5
+
+# queries, SQL time, serializer time and response size of each API request, added up for each viewset action, see toptenlists/metrics.py
+# read them from content/metrics/ as staff, or run the requestmetrics command
+TOPTENLISTS_METRICS = False
+TOPTENLISTS_METRICS_PATHS = ('/api/v1/content/',) # requests whose path starts with one of these are measured
+TOPTENLISTS_METRICS_SLOW_REQUEST = None # milliseconds; slower requests are logged to 'toptenlists.metrics' with their SQL
+
 # required for custom user info to be returned
 REST_AUTH_SERIALIZERS = {
     'USER_DETAILS_SERIALIZER': 'users.serializers.UserSerializer',
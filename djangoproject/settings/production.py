@@ -11,3 +11,25 @@ REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'] = {
 }
 
 DEFAULT_FROM_EMAIL = 'My Top Tens <noreply@mytoptens.com>'
+
+# Passenger runs several processes, so they must share the caches; see toptenlists/cache.py and users/authentication.py
+# the tables are created by createcachetable in deploy/serverscript.sh
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'cache_default',
+    },
+    'toptenlists': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'cache_toptenlists',
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
+    },
+}
+
+# Passenger runs one request at a time in each process, so notifications are not pushed; see deploy/README.md before enabling this
+TOPTENLISTS_NOTIFICATION_PUSH = False
+
+# if push is enabled, each waiting client reads the database cache at this interval, see toptenlists/pubsub.py
+TOPTENLISTS_PUBSUB_INTERVAL = 2
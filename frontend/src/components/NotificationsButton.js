@@ -28,12 +28,10 @@ class NotificationsButton extends Component {
 	}
 
 	componentDidMount = () => {
-		// check notifications at regular intervals
+		// fetch the notifications, then check for new ones
+		// if the server pushes notifications, each request waits for a new one; otherwise check again at regular intervals
 		this.fetchNotifications();
-
-		this.queryServerInterval = setInterval(() => {
-			this.fetchNotifications();
-		}, 10000);
+		this.waitForNotifications();
 	}
 
 	componentDidUpdate = (prevProps) => {
@@ -48,7 +46,8 @@ class NotificationsButton extends Component {
 	}
 
 	componentWillUnmount = () => {
-		clearInterval(this.queryServerInterval);
+		this.unmounted = true;
+		clearTimeout(this.retryTimeout);
 	}
 
 	fetchNotifications = () => {
@@ -57,6 +56,30 @@ class NotificationsButton extends Component {
 		dispatch(notificationReducer.fetchNotifications());
 	}
 
+	waitForNotifications = (after) => {
+		const { dispatch } = this.props;
+
+		dispatch(notificationReducer.waitForNotifications(after)).then((response) => {
+			if (this.unmounted) {
+				return;
+			}
+
+			if (response && response.push) {
+				this.waitForNotifications(response.last);
+			} else if (response) {
+				this.retryTimeout = setTimeout(() => this.waitForNotifications(response.last), 10000);
+			} else {
+				// not logged in
+				this.retryTimeout = setTimeout(() => this.waitForNotifications(after), 10000);
+			}
+		}).catch(() => {
+			// e.g. the server is unavailable, so try again later
+			if (!this.unmounted) {
+				this.retryTimeout = setTimeout(() => this.waitForNotifications(after), 10000);
+			}
+		});
+	}
+
 	onClickButton = () => {
 		const { dispatch, notifications } = this.props;
 		const { showNotificationsList } = this.state;
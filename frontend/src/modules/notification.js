@@ -15,6 +15,7 @@ export const RECEIVE_NOTIFICATIONS = 'RECEIVE_NOTIFICATIONS';
 export const FETCH_NOTIFICATIONS_STARTED = 'FETCH_NOTIFICATIONS_STARTED';
 export const FETCH_NOTIFICATIONS_FAILED = 'FETCH_NOTIFICATIONS_FAILED';
 export const UPDATE_NOTIFICATION_SUCCEEDED = 'UPDATE_NOTIFICATION_SUCCEEDED';
+export const UPDATE_NOTIFICATIONS_SUCCEEDED = 'UPDATE_NOTIFICATIONS_SUCCEEDED';
 export const DELETE_NOTIFICATION_SUCCEEDED = 'DELETE_NOTIFICATION_SUCCEEDED';
 export const DELETE_MY_NOTIFICATIONS_SUCCEEDED = 'DELETE_MY_NOTIFICATIONS_SUCCEEDED';
 
@@ -90,6 +91,57 @@ export function fetchNotifications() {
 	};
 }
 
+// count the unread and new notifications in the store
+function countNotifications(things) {
+	const counts = { 'unread': 0, 'new': 0 };
+
+	Object.keys(things).forEach((id) => {
+		['unread', 'new'].forEach((propertyName) => {
+			if (things[id][propertyName]) {
+				counts[propertyName] += 1;
+			}
+		});
+	});
+
+	return counts;
+}
+
+// wait for new notifications
+// the server replies when there is a new notification, or after the timeout
+// if the server does not push notifications, 'push' is false in the reply, which comes at once
+// 'last' from the reply is sent back as 'after' so that no notification is missed between requests
+// a notification may still not be sent, e.g. if it was created by another server process, so if the counts in the reply
+// do not match the store, the notifications are fetched again
+export function waitForNotifications(after) {
+	return (dispatch, getState) => {
+		if (!getState().auth.user.token) {
+			return Promise.resolve();
+		}
+
+		const params = typeof after === 'undefined' ? '' : `&after=${after}`;
+
+		return fetchAPI({
+			'url': `/api/v1/content/notification/wait/?timeout=25${params}`,
+			'method': 'GET',
+			'useAuth': true,
+		}).then((response) => {
+			if (response.notifications.length > 0) {
+				dispatch(receiveNotifications({
+					'entities': normalize(response.notifications, [notificationSchema]).entities,
+				}));
+			}
+
+			const counts = countNotifications(getState().notification.things);
+
+			if (response.missed || counts.unread !== response.counts.unread || counts.new !== response.counts.new) {
+				dispatch(fetchNotifications());
+			}
+
+			return response;
+		});
+	};
+}
+
 // ////////////////////////////////
 // update Notifications
 // only 'new' and 'unread' are editable via the api
@@ -121,9 +173,35 @@ export const updateNotification = (notificationId, propertyName, value) => (disp
 };
 
 // bulk set an array of notifications to the same value of 'New'
-export const setNew = (idArray, value) => (dispatch) =>  {
-	idArray.forEach((obj) => {
-		dispatch(updateNotification(obj.id, 'new', value));
+export function updateNotificationsSucceeded(ids, response) {
+	return {
+		'type': UPDATE_NOTIFICATIONS_SUCCEEDED,
+		'payload': {
+			ids,
+			'new': response.new,
+			'unread': response.unread,
+		},
+	};
+}
+
+export const setNew = (idArray, value) => (dispatch, getState) =>  {
+	if (!getState().auth.user.token) {
+		return;
+	}
+
+	const ids = idArray.map(obj => obj.id);
+
+	// one request updates all the notifications
+	return fetchAPI({
+		'url': '/api/v1/content/notification/bulkupdate/',
+		'headers': { 'Content-Type': 'application/json' },
+		'data': JSON.stringify({ ids, 'new': value }),
+		'method': 'PATCH',
+		'useAuth': true,
+	}).then((response) => {
+		return dispatch(updateNotificationsSucceeded(ids, response));
+	}).catch((error) => {
+		return dispatch(getErrors({ 'update notifications': error.message }));
 	});
 };
 
@@ -253,6 +331,27 @@ export default function notification(state = initialNotificationsState, action)
 			return updeep({ 'things': { [action.payload.id]: update } }, state);
 		}
 
+		case UPDATE_NOTIFICATIONS_SUCCEEDED: {
+			const { ids } = action.payload;
+			const update = {};
+
+			['new', 'unread'].forEach((propertyName) => {
+				if (typeof action.payload[propertyName] !== 'undefined') {
+					update[propertyName] = action.payload[propertyName];
+				}
+			});
+
+			const things = {};
+
+			ids.forEach((id) => {
+				if (state.things[id]) {
+					things[id] = update;
+				}
+			});
+
+			return updeep({ things }, state);
+		}
+
 		case DELETE_NOTIFICATION_SUCCEEDED: {
 			return updeep({ 'things': updeep.omit([action.payload.id]) }, state);
 		}
@@ -16,3 +16,11 @@ admin.site.register(ReusableItem)
 from . models import Notification
 
 admin.site.register(Notification)
+
+
+from . models import ReusableItemUser
+
+admin.site.register(ReusableItemUser)
+from . models import NotificationJob
+
+admin.site.register(NotificationJob)
@@ -1,17 +1,34 @@
+import uuid
+
 from rest_framework import viewsets, permissions
 from rest_framework.decorators import detail_route, list_route
 from rest_framework import status
 from rest_framework.response import Response
-from rest_framework import filters
 from rest_framework.exceptions import APIException
-from allauth.account.models import EmailAddress 
-
-from .models import TopTenList, TopTenItem, ReusableItem, Notification
-from .serializers import TopTenListSerializer, TopTenItemSerializer, ReusableItemSerializer, NotificationSerializer
+from rest_framework.views import APIView
+from users.verified import is_email_verified
+
+from .models import TopTenList, TopTenItem, ReusableItem, ReusableItemHistory, Notification
+from .serializers import TopTenListSerializer, TopTenItemSerializer, ReusableItemSerializer, ReusableItemHistorySerializer, NotificationSerializer
+from .search import FullTextSearchFilter, get_search_backend
+from .cache import TopTenListCacheMixin, cache_stats, invalidate_topTenLists
+from .tree import get_tree_ids
+from .reorder import ReorderError, move_topTenItem_up, reorder_topTenItems
+from .transfer import export_topTenLists, import_topTenLists
+from .parsers import NDJSONParser
+from .prefetch import get_topTenList_prefetch_lookups, get_topTenItem_prefetch_lookups, get_notification_prefetch_lookups
+from .suggest import suggest_index
+from .counters import get_notification_counts, adjust_notification_counts, forget_notification_counts
+from .stream import get_after, get_wait_timeout, is_push_enabled, wait_for_notifications, notification_events
+from .history import HistoryPagination
 from django.db.models import Q
+from django.http import StreamingHttpResponse
 
 from rest_flex_fields import FlexFieldsModelViewSet
-from rest_framework.pagination import LimitOffsetPagination
+from .pagination import KeysetOrLimitOffsetPagination
+from .profiles import ProfileListMixin
+from .compiled import CompiledSerializerMixin
+from .metrics import MetricsMixin, registry as metrics_registry
 
 # search against multiple models
 from drf_multiple_model.viewsets import FlatMultipleModelAPIViewSet
@@ -48,26 +65,25 @@ class HasVerifiedEmail(permissions.BasePermission):
         if not request.user.is_authenticated:
             return False
 
-        try:
-            email_address = EmailAddress.objects.get(user_id=request.user.id)
-            return email_address.verified
-
-        except:
-            return False
+        # cached for this and later requests, see users/verified.py
+        return bool(is_email_verified(request.user, request))
 
 
-class TopTenListViewSet(FlexFieldsModelViewSet):
+class TopTenListViewSet(MetricsMixin, ProfileListMixin, TopTenListCacheMixin, CompiledSerializerMixin, FlexFieldsModelViewSet):
     """
     ViewSet for topTenLists.
+    Anonymous reads are served from the cache, see cache.py
+    Other reads are serialized by compiled plans, see compiled.py
+    A list may ask for fewer fields with profile=summary or profile=card, see profiles.py
     """
     permission_classes = [IsOwnerOrReadOnly, HasVerifiedEmail]
     model = TopTenList
     serializer_class = TopTenListSerializer
     permit_list_expands = ['topTenItem']
-    pagination_class = LimitOffsetPagination
+    pagination_class = KeysetOrLimitOffsetPagination
 
     search_fields = ['created_by_username']
-    filter_backends = (filters.SearchFilter,)
+    filter_backends = (FullTextSearchFilter,)
 
     def get_queryset(self):
         # unauthenticated user can only view public topTenLists
@@ -102,25 +118,33 @@ class TopTenListViewSet(FlexFieldsModelViewSet):
         if created_by is not None:
             queryset = queryset.filter(created_by=created_by)
 
-        # filter on username constains string
+        # filter on username contains words starting with string, using the full text index instead of scanning with LIKE
         created_by_username = self.request.query_params.get('created_by_username', None)
 
         if created_by_username is not None:
-            queryset = queryset.filter(created_by_username__icontains=created_by_username)
+            queryset = get_search_backend().filter(queryset, ['created_by_username'], created_by_username)
 
-        # filter on name contains string
+        # filter on name contains words starting with string
         name = self.request.query_params.get('name', None)
 
         if name is not None:
-            queryset = queryset.filter(name__icontains=name)
+            queryset = get_search_backend().filter(queryset, ['name'], name)
 
         # return only topTenLists that have no parent topTenItem
         #toplevel = self.request.query_params.get('toplevel')
         #if toplevel is not None:
             #queryset = queryset.filter(parent_topTenItem=None)
 
+        # votes are only annotated for reads, because an update changes them after the queryset is evaluated
+        # cached reads only prefetch for the topTenLists that are not in the cache
+        if self.request.method in permissions.SAFE_METHODS and not self.use_cache():
+            queryset = queryset.prefetch_related(*self.get_prefetch_lookups())
+
         return queryset.order_by('name')
 
+    def get_prefetch_lookups(self):
+        return get_topTenList_prefetch_lookups(self)
+
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
 
@@ -150,64 +174,115 @@ class TopTenListViewSet(FlexFieldsModelViewSet):
 
             # set any TopTenLists with this parent_topTenItem to null parent_topTenItem
             # an topTenItem can only have one child topTenList
-            TopTenList.objects.filter(parent_topTenItem_id=parent_topTenItem_id).update(parent_topTenItem_id=None)
+            child_topTenLists = TopTenList.objects.filter(parent_topTenItem_id=parent_topTenItem_id)
+            invalidate_topTenLists(child_topTenLists.values_list('id', flat=True))
+            child_topTenLists.update(parent_topTenItem_id=None)
  
         serializer.save()
 
-class TopTenListDetailViewSet(viewsets.ModelViewSet):
+    @detail_route(methods=['patch'])
+    def reorder(self, request, pk=None):
+        """
+        Set the order of every topTenItem in the topTenList
+        topTenItem_ids lists the topTenList's topTenItems in their new order
+        """
+        topTenList = self.get_object()
+        topTenItem_ids = request.data.get('topTenItem_ids', None)
+
+        if not isinstance(topTenItem_ids, list):
+            return Response({'message': 'topTenItem_ids must be a list'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            changed = reorder_topTenItems(topTenList.id, [uuid.UUID(str(topTenItem_id)) for topTenItem_id in topTenItem_ids])
+
+        except ValueError as error: # ReorderError, or an id that is not a uuid
+            return Response({'message': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response([{'id': topTenItem_id, 'order': order} for topTenItem_id, order in changed.items()], status=status.HTTP_200_OK)
+
+    @list_route(methods=['get'])
+    def export(self, request):
+        """
+        Stream the topTenLists as NDJSON, see transfer.py
+        The same topTenLists are returned as by list, so e.g. listset=my-topTenLists exports the user's own topTenLists
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+
+        return StreamingHttpResponse(export_topTenLists(queryset), content_type='application/x-ndjson')
+
+    @list_route(methods=['post'], url_path='import', parser_classes=[NDJSONParser])
+    def import_topTenLists(self, request):
+        """
+        Create topTenLists for the user from an NDJSON body, see transfer.py
+        """
+        if not request.user.is_authenticated:
+            return Response(status=status.HTTP_401_UNAUTHORIZED)
+
+        result = import_topTenLists(request.data, request.user)
+
+        return Response(result, status=status.HTTP_201_CREATED if result['topTenLists'] > 0 else status.HTTP_400_BAD_REQUEST)
+
+class TopTenListDetailViewSet(MetricsMixin, TopTenListCacheMixin, CompiledSerializerMixin, viewsets.ModelViewSet):
     """
     Find a topTenList by id with full details
     Return the topTenList itself and associated child / parent topTenLists for navigation
+    URL parameter depth returns ancestors and descendants up to that many levels away, default 1
+    Anonymous reads are served from the cache, see cache.py
+    Other reads are serialized by compiled plans, see compiled.py
     """
     permission_classes = [IsOwnerOrReadOnly, HasVerifiedEmail]
     model = TopTenList
     serializer_class = TopTenListSerializer
+    default_depth = 1
+    max_depth = 10
 
-    def get_queryset(self):
-        my_topTenList = TopTenList.objects.filter(id=self.request.query_params.get('id', None)).first()
-
-        if my_topTenList is None:
-            return
-
-        # create an array containing the id of every topTenList to return
-        # we always want the topTenList itself
-        pk_topTenList = [my_topTenList.id]
-
-        # then we want the parent topTenList, if any
+    def get_depth(self):
         try:
-            parent_topTenItem = TopTenItem.objects.filter(id=my_topTenList.parent_topTenItem.id).first()
-            pk_topTenList.append(parent_topTenItem.topTenList.id)
-
-        except AttributeError:
-            pass # no parent topTenList is OK
+            return max(min(int(self.request.query_params.get('depth', self.default_depth)), self.max_depth), 0)
 
-        # and child topTenLists, if any
-        topTenItem_ids = [o.id for o in my_topTenList.topTenItem.all()]
+        except ValueError:
+            return self.default_depth
 
+    def get_queryset(self):
         try:
-            child_topTenLists = TopTenList.objects.filter(parent_topTenItem__in=topTenItem_ids)
+            topTenList_id = uuid.UUID(self.request.query_params.get('id', None))
 
-        except AttributeError:
-            pass
+        except (TypeError, ValueError):
+            return TopTenList.objects.none()
 
-        try:
-            child_topTenList_ids = [o.id for o in child_topTenLists]
-            pk_topTenList += child_topTenList_ids
+        depth = self.get_depth()
 
-        except AttributeError:
-            pass # we don't mind no child topTenLists
+        if depth == 1:
+            # the topTenList itself, the topTenList containing its parent topTenItem, and the topTenLists whose parent topTenItem is in it
+            queryset = TopTenList.objects.filter(
+                Q(id=topTenList_id) |
+                Q(topTenItem__parent_topTenItem=topTenList_id) |
+                Q(parent_topTenItem__topTenList=topTenList_id)
+            ).distinct()
+
+        else:
+            queryset = TopTenList.objects.filter(pk__in=get_tree_ids(topTenList_id, depth))
 
         # can view public topTenLists and topTenLists the user created
         if self.request.user.is_authenticated:
-            return TopTenList.objects.filter(pk__in=pk_topTenList).filter(
+            queryset = queryset.filter(
                 Q(created_by=self.request.user) | 
                 Q(is_public=True)
             )
 
-        return TopTenList.objects.filter(pk__in=pk_topTenList).filter(is_public=True)
+        else:
+            queryset = queryset.filter(is_public=True)
+
+        if self.request.method in permissions.SAFE_METHODS and not self.use_cache():
+            queryset = queryset.prefetch_related(*self.get_prefetch_lookups())
+
+        return queryset
 
+    def get_prefetch_lookups(self):
+        return get_topTenList_prefetch_lookups(self)
 
-class TopTenItemViewSet(viewsets.ModelViewSet):
+
+class TopTenItemViewSet(MetricsMixin, ProfileListMixin, viewsets.ModelViewSet):
     """
     Although topTenItems are retrieved as part of a topTenList request, they are edited through this viewset
     """
@@ -216,37 +291,32 @@ class TopTenItemViewSet(viewsets.ModelViewSet):
     serializer_class = TopTenItemSerializer
 
     def get_queryset(self):
+        queryset = TopTenItem.objects.all()
+
+        if self.request.method in permissions.SAFE_METHODS:
+            queryset = queryset.select_related('topTenList').prefetch_related(*get_topTenItem_prefetch_lookups(self))
+
         # can view topTenItems belonging to public topTenLists and topTenLists the user created
         if self.request.user.is_authenticated:
-            return TopTenItem.objects.filter(
+            return queryset.filter(
                 Q(topTenList__created_by=self.request.user) | 
                 Q(topTenList__is_public=True)
             )
 
-        return TopTenItem.objects.filter(topTenList__is_public=True)
+        return queryset.filter(topTenList__is_public=True)
 
     @detail_route(methods=['patch'])
     def moveup(self, request, pk=None):
 
         if self.request.user.is_authenticated:
-            # find the topTenItem to move up
-            topTenItem = TopTenItem.objects.get(pk=pk)       
-            topTenItem_order = topTenItem.order
-            parent_topTenList = topTenItem.topTenList_id # note 'topTenList_id' not 'topTenList'
-
-            if topTenItem.order == 1:
-                return Response({'message': 'TopTenItem is already at top of TopTenList'}, status=status.HTTP_403_FORBIDDEN)
+            # find the topTenItem to move up. get_object checks that the user owns it
+            topTenItem = self.get_object()
 
-            # change the topTenItem order up one
-            topTenItem.order = topTenItem.order - 1
+            try:
+                move_topTenItem_up(topTenItem)
 
-            # find the existing topTenItem above
-            topTenItem_above = TopTenItem.objects.get(topTenList=parent_topTenList, order=topTenItem_order-1)
-            # and change its order down one
-            topTenItem_above.order = topTenItem_order
-
-            topTenItem.save()
-            topTenItem_above.save()
+            except ReorderError as error:
+                return Response({'message': str(error)}, status=status.HTTP_403_FORBIDDEN)
 
             # return the new topTenItems so the UI can update
             # update: this doesn't provide context, so request doesn't exist in the serializer and it can't get the user's vote on a referenced reusable item.
@@ -281,7 +351,6 @@ class TopTenItemViewSet(viewsets.ModelViewSet):
                 #print(current_reusable_item.name)
 
                 ReusableItemSerializer.remove_my_votes(current_reusable_item, self.request.user)
-                ReusableItemSerializer.count_votes(current_reusable_item)
  
 
     def perform_create(self, serializer):
@@ -301,7 +370,7 @@ class LimitPagination(MultipleModelLimitOffsetPagination):
     """
     default_limit = 10
 
-class SearchListsItemsView(FlatMultipleModelAPIViewSet): # pylint: disable=too-many-ancestors
+class SearchListsItemsView(CompiledSerializerMixin, FlatMultipleModelAPIViewSet): # pylint: disable=too-many-ancestors
     """
     Search for topTenLists and topTenItems by name
     By default returns all topTenLists the user can view and their items
@@ -310,13 +379,14 @@ class SearchListsItemsView(FlatMultipleModelAPIViewSet): # pylint: disable=too-m
     If both are false you'll get no results
     """
     pagination_class = LimitPagination
-    filter_backends = (filters.SearchFilter,)
+    filter_backends = (FullTextSearchFilter,)
     search_fields = ('name',)
     sorting_fields = ['name']
 
     def get_querylist(self):
-        topTenList_query_set = {'queryset': TopTenList.objects.all(), 'serializer_class': TopTenListSerializer}
-        topTenItem_query_set = {'queryset': TopTenItem.objects.all().exclude(name=''), 'serializer_class': TopTenItemSerializer}
+        # the results are serialized by compiled plans, see compiled.py
+        topTenList_query_set = {'queryset': TopTenList.objects.all(), 'serializer_class': self.get_compiled_serializer_class(TopTenListSerializer)}
+        topTenItem_query_set = {'queryset': TopTenItem.objects.all().exclude(name=''), 'serializer_class': self.get_compiled_serializer_class(TopTenItemSerializer)}
 
         # only show topTenItems that do not have an associated reusableItem
         if self.request.query_params.get('excludereusableitems', None) == 'true':
@@ -341,6 +411,10 @@ class SearchListsItemsView(FlatMultipleModelAPIViewSet): # pylint: disable=too-m
             topTenList_query_set['queryset'] = topTenList_query_set['queryset'].filter(is_public=True)
             topTenItem_query_set['queryset'] = topTenItem_query_set['queryset'].filter(topTenList__is_public=True)
 
+        # fetch what the serializers need for the topTenLists and topTenItems on this page
+        topTenList_query_set['queryset'] = topTenList_query_set['queryset'].prefetch_related(*get_topTenList_prefetch_lookups(self))
+        topTenItem_query_set['queryset'] = topTenItem_query_set['queryset'].select_related('topTenList').prefetch_related(*get_topTenItem_prefetch_lookups(self))
+
         querylist = []
 
         if self.request.query_params.get('includetoptenlists', None) != 'false':
@@ -356,7 +430,7 @@ class SearchListsItemsView(FlatMultipleModelAPIViewSet): # pylint: disable=too-m
 
         return querylist
 
-class ReusableItemViewSet(FlexFieldsModelViewSet):
+class ReusableItemViewSet(MetricsMixin, ProfileListMixin, FlexFieldsModelViewSet):
     """
     ViewSet for reusableItems.
     User can see public reusableItems and reusableItems that they created
@@ -383,6 +457,9 @@ class ReusableItemViewSet(FlexFieldsModelViewSet):
 
             queryset = queryset.filter(id=reusableItemId)
 
+        if self.request.method in permissions.SAFE_METHODS:
+            queryset = queryset.with_votes(self.request.user)
+
         if self.request.user.is_authenticated:
             return queryset.filter(
                 Q(created_by=self.request.user) | 
@@ -392,6 +469,18 @@ class ReusableItemViewSet(FlexFieldsModelViewSet):
         else:
             return queryset.filter(is_public=True)
 
+    @detail_route(methods=['get'])
+    def history(self, request, pk=None):
+        """
+        The reusableItem's history, one page at a time, see history.py
+        """
+        reusableItem = self.get_object()
+
+        paginator = HistoryPagination()
+        page = paginator.paginate_queryset(ReusableItemHistory.objects.filter(reusableItem=reusableItem).order_by('order'), request, view=self)
+
+        return paginator.get_paginated_response(ReusableItemHistorySerializer(page, many=True).data)
+
     def perform_create(self, serializer):
         # do not allow a reusableItem to be created by the API
         # reusableItems are created from topTenItems
@@ -407,7 +496,7 @@ class SearchReusableItemsView(FlatMultipleModelAPIViewSet): # pylint: disable=to
     Search for ReusableItems by name
     """
     pagination_class = LimitPagination
-    filter_backends = (filters.SearchFilter,)
+    filter_backends = (FullTextSearchFilter,)
     search_fields = ('name',)
 
     def get_querylist(self):
@@ -434,7 +523,74 @@ class SearchReusableItemsView(FlatMultipleModelAPIViewSet): # pylint: disable=to
 
         return querylist
 
-class NotificationViewSet(viewsets.ModelViewSet):
+class SuggestReusableItemsView(viewsets.ViewSet):
+    """
+    Type-ahead suggestions for public ReusableItems whose name has a word starting with the search parameter
+    Only id, name and definition are returned, from the in-memory index in suggest.py
+    """
+    default_limit = 10
+    max_limit = 50
+
+    def list(self, request):
+        search = request.query_params.get('search', '')
+
+        try:
+            limit = min(int(request.query_params.get('limit', self.default_limit)), self.max_limit)
+
+        except ValueError:
+            limit = self.default_limit
+
+        return Response(suggest_index.suggest(search, limit))
+
+class TopTenListCacheStatsView(APIView):
+    """
+    Hits and misses for the topTenList cache in this process
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(cache_stats.as_dict())
+
+    def delete(self, request):
+        cache_stats.reset()
+
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+class RequestMetricsView(APIView):
+    """
+    Queries and timings for each viewset action in this process, see metrics.py
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(metrics_registry.as_dict())
+
+    def delete(self, request):
+        metrics_registry.reset()
+
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+class NotificationStreamView(APIView):
+    """
+    Server-sent events for the user's new notifications, see stream.py
+    """
+    def get(self, request):
+        if not request.user.is_authenticated:
+            return Response(status=status.HTTP_401_UNAUTHORIZED)
+
+        # each stream holds a server thread, see stream.py
+        if not is_push_enabled():
+            return Response(status=status.HTTP_404_NOT_FOUND)
+
+        after = get_after(request.META.get('HTTP_LAST_EVENT_ID', request.query_params.get('after')))
+
+        response = StreamingHttpResponse(notification_events(request, after), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no' # stop nginx holding back the events
+
+        return response
+
+class NotificationViewSet(MetricsMixin, CompiledSerializerMixin, viewsets.ModelViewSet):
     """
     Although Notifications are retrieved as part of a user request, they are edited through this viewset
     """
@@ -446,7 +602,12 @@ class NotificationViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         # can only view own notifications
         if self.request.user.is_authenticated:
-            return Notification.objects.filter(created_by=self.request.user)
+            queryset = Notification.objects.filter(created_by=self.request.user)
+
+            if self.request.method in permissions.SAFE_METHODS:
+                queryset = queryset.select_related('topTenItem__topTenList').prefetch_related(*get_notification_prefetch_lookups(self))
+
+            return queryset
 
         return None
 
@@ -455,6 +616,84 @@ class NotificationViewSet(viewsets.ModelViewSet):
         # notifications are created by the server
         raise APIException("Notification may not be created via API")
 
+    def perform_update(self, serializer):
+        # keep the user's notification counts in step, see counters.py
+        before = {field: getattr(serializer.instance, field) for field in ('unread', 'new')}
+
+        notification = serializer.save()
+
+        adjust_notification_counts(notification.created_by_id, **{field: int(getattr(notification, field)) - int(value) for field, value in before.items()})
+
+    def perform_destroy(self, instance):
+        instance.delete()
+
+        adjust_notification_counts(instance.created_by_id, unread=-int(instance.unread), new=-int(instance.new))
+
+    @list_route(methods=['get'])
+    def counts(self, request):
+        """
+        The number of unread and new notifications belonging to this user
+        These are cached, see counters.py, so polling this does not read the notifications
+        """
+        if not self.request.user.is_authenticated:
+            return Response(status=status.HTTP_401_UNAUTHORIZED)
+
+        return Response(get_notification_counts(request.user.id), status=status.HTTP_200_OK)
+
+    @list_route(methods=['get'])
+    def wait(self, request):
+        """
+        Long poll for new notifications, see stream.py
+        after is the 'last' value from the previous response; timeout is in seconds
+        """
+        if not self.request.user.is_authenticated:
+            return Response(status=status.HTTP_401_UNAUTHORIZED)
+
+        data = wait_for_notifications(request, get_after(request.query_params.get('after')), get_wait_timeout(request.query_params.get('timeout')))
+
+        return Response(data, status=status.HTTP_200_OK)
+
+    @list_route(methods=['patch'])
+    def bulkupdate(self, request):
+        """
+        Set 'new' and / or 'unread' on many of this user's notifications with one UPDATE for each
+        ids lists the notifications to update; if it is not given, all the user's notifications are updated
+        """
+        if not self.request.user.is_authenticated:
+            return Response(status=status.HTTP_401_UNAUTHORIZED)
+
+        values = {}
+
+        for field in ('new', 'unread'):
+            if field in request.data:
+                if not isinstance(request.data[field], bool):
+                    return Response({'message': '%s must be true or false' % field}, status=status.HTTP_400_BAD_REQUEST)
+
+                values[field] = request.data[field]
+
+        if len(values) == 0:
+            return Response({'message': 'new or unread must be given'}, status=status.HTTP_400_BAD_REQUEST)
+
+        myNotifications = Notification.objects.filter(created_by=request.user)
+        ids = request.data.get('ids', None)
+
+        if ids is not None:
+            try:
+                myNotifications = myNotifications.filter(id__in=[uuid.UUID(str(notification_id)) for notification_id in ids])
+
+            except (TypeError, ValueError):
+                return Response({'message': 'ids must be a list of notification ids'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # each flag is updated only where it changes, so the number changed can be taken from the user's counts
+        updated = {}
+
+        for field, value in values.items():
+            updated[field] = myNotifications.filter(**{field: not value}).update(**{field: value})
+
+        adjust_notification_counts(request.user.id, **{field: count if values[field] else -count for field, count in updated.items()})
+
+        return Response(dict(values, updated=updated), status=status.HTTP_200_OK)
+
     @list_route(methods=['delete'])
     def deleteall(self, request):
         """
@@ -465,14 +704,13 @@ class NotificationViewSet(viewsets.ModelViewSet):
             # find the user's notifications
             myNotifications = Notification.objects.filter(created_by=request.user)
 
-            data = []
-
-            for notification in myNotifications:
-                data.append(notification.id)
+            # only the ids are read. Nothing refers to a notification, so delete() does not fetch the rows
+            data = list(myNotifications.values_list('id', flat=True))
 
-            myNotifications.delete()
+            # only the notifications returned are deleted, so one created since, e.g. by fanout.py, is kept for the user to see
+            myNotifications.filter(id__in=data).delete()
+            forget_notification_counts(request.user.id)
 
             return Response(data, status=status.HTTP_200_OK)
 
         return Response(status=status.HTTP_401_UNAUTHORIZED)
-
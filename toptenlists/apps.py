@@ -5,4 +5,8 @@ class TopTenListsConfig(AppConfig):
 
 	def ready(self):
 		from . import signals
+		from . import fanout # registers the notification queue check
+		from .compiled import compile_serializers
+
+		compile_serializers()
 		
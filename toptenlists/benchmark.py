@@ -0,0 +1,185 @@
+"""
+A load test of the toptenlists API, run in this process
+
+Each scenario makes requests through the Django test client, as one of the synthetic users from synthetic.py
+or anonymously, and records the time taken and the number of queries of each request.
+The results give the 50th and 99th percentiles of both, and can be saved as JSON and compared with an earlier run.
+
+Throttling is turned off while the benchmark runs, and the test client's host is allowed. Nothing is sent over the network.
+"""
+
+import math
+import platform
+import random
+import time
+from contextlib import contextmanager
+
+import django
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .api import TopTenListViewSet, TopTenListDetailViewSet, ReusableItemViewSet, SearchListsItemsView, NotificationViewSet
+from .models import ReusableItem
+from .synthetic import WORDS
+
+THROTTLED_VIEWS = (TopTenListViewSet, TopTenListDetailViewSet, ReusableItemViewSet, SearchListsItemsView, NotificationViewSet)
+
+@contextmanager
+def unthrottled():
+    throttle_classes = [view.throttle_classes for view in THROTTLED_VIEWS]
+
+    for view in THROTTLED_VIEWS:
+        view.throttle_classes = ()
+
+    try:
+        yield
+
+    finally:
+        for view, classes in zip(THROTTLED_VIEWS, throttle_classes):
+            view.throttle_classes = classes
+
+def get_percentile(samples, percentile):
+    """
+    The nearest-rank percentile of the samples
+    """
+    if len(samples) == 0:
+        return None
+
+    ordered = sorted(samples)
+    rank = max(math.ceil(percentile * len(ordered) / 100), 1)
+
+    return ordered[rank - 1]
+
+
+class Benchmark(object):
+    """
+    Scenarios are methods named after them, which return (user, method, path, data) for the next request,
+    or None when there are no more requests to make
+    """
+    scenarios = ('toptenlist_list', 'toptenlist_list_anonymous', 'toptenlist_detail', 'reusableitem_detail', 'search', 'notification_list', 'vote')
+
+    def __init__(self, data, seed=1):
+        self.data = data
+        self.random = random.Random(seed)
+        self.users = {user.id: user for user in data.users}
+        self.votes = None
+
+    def toptenlist_list(self):
+        return self.random.choice(self.data.users), 'get', reverse('topTenLists:TopTenLists-list'), {'limit': 20}
+
+    def toptenlist_list_anonymous(self):
+        return None, 'get', reverse('topTenLists:TopTenLists-list'), {'limit': 20}
+
+    def toptenlist_detail(self):
+        return self.random.choice(self.data.users), 'get', reverse('topTenLists:TopTenListDetail-list'), {'id': self.random.choice(self.data.topTenLists).id}
+
+    def reusableitem_detail(self):
+        reusableItem = self.random.choice(self.data.reusableItems)
+
+        return self.random.choice(self.data.users), 'get', reverse('topTenLists:ReusableItems-detail', kwargs={'pk': reusableItem.id}), {}
+
+    def search(self):
+        return self.random.choice(self.data.users), 'get', reverse('topTenLists:searchlistsitems-list'), {'search': self.random.choice(WORDS), 'limit': 20}
+
+    def notification_list(self):
+        return self.random.choice(self.data.users), 'get', reverse('topTenLists:Notifications-list'), {}
+
+    def vote(self):
+        """
+        A user of a reusableItem votes on its open change request
+        Each user votes once on each change request; change requests resolved by earlier votes are skipped
+        """
+        if self.votes is None:
+            self.votes = [(reusableItem.id, user_id) for reusableItem in self.data.change_requests for user_id in self.data.reusableItem_users[reusableItem.id][1:]]
+            self.random.shuffle(self.votes)
+
+        while len(self.votes) > 0:
+            reusableItem_id, user_id = self.votes.pop()
+
+            if ReusableItem.objects.filter(pk=reusableItem_id, change_request__isnull=False).exists():
+                return self.users[user_id], 'patch', reverse('topTenLists:ReusableItems-detail', kwargs={'pk': reusableItem_id}), {'vote': self.random.choice(('yes', 'no'))}
+
+        return None
+
+    def request(self, client, user, method, path, data):
+        client.force_authenticate(user=user)
+
+        if method == 'get':
+            return client.get(path, data)
+
+        return getattr(client, method)(path, data, format='json')
+
+    def run_scenario(self, name, requests, warmup=1):
+        """
+        Return the timings and query counts of requests requests, after warmup requests that are not counted
+        """
+        client = APIClient()
+        timings = []
+        queries = []
+        errors = 0
+
+        for index in range(warmup + requests):
+            next_request = getattr(self, name)()
+
+            if next_request is None:
+                break
+
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                response = self.request(client, *next_request)
+                duration = time.perf_counter() - start
+
+            if index < warmup:
+                continue
+
+            timings.append(duration * 1000)
+            queries.append(len(context.captured_queries))
+            errors += response.status_code >= 400
+
+        return {
+            'requests': len(timings),
+            'errors': errors,
+            'p50_ms': get_percentile(timings, 50),
+            'p99_ms': get_percentile(timings, 99),
+            'mean_ms': sum(timings) / len(timings) if timings else None,
+            'max_ms': max(timings) if timings else None,
+            'p50_queries': get_percentile(queries, 50),
+            'p99_queries': get_percentile(queries, 99),
+            'max_queries': max(queries) if queries else None,
+        }
+
+    def run(self, scenarios=None, requests=50, warmup=1):
+        results = {}
+
+        # the test client's requests are to 'testserver'
+        with unthrottled(), override_settings(ALLOWED_HOSTS=list(settings.ALLOWED_HOSTS) + ['testserver']):
+            for name in scenarios or self.scenarios:
+                results[name] = self.run_scenario(name, requests, warmup)
+
+        return {
+            'started_at': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'data': self.data.as_dict(),
+            'scenarios': results,
+        }
+
+def compare(results, previous):
+    """
+    Return (scenario, field, previous value, value) for each percentile in both runs
+    """
+    changes = []
+
+    for name, scenario in results['scenarios'].items():
+        if name not in previous.get('scenarios', {}):
+            continue
+
+        for field in ('p50_ms', 'p99_ms', 'p50_queries', 'p99_queries'):
+            changes.append((name, field, previous['scenarios'][name].get(field), scenario[field]))
+
+    return changes
@@ -0,0 +1,180 @@
+"""
+Cache the serialized topTenLists returned to anonymous users
+
+Each topTenList's data is cached separately, keyed by its id, a version and the expand / fields parameters,
+so a page of topTenLists or a topTenList with its parent and children can be assembled from the cache.
+The topTenLists to return are always found by the view's queryset, so permissions are still checked.
+
+Only anonymous requests are cached, because the data for a logged in user includes their own votes
+and their private reusableItems.
+
+When a topTenList, one of its topTenItems, or a reusableItem or vote that it references changes,
+signals.py calls invalidate_topTenLists which gives the topTenList a new version when the transaction commits,
+so its cached data is no longer found.
+
+The cache is CACHES[TOPTENLISTS_CACHE] in settings. This is local memory by default, which only suits a single process:
+a change made in one process would not invalidate another process's copy. With several processes,
+as in production, use a shared backend; production.py uses the database cache.
+"""
+
+import hashlib
+import threading
+import uuid
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+from rest_framework.utils.serializer_helpers import ReturnDict, ReturnList
+
+from .prefetch import get_requested_fields
+
+def get_cache():
+    return caches[getattr(settings, 'TOPTENLISTS_CACHE', 'default')]
+
+def is_shared_cache(cache):
+    """
+    Whether every process sees the same cache
+    """
+    return not isinstance(cache, LocMemCache)
+
+@checks.register(deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    if is_shared_cache(get_cache()):
+        return []
+
+    return [checks.Warning(
+        'The toptenlists cache is local memory, so each process has its own copy.',
+        hint='Use a shared cache backend for CACHES[TOPTENLISTS_CACHE], see toptenlists/cache.py',
+        id='toptenlists.W002',
+    )]
+
+def get_version_key(topTenList_id):
+    return 'toptenlist:version:%s' % topTenList_id
+
+def invalidate_topTenLists(topTenList_ids):
+    """
+    Give each topTenList a new version so its cached data is not used again
+    The versions are changed when the transaction commits. Otherwise a read made before then
+    would cache the old data under the new version
+    """
+    versions = {get_version_key(topTenList_id): uuid.uuid4().hex for topTenList_id in set(topTenList_ids)}
+
+    if len(versions) > 0:
+        transaction.on_commit(lambda: get_cache().set_many(versions, None))
+
+
+class CacheStats(object):
+    """
+    Hits and misses for cached topTenLists in this process
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.hits = 0
+            self.misses = 0
+
+    def record(self, hits, misses):
+        with self.lock:
+            self.hits = self.hits + hits
+            self.misses = self.misses + misses
+
+    def as_dict(self):
+        with self.lock:
+            total = self.hits + self.misses
+
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else None,
+            }
+
+cache_stats = CacheStats()
+
+
+class CachedTopTenListSerializer(object):
+    """
+    Stands in for the serializer when the view serves anonymous requests from the cache
+    Only topTenLists not found in the cache are serialized
+    """
+    def __init__(self, view, instance, many):
+        self.view = view
+        self.instance = instance
+        self.many = many
+
+    def get_keys(self, instances):
+        cache = get_cache()
+        version_keys = [get_version_key(instance.pk) for instance in instances]
+        versions = cache.get_many(version_keys)
+
+        # a topTenList seen for the first time, or whose version has been evicted, is given a version
+        new_versions = {key: uuid.uuid4().hex for key in version_keys if key not in versions}
+
+        if len(new_versions) > 0:
+            for key, version in new_versions.items():
+                cache.add(key, version, None)
+
+            versions.update(cache.get_many(list(new_versions.keys())))
+
+        variant = self.view.get_cache_variant()
+
+        return ['toptenlist:data:%s:%s:%s' % (instance.pk, versions.get(get_version_key(instance.pk), ''), variant) for instance in instances]
+
+    @property
+    def data(self):
+        cache = get_cache()
+        instances = list(self.instance) if self.many else [self.instance]
+        keys = self.get_keys(instances)
+        cached = cache.get_many(keys)
+
+        missing = [(key, instance) for key, instance in zip(keys, instances) if key not in cached]
+
+        if len(missing) > 0:
+            missing_instances = [instance for key, instance in missing]
+            prefetch_related_objects(missing_instances, *self.view.get_prefetch_lookups())
+
+            serializer = self.view.get_uncached_serializer(missing_instances, many=True)
+            new_data = {key: data for (key, instance), data in zip(missing, serializer.data)}
+
+            cache.set_many(new_data, getattr(settings, 'TOPTENLISTS_CACHE_TIMEOUT', 3600))
+            cached.update(new_data)
+
+        cache_stats.record(len(instances) - len(missing), len(missing))
+
+        if self.many:
+            return ReturnList([cached[key] for key in keys], serializer=self)
+
+        return ReturnDict(cached[keys[0]], serializer=self)
+
+
+class TopTenListCacheMixin(object):
+    """
+    Use with a topTenList viewset to serve GET requests from anonymous users from the cache
+    The viewset must provide get_prefetch_lookups for serializing topTenLists that are not cached
+    """
+    def use_cache(self):
+        return self.request.method == 'GET' and not self.request.user.is_authenticated
+
+    def get_cache_variant(self):
+        """
+        The expand and fields parameters that change the serialized data
+        """
+        expand, fields = get_requested_fields(self)
+
+        variant = 'expand=%s&fields=%s' % (','.join(sorted(expand)), ','.join(sorted(fields or [])))
+
+        return hashlib.md5(variant.encode('utf-8')).hexdigest()
+
+    def get_uncached_serializer(self, *args, **kwargs):
+        return super(TopTenListCacheMixin, self).get_serializer(*args, **kwargs)
+
+    def get_serializer(self, *args, **kwargs):
+        if self.use_cache() and len(args) == 1 and 'data' not in kwargs:
+            return CachedTopTenListSerializer(self, args[0], kwargs.get('many', False))
+
+        return super(TopTenListCacheMixin, self).get_serializer(*args, **kwargs)
@@ -0,0 +1,32 @@
+"""
+Delete reusableItems that are no longer referenced by any topTenItem
+
+The signals in signals.py track which reusableItems a topTenItem or topTenList referenced
+and only check those, so the cost of a save does not grow with the number of reusableItems.
+The cleanupreusableitems management command runs a full sweep as a fallback.
+"""
+
+from .models import ReusableItem
+
+def delete_unreferenced_reusable_items(reusableItem_ids):
+    """
+    Delete any of the given reusableItems that is not referenced by any topTenItem
+    """
+    reusableItem_ids = set(reusableItem_ids)
+    reusableItem_ids.discard(None)
+
+    if len(reusableItem_ids) == 0:
+        return 0
+
+    # topTenItem__isnull references the related_name of reusableItem in the TopTenItem model.
+    _, deleted = ReusableItem.objects.filter(id__in=reusableItem_ids, topTenItem__isnull=True).delete()
+
+    return deleted.get(ReusableItem._meta.label, 0)
+
+def delete_all_unreferenced_reusable_items():
+    """
+    Full sweep of the ReusableItem table
+    """
+    _, deleted = ReusableItem.objects.filter(topTenItem__isnull=True).delete()
+
+    return deleted.get(ReusableItem._meta.label, 0)
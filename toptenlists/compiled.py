@@ -0,0 +1,387 @@
+"""
+Compiled serializers for reads
+
+DRF serializes each object by calling get_attribute and to_representation on every field, which dominates
+the time taken by long nested lists such as a page of topTenLists with their topTenItems.
+
+Instead, a serializer is compiled into a list of steps, one for each field, each with a plain getter and
+converter chosen for that field's type: e.g. operator.attrgetter and str for a UUIDField. Nested serializers
+are compiled too, so serializing an object is a single loop over its steps.
+
+A plan is compiled once for each serializer class and set of fields, which expand and fields parameters can change,
+and kept. The default plans of the serializers in COMPILED_SERIALIZERS are compiled when the app is ready.
+For each request, the plan is bound to the request's serializer so that method fields and datetimes use its context.
+
+A field the compiler does not know is serialized by DRF as before. A serializer class that overrides
+to_representation is only compiled if it does its extra work in finish_representation(instance, data),
+which is then called with the compiled data.
+
+The data is the same as the serializer's, see tests/test_compiled.py.
+Use CompiledSerializerMixin with a viewset to serialize its reads with the compiled plan.
+"""
+
+from collections import OrderedDict
+from operator import attrgetter
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ObjectDoesNotExist
+from django.db import models
+from django.utils import timezone
+from rest_framework import ISO_8601, fields, permissions, serializers
+from rest_framework.fields import SkipField
+from rest_framework.relations import PKOnlyObject, PrimaryKeyRelatedField
+from rest_framework.settings import api_settings
+from rest_framework.utils.serializer_helpers import ReturnDict, ReturnList
+
+from .serializers import TopTenListSerializer, TopTenItemSerializer, NotificationSerializer
+
+COMPILED_SERIALIZERS = (TopTenListSerializer, TopTenItemSerializer, NotificationSerializer)
+
+SKIP = object()
+
+# DRF field types whose to_representation is a plain function of a model field's value
+CONVERTERS = {
+    fields.CharField: str,
+    fields.EmailField: str,
+    fields.SlugField: str,
+    fields.URLField: str,
+    fields.IntegerField: int,
+    fields.BooleanField: bool, # model BooleanFields are always True or False
+    fields.ReadOnlyField: None,
+}
+
+def get_model(serializer):
+    return getattr(getattr(serializer, 'Meta', None), 'model', None)
+
+def get_model_field(model, name):
+    """
+    The model field with this name, or None if it is not a field, e.g. a property
+    """
+    if model is None:
+        return None
+
+    try:
+        return model._meta.get_field(name)
+
+    except FieldDoesNotExist:
+        return None
+
+def get_source(field):
+    """
+    The attribute the field reads, or None if it is not a single attribute
+    """
+    if len(field.source_attrs) != 1:
+        return None
+
+    return field.source_attrs[0]
+
+def get_signature(serializer):
+    """
+    What the plan for a serializer depends on: its class and the names, types and sources of its readable fields
+    """
+    signature = [type(serializer)]
+
+    for field in serializer._readable_fields:
+        if isinstance(field, serializers.ListSerializer):
+            signature.append((field.field_name, type(field), field.source, get_signature(field.child)))
+
+        elif isinstance(field, serializers.BaseSerializer):
+            signature.append((field.field_name, type(field), field.source, get_signature(field)))
+
+        else:
+            signature.append((field.field_name, type(field), field.source))
+
+    return tuple(signature)
+
+def get_related(source):
+    """
+    A getter for a related object, which is None if it does not exist, as DRF's get_attribute returns
+    """
+    def get(instance):
+        try:
+            return getattr(instance, source)
+
+        except ObjectDoesNotExist:
+            return None
+
+    return get
+
+# each compile function returns a function that binds the step to the request's field and returns (name, get, convert)
+# get(instance) returns the attribute, then convert(attribute) is called unless it is None or convert is None
+
+def compile_drf_field(field_name):
+    """
+    Any field: DRF's own get_attribute and to_representation
+    """
+    def bind(field):
+        def get(instance):
+            try:
+                attribute = field.get_attribute(instance)
+
+            except SkipField:
+                return SKIP
+
+            check_for_none = attribute.pk if isinstance(attribute, PKOnlyObject) else attribute
+
+            if check_for_none is None:
+                return None
+
+            return field.to_representation(attribute)
+
+        return (field_name, get, None)
+
+    return bind
+
+def compile_static_field(field_name, get, convert):
+    def bind(field):
+        return (field_name, get, convert)
+
+    return bind
+
+def compile_method_field(field_name):
+    def bind(field):
+        return (field_name, getattr(field.parent, field.method_name), None)
+
+    return bind
+
+def get_datetime_converter(field):
+    """
+    DRF's DateTimeField.to_representation, with the format and timezone looked up once for the request
+    """
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    field_timezone = getattr(field, 'timezone', field.default_timezone())
+
+    if output_format is None or output_format.lower() != ISO_8601 or field_timezone is None:
+        return field.to_representation
+
+    def convert(value):
+        if isinstance(value, str) or not value or not timezone.is_aware(value):
+            return field.to_representation(value)
+
+        try:
+            value = value.astimezone(field_timezone).isoformat()
+
+        except OverflowError:
+            return field.to_representation(value)
+
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+
+        return value
+
+    return convert
+
+def compile_datetime_field(field_name, get):
+    def bind(field):
+        return (field_name, get, get_datetime_converter(field))
+
+    return bind
+
+def compile_nested_field(field_name, get, plan):
+    def bind(field):
+        return (field_name, get, plan.bind(field))
+
+    return bind
+
+def compile_list_field(field_name, get, plan):
+    def bind(field):
+        serialize = plan.bind(field.child)
+
+        def convert(value):
+            iterable = value.all() if isinstance(value, models.Manager) else value
+
+            return [serialize(item) for item in iterable]
+
+        return (field_name, get, convert)
+
+    return bind
+
+def compile_field(field, model):
+    """
+    Choose the step for a field
+    """
+    field_name = field.field_name
+    source = get_source(field)
+    model_field = get_model_field(model, source) if source is not None else None
+
+    if isinstance(field, serializers.ListSerializer):
+        plan = get_plan(field.child)
+
+        if plan is not None and model_field is not None and model_field.is_relation:
+            return compile_list_field(field_name, get_related(source), plan)
+
+    elif isinstance(field, serializers.BaseSerializer):
+        plan = get_plan(field)
+
+        if plan is not None and model_field is not None and model_field.is_relation:
+            return compile_nested_field(field_name, get_related(source), plan)
+
+    elif type(field) is serializers.SerializerMethodField:
+        return compile_method_field(field_name)
+
+    elif model_field is None or not model_field.concrete:
+        pass
+
+    elif type(field) is PrimaryKeyRelatedField and field.pk_field is None:
+        # with use_pk_only_optimization, DRF reads the foreign key's id, or the value of any other model field
+        return compile_static_field(field_name, attrgetter(model_field.attname), None)
+
+    elif model_field.is_relation and source != model_field.attname:
+        pass
+
+    elif type(field) in CONVERTERS:
+        return compile_static_field(field_name, attrgetter(source), CONVERTERS[type(field)])
+
+    elif type(field) is fields.UUIDField and field.uuid_format == 'hex_verbose':
+        return compile_static_field(field_name, attrgetter(source), str)
+
+    elif type(field) is fields.DateTimeField:
+        return compile_datetime_field(field_name, attrgetter(source))
+
+    return compile_drf_field(field_name)
+
+
+class NotCompilable(Exception):
+    pass
+
+
+class Plan(object):
+    """
+    The compiled steps for a serializer class and set of fields
+    """
+    def __init__(self, serializer):
+        serializer_class = type(serializer)
+
+        if serializer_class.to_representation is not serializers.Serializer.to_representation and not hasattr(serializer_class, 'finish_representation'):
+            raise NotCompilable('%s overrides to_representation' % serializer_class.__name__)
+
+        model = get_model(serializer)
+        self.steps = [compile_field(field, model) for field in serializer._readable_fields]
+
+    def bind(self, serializer):
+        """
+        Return a function that serializes one instance as the request's serializer would
+        """
+        steps = [bind(field) for bind, field in zip(self.steps, serializer._readable_fields)]
+        finish = getattr(serializer, 'finish_representation', None)
+
+        def serialize(instance):
+            ret = OrderedDict()
+
+            for field_name, get, convert in steps:
+                value = get(instance)
+
+                if value is SKIP:
+                    continue
+
+                if value is None or convert is None:
+                    ret[field_name] = value
+
+                else:
+                    ret[field_name] = convert(value)
+
+            if finish is not None:
+                return finish(instance, ret)
+
+            return ret
+
+        return serialize
+
+plans = {}
+
+def get_plan(serializer):
+    """
+    The plan for a serializer instance, compiled the first time its class and fields are seen
+    None if the serializer cannot be compiled
+    """
+    signature = get_signature(serializer)
+
+    try:
+        return plans[signature]
+
+    except KeyError:
+        pass
+
+    try:
+        plan = Plan(serializer)
+
+    except NotCompilable:
+        plan = None
+
+    plans[signature] = plan
+
+    return plan
+
+def compile_serializers():
+    """
+    Compile the default plans when the app is ready
+    """
+    for serializer_class in COMPILED_SERIALIZERS:
+        get_plan(serializer_class())
+
+
+class CompiledSerializer(object):
+    """
+    Stands in for a serializer, giving the same data from the compiled plan
+    Anything else is passed to the serializer
+    """
+    def __init__(self, serializer):
+        self.serializer = serializer
+
+    def __getattr__(self, name):
+        return getattr(self.serializer, name)
+
+    @property
+    def data(self):
+        if not hasattr(self, '_data'):
+            self._data = self.get_data()
+
+        return self._data
+
+    def get_data(self):
+        serializer = self.serializer
+        many = isinstance(serializer, serializers.ListSerializer)
+        plan = get_plan(serializer.child if many else serializer)
+
+        if plan is None or serializer.instance is None:
+            return serializer.data
+
+        if many:
+            serialize = plan.bind(serializer.child)
+            iterable = serializer.instance.all() if isinstance(serializer.instance, models.Manager) else serializer.instance
+
+            return ReturnList([serialize(item) for item in iterable], serializer=serializer)
+
+        return ReturnDict(plan.bind(serializer)(serializer.instance), serializer=serializer)
+
+
+class CompiledSerializerMixin(object):
+    """
+    Use with a viewset so that its reads are serialized by compiled plans
+    TOPTENLISTS_COMPILED_SERIALIZERS = False turns this off
+    """
+    def use_compiled_serializer(self):
+        return self.request.method in permissions.SAFE_METHODS and getattr(settings, 'TOPTENLISTS_COMPILED_SERIALIZERS', True)
+
+    def get_compiled_serializer(self, serializer):
+        if self.use_compiled_serializer():
+            return CompiledSerializer(serializer)
+
+        return serializer
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super(CompiledSerializerMixin, self).get_serializer(*args, **kwargs)
+
+        if 'data' in kwargs:
+            return serializer
+
+        return self.get_compiled_serializer(serializer)
+
+    def get_compiled_serializer_class(self, serializer_class):
+        """
+        For views that create their own serializers, e.g. the querylist of a multiple model view
+        """
+        def create_serializer(*args, **kwargs):
+            return self.get_compiled_serializer(serializer_class(*args, **kwargs))
+
+        return create_serializer
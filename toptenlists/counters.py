@@ -0,0 +1,95 @@
+"""
+Count each user's unread and new notifications without reading the Notification table
+
+The counts are kept in the toptenlists cache, see cache.py. They are counted from the database
+the first time they are asked for, and after that every change to a user's notifications adjusts them:
+notifications saved singly, flags changed through NotificationViewSet, and deletions of single notifications.
+Notifications created by fanout.py delete their users' counts instead, so they are counted again when next asked for;
+this avoids many increments that a cache without atomic incr, such as the database cache, could lose.
+A count that is missing from the cache is not adjusted; it is counted again when it is next asked for.
+The counts expire after TOPTENLISTS_NOTIFICATION_COUNT_TIMEOUT seconds so that any drift does not last.
+
+Counts in local memory would not see the changes made by other processes, so unless the cache is shared
+the counts are read from the database every time.
+"""
+
+from django.conf import settings
+from django.db.models import Count, Q
+
+from .cache import get_cache, is_shared_cache
+from .models import Notification
+
+COUNTED_FIELDS = ('unread', 'new')
+
+def get_count_key(user_id, field):
+    return 'notification:count:%s:%s' % (user_id, field)
+
+def use_cached_counts():
+    return is_shared_cache(get_cache())
+
+def count_notifications(user_id):
+    return Notification.objects.filter(created_by_id=user_id).aggregate(
+        **{field: Count('id', filter=Q(**{field: True})) for field in COUNTED_FIELDS}
+    )
+
+def get_notification_counts(user_id):
+    """
+    Return {'unread': n, 'new': n} for the user
+    """
+    if not use_cached_counts():
+        return count_notifications(user_id)
+
+    cache = get_cache()
+    keys = {field: get_count_key(user_id, field) for field in COUNTED_FIELDS}
+    cached = cache.get_many(keys.values())
+
+    if len(cached) == len(keys):
+        return {field: cached[key] for field, key in keys.items()}
+
+    counts = count_notifications(user_id)
+
+    timeout = getattr(settings, 'TOPTENLISTS_NOTIFICATION_COUNT_TIMEOUT', 300)
+
+    # add does not replace a count that another process has already set and adjusted
+    for field, key in keys.items():
+        cache.add(key, counts[field], timeout)
+
+    return counts
+
+def adjust_notification_counts(user_id, **deltas):
+    """
+    Add the deltas, e.g. unread=-1, to the user's counts if they are in the cache
+    """
+    if not use_cached_counts():
+        return
+
+    cache = get_cache()
+
+    for field, delta in deltas.items():
+        if delta == 0:
+            continue
+
+        try:
+            cache.incr(get_count_key(user_id, field), delta)
+
+        except ValueError: # not in the cache
+            pass
+
+def add_new_notifications(user_ids):
+    """
+    Each user has a new notification, so their counts are deleted and counted again when next asked for
+    """
+    if not use_cached_counts():
+        return
+
+    get_cache().delete_many([get_count_key(user_id, field) for user_id in user_ids for field in COUNTED_FIELDS])
+
+def forget_notification_counts(user_id):
+    """
+    Some of the user's notifications have been deleted, e.g. all those that were read before deleting them
+    A notification may have been created since, so the counts are counted again when next asked for
+    """
+    if not use_cached_counts():
+        return
+
+    get_cache().delete_many([get_count_key(user_id, field) for field in COUNTED_FIELDS])
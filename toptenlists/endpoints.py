@@ -7,7 +7,11 @@ from .api import TopTenItemViewSet
 from .api import SearchListsItemsView
 from .api import ReusableItemViewSet
 from .api import SearchReusableItemsView
+from .api import SuggestReusableItemsView
 from .api import NotificationViewSet
+from .api import TopTenListCacheStatsView
+from .api import NotificationStreamView
+from .api import RequestMetricsView
 
 router = routers.DefaultRouter()
 router.register('toptenlist', TopTenListViewSet, base_name='TopTenLists') # 'TopTenLists' is used in reverse
@@ -16,9 +20,13 @@ router.register('toptenitem', TopTenItemViewSet, base_name='TopTenItems') # 'Top
 router.register('searchlistsitems', SearchListsItemsView, base_name='searchlistsitems')
 router.register('reusableitem', ReusableItemViewSet, base_name='ReusableItems') # 'ReusableItems' is used in reverse
 router.register('searchreusableitems', SearchReusableItemsView, base_name='searchreusableitems')
+router.register('suggestreusableitems', SuggestReusableItemsView, base_name='suggestreusableitems')
 router.register('notification', NotificationViewSet, base_name='Notifications') # 'Notifications' is used in reverse
 
 app_name = 'topTenLists' # namespace for reverse
 urlpatterns = [
+    path('cachestats/', TopTenListCacheStatsView.as_view(), name='cachestats'),
+    path('metrics/', RequestMetricsView.as_view(), name='metrics'),
+    path('notificationstream/', NotificationStreamView.as_view(), name='notificationstream'),
     path('', include(router.urls), name='thing'),
 ]
@@ -0,0 +1,141 @@
+"""
+Replay the requests each viewset serves and EXPLAIN the queries they make
+
+This is used by the explainqueries management command to check that the hot filters use indexes.
+The requests are made with APIRequestFactory inside a transaction that is rolled back.
+Each request is made twice so that in-memory indexes are already loaded, and every SELECT of the second is explained.
+A full table scan is flagged; note that on a small table the database may prefer a scan even when an index exists.
+"""
+
+import re
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from .api import TopTenListViewSet, TopTenListDetailViewSet, TopTenItemViewSet, ReusableItemViewSet, SearchListsItemsView, SearchReusableItemsView, NotificationViewSet
+from .models import TopTenList, TopTenItem, ReusableItem
+
+USER = get_user_model()
+
+SQLITE_SCAN_RE = re.compile(r'^SCAN (TABLE )?(?!CONSTANT ROW)(?P<table>\S+)(?!.*USING (COVERING )?INDEX)')
+POSTGRESQL_SCAN_RE = re.compile(r'Seq Scan on (?P<table>\S+)')
+
+def get_query_shapes(user=None):
+    """
+    Return (label, viewset, action, params, user, kwargs) for each request to replay
+    Requests that need an existing object are left out if there is none
+    """
+    if user is None:
+        user = USER.objects.filter(topTenList_created_by_id__isnull=False).first() or AnonymousUser()
+
+    topTenList = TopTenList.objects.filter(is_public=True).first()
+    topTenItem = TopTenItem.objects.filter(topTenList__is_public=True).first()
+    reusableItem = ReusableItem.objects.filter(is_public=True, topTenItem__isnull=False).first()
+
+    # search for a word that will be found, so the queries for the results are made
+    search = (topTenList.name.split() or ['the'])[0] if topTenList is not None else 'the'
+
+    shapes = [
+        ('public topTenLists', TopTenListViewSet, 'list', {'listset': 'public-topTenLists', 'limit': 20}, user, {}),
+        ('public topTenLists, keyset page', TopTenListViewSet, 'list', {'listset': 'public-topTenLists', 'pagination': 'cursor'}, user, {}),
+        ('my topTenLists', TopTenListViewSet, 'list', {'listset': 'my-topTenLists', 'limit': 20}, user, {}),
+        ('topTenLists the user can view', TopTenListViewSet, 'list', {'limit': 20}, user, {}),
+        ('search topTenItems and topTenLists', SearchListsItemsView, 'list', {'search': search}, user, {}),
+        ('search reusableItems', SearchReusableItemsView, 'list', {'search': reusableItem.name if reusableItem is not None else search}, user, {}),
+        ('reusableItems', ReusableItemViewSet, 'list', {}, user, {}),
+        ('notifications', NotificationViewSet, 'list', {}, user, {}),
+    ]
+
+    if topTenList is not None:
+        shapes.append(('topTenList', TopTenListViewSet, 'retrieve', {}, user, {'pk': topTenList.pk}))
+        shapes.append(('topTenList detail with parent and children', TopTenListDetailViewSet, 'list', {'id': topTenList.pk}, user, {}))
+
+    if topTenItem is not None:
+        shapes.append(('topTenItem', TopTenItemViewSet, 'retrieve', {}, user, {'pk': topTenItem.pk}))
+
+    if reusableItem is not None:
+        shapes.append(('topTenLists referencing a reusableItem', TopTenListViewSet, 'list', {'reusableItem': reusableItem.pk, 'limit': 20}, user, {}))
+
+    return shapes
+
+def capture_queries(viewset, action, params, user, kwargs):
+    """
+    Make the request and return the SQL of every SELECT
+    """
+    request = APIRequestFactory().get('/', params)
+    force_authenticate(request, user=user)
+
+    view = viewset.as_view({'get': action}, throttle_classes=())
+
+    with transaction.atomic():
+        view(request, **kwargs).render()
+
+        with CaptureQueriesContext(connection) as context:
+            view(request, **kwargs).render()
+
+        transaction.set_rollback(True)
+
+    return [query['sql'] for query in context.captured_queries if query['sql'].lstrip().upper().startswith('SELECT')]
+
+def explain(sql):
+    """
+    Return the plan as a list of lines
+    """
+    if connection.vendor == 'sqlite':
+        prefix = 'EXPLAIN QUERY PLAN '
+    else:
+        prefix = 'EXPLAIN '
+
+    with connection.cursor() as cursor:
+        cursor.execute(prefix + sql)
+        columns = [column[0] for column in cursor.description]
+        rows = cursor.fetchall()
+
+    if connection.vendor == 'sqlite':
+        return [row[-1] for row in rows]
+
+    if connection.vendor == 'mysql':
+        return [', '.join('%s=%s' % (column, value) for column, value in zip(columns, row) if value is not None) for row in rows]
+
+    return [row[0] for row in rows]
+
+def find_full_scans(plan):
+    """
+    Return the tables that are read in full
+    """
+    tables = []
+
+    for line in plan:
+        if connection.vendor == 'sqlite':
+            match = SQLITE_SCAN_RE.match(line)
+
+        elif connection.vendor == 'mysql':
+            match = re.search(r'type=ALL\b', line) and re.search(r'table=(?P<table>[^,]+)', line)
+
+        else:
+            match = POSTGRESQL_SCAN_RE.search(line)
+
+        if match:
+            tables.append(match.group('table'))
+
+    return tables
+
+def explain_query_shapes(user=None):
+    """
+    Return a report for each query shape: {'label', 'queries': [{'sql', 'plan', 'full_scans'}]}
+    """
+    reports = []
+
+    for label, viewset, action, params, shape_user, kwargs in get_query_shapes(user):
+        queries = []
+
+        for sql in capture_queries(viewset, action, params, shape_user, kwargs):
+            plan = explain(sql)
+            queries.append({'sql': sql, 'plan': plan, 'full_scans': find_full_scans(plan)})
+
+        reports.append({'label': label, 'queries': queries})
+
+    return reports
@@ -0,0 +1,268 @@
+"""
+Create notifications for every user of a reusableItem in the background
+
+A change request on a popular reusableItem may notify thousands of users, which is too slow to do in the request.
+The request queues a NotificationJob and returns. When the request's transaction commits, the job is started
+in a thread of the same process; the processnotifications command, run from cron by deploy/serverscript.sh,
+takes any job that thread did not finish, e.g. because the process was restarted.
+There is no broker: the queue is the NotificationJob table, so a job survives a restart.
+
+Each job notifies the users in chunks, in order of id. A chunk's notifications are created in the same transaction
+that records the last user notified, so a job that fails or whose worker dies carries on where it stopped.
+A failed job is retried after a delay that doubles with each attempt, and is marked failed after MAX_ATTEMPTS.
+Several workers may run at once; on databases that support it, each job is locked with SKIP LOCKED.
+"""
+
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import checks
+from django.db import DatabaseError, connection, transaction
+from django.db.models import F, Min, Q
+from django.utils import timezone
+
+from .counters import add_new_notifications
+from .models import Notification, NotificationJob
+from .pubsub import publish_notifications
+
+USER = get_user_model()
+
+logger = logging.getLogger('toptenlists.fanout')
+
+def get_setting(name, default):
+    return getattr(settings, 'TOPTENLISTS_NOTIFICATION_' + name, default)
+
+def enqueue_notification(reusableItem, data, exclude_user=None):
+    """
+    Queue a notification for every user who references reusableItem, except exclude_user
+    """
+    job = NotificationJob.objects.create(
+        context=data['context'],
+        event=data['event'],
+        reusableItem=reusableItem,
+        exclude_user=exclude_user,
+    )
+
+    if get_setting('RUN_ON_COMMIT', True):
+        transaction.on_commit(lambda: start_job(job.pk))
+
+    return job
+
+def start_job(pk):
+    """
+    Run the job in a thread so that the request does not wait for it
+    """
+    thread = threading.Thread(target=run_job_in_thread, args=(pk,), daemon=True)
+    thread.start()
+
+    return thread
+
+def run_job_in_thread(pk):
+    try:
+        run_queued_job(pk)
+    except Exception:
+        # the job is still queued, so processnotifications will take it
+        logger.exception('Notification job %s could not be started', pk)
+    finally:
+        # the thread has its own database connection
+        connection.close()
+
+def run_queued_job(pk):
+    """
+    Run the job if no worker has taken it yet
+    Return True if the job is done
+    """
+    job = claim_job(pk)
+
+    if job is None:
+        return False
+
+    return run_job(job)
+
+def claim_job(pk=None):
+    """
+    Take the next job that is due, or a job whose worker has stopped, and return it
+    If pk is given, take only that job
+    Return None if there is no job to do
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=get_setting('LEASE', 600))
+
+    with transaction.atomic():
+        queryset = NotificationJob.objects.filter(
+            Q(status=NotificationJob.PENDING, run_after__lte=now) | Q(status=NotificationJob.RUNNING, locked_at__lt=stale)
+        ).order_by('run_after')
+
+        if pk is not None:
+            queryset = queryset.filter(pk=pk)
+
+        if connection.features.has_select_for_update_skip_locked:
+            queryset = queryset.select_for_update(skip_locked=True)
+
+        job = queryset.first()
+
+        if job is None:
+            return None
+
+        # the status is checked again so that two workers without SKIP LOCKED cannot both take the job
+        claimed = NotificationJob.objects.filter(pk=job.pk, status=job.status, attempts=job.attempts).update(
+            status=NotificationJob.RUNNING,
+            locked_at=now,
+            attempts=F('attempts') + 1,
+        )
+
+    if claimed == 0:
+        return None
+
+    job.refresh_from_db()
+
+    return job
+
+def notify_chunk(job, chunk_size):
+    """
+    Create the notifications for the next chunk of users
+    Return the number created, 0 when every user has been notified
+    """
+    users = USER.objects.filter(reusableItemUser_user__reusableItem=job.reusableItem_id).order_by('id')
+
+    if job.exclude_user_id is not None:
+        users = users.exclude(pk=job.exclude_user_id)
+
+    if job.last_user is not None:
+        users = users.filter(id__gt=job.last_user)
+
+    user_ids = list(users.values_list('id', flat=True)[:chunk_size])
+
+    if len(user_ids) == 0:
+        return 0
+
+    notifications = [Notification(
+        context=job.context,
+        event=job.event,
+        reusableItem_id=job.reusableItem_id,
+        created_by_id=user_id,
+    ) for user_id in user_ids]
+
+    with transaction.atomic():
+        Notification.objects.bulk_create(notifications)
+
+        job.last_user = user_ids[-1]
+        job.notifications_created = job.notifications_created + len(user_ids)
+        NotificationJob.objects.filter(pk=job.pk).update(last_user=job.last_user, notifications_created=job.notifications_created, locked_at=timezone.now())
+
+    add_new_notifications(user_ids)
+    publish_notifications(notifications)
+
+    return len(user_ids)
+
+def run_job(job):
+    """
+    Notify every user for the job, recording success or failure
+    Return True if the job is done
+    """
+    chunk_size = get_setting('CHUNK_SIZE', 500)
+
+    try:
+        while notify_chunk(job, chunk_size) > 0:
+            pass
+
+    except Exception as error:
+        if job.attempts >= get_setting('MAX_ATTEMPTS', 5):
+            status = NotificationJob.FAILED
+            finished_at = timezone.now()
+        else:
+            status = NotificationJob.PENDING
+            finished_at = None
+
+        delay = get_setting('RETRY_DELAY', 30) * 2 ** (job.attempts - 1)
+
+        NotificationJob.objects.filter(pk=job.pk).update(
+            status=status,
+            run_after=timezone.now() + timedelta(seconds=delay),
+            finished_at=finished_at,
+            locked_at=None,
+            last_error='%s: %s' % (type(error).__name__, error),
+        )
+
+        return False
+
+    NotificationJob.objects.filter(pk=job.pk).update(status=NotificationJob.DONE, finished_at=timezone.now(), locked_at=None)
+
+    return True
+
+def process_jobs(max_jobs=None):
+    """
+    Run jobs until there are none due, or max_jobs have been run
+    Return the number of jobs run
+    """
+    count = 0
+
+    while max_jobs is None or count < max_jobs:
+        job = claim_job()
+
+        if job is None:
+            break
+
+        run_job(job)
+        count = count + 1
+
+    return count
+
+def get_queue_stats(since=None):
+    """
+    Return the depth of the queue and how long jobs wait
+    Latency is from queueing to finishing, for the jobs finished since the given time, by default the last hour
+    """
+    now = timezone.now()
+
+    if since is None:
+        since = now - timedelta(hours=1)
+
+    waiting = NotificationJob.objects.filter(status__in=[NotificationJob.PENDING, NotificationJob.RUNNING])
+    oldest = waiting.aggregate(oldest=Min('created_at'))['oldest']
+
+    finished = NotificationJob.objects.filter(status=NotificationJob.DONE, finished_at__gte=since)
+    latencies = [(finished_at - created_at).total_seconds() for created_at, finished_at in finished.values_list('created_at', 'finished_at')]
+
+    return {
+        'pending': waiting.filter(status=NotificationJob.PENDING).count(),
+        'running': waiting.filter(status=NotificationJob.RUNNING).count(),
+        'failed': NotificationJob.objects.filter(status=NotificationJob.FAILED).count(),
+        'oldest_waiting_seconds': (now - oldest).total_seconds() if oldest is not None else 0,
+        'done_since': len(latencies),
+        'average_latency_seconds': sum(latencies) / len(latencies) if len(latencies) > 0 else 0,
+        'max_latency_seconds': max(latencies) if len(latencies) > 0 else 0,
+    }
+
+def get_stale_warning(stats=None):
+    """
+    Return a message if a job has waited longer than STALE_WARNING seconds, which means no worker is taking jobs
+    """
+    if stats is None:
+        stats = get_queue_stats()
+
+    limit = get_setting('STALE_WARNING', 900)
+
+    if stats['oldest_waiting_seconds'] <= limit:
+        return None
+
+    return 'The oldest notification job has waited %d seconds. Check that processnotifications is running.' % stats['oldest_waiting_seconds']
+
+@checks.register(checks.Tags.database)
+def check_notification_queue(app_configs, **kwargs):
+    """
+    Warn when jobs have waited too long, e.g. when migrate is run on deployment
+    """
+    try:
+        message = get_stale_warning()
+    except DatabaseError:
+        # not migrated yet
+        return []
+
+    if message is None:
+        return []
+
+    return [checks.Warning(message, hint='Run manage.py processnotifications, see deploy/serverscript.sh', id='toptenlists.W001')]
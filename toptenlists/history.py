@@ -0,0 +1,37 @@
+"""
+The history of reusableItems
+
+Each entry is a row of ReusableItemHistory: the reusableItem's first version when it is created,
+then each change request when it is resolved. Adding an entry inserts one row, instead of rewriting
+the whole history on the reusableItem, and the history is only read when it is requested,
+from reusableitem/<id>/history/ one page at a time.
+"""
+
+from django.db.models import Max
+from rest_framework.pagination import LimitOffsetPagination
+
+from .models import ReusableItemHistory
+
+
+class HistoryPagination(LimitOffsetPagination):
+    """
+    A page of a reusableItem's history, oldest first: ?limit=20&offset=0
+    """
+    default_limit = 20
+    max_limit = 100
+
+
+def add_history_entry(reusableItem, entry):
+    """
+    Add an entry at the end of the reusableItem's history
+    Change requests are resolved with the reusableItem locked, see voting.py, so two entries do not take the same place
+    """
+    last = ReusableItemHistory.objects.filter(reusableItem=reusableItem).aggregate(last=Max('order'))['last']
+
+    return ReusableItemHistory.objects.create(reusableItem=reusableItem, order=0 if last is None else last + 1, entry=entry)
+
+def get_history(reusableItem):
+    """
+    The reusableItem's whole history, as a list of entries, oldest first
+    """
+    return list(ReusableItemHistory.objects.filter(reusableItem=reusableItem).order_by('order').values_list('entry', flat=True))
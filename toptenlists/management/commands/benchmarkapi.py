@@ -0,0 +1,103 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from toptenlists.benchmark import Benchmark, compare
+from toptenlists.synthetic import generate
+
+class Rollback(Exception):
+    pass
+
+class Command(BaseCommand):
+    """
+    Generate synthetic data, make requests to the API in this process and report the latency and queries
+    of each scenario, see toptenlists/benchmark.py
+    The data is created in a transaction that is rolled back, so caches that are only filled when
+    a transaction commits, e.g. for users' verified email addresses, are not used
+    """
+    help = 'Load test the toptenlists API with synthetic data'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--lists-per-user', type=int, default=2)
+        parser.add_argument('--reusableitems', type=int, default=50)
+        parser.add_argument('--users-per-reusableitem', type=int, default=5, help='Users who reference each reusableItem')
+        parser.add_argument('--change-requests', type=int, default=20, help='reusableItems with a change request to vote on')
+        parser.add_argument('--notifications-per-user', type=int, default=10)
+        parser.add_argument('--requests', type=int, default=50, help='Requests for each scenario')
+        parser.add_argument('--warmup', type=int, default=1, help='Requests for each scenario before the timed requests')
+        parser.add_argument('--scenario', action='append', choices=Benchmark.scenarios, help='Run this scenario; may be repeated. By default, all of them')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--output', help='Save the results as JSON to this file')
+        parser.add_argument('--compare', help='Compare the results with those saved in this file by an earlier run')
+
+    def get_previous(self, options):
+        if not options['compare']:
+            return None
+
+        try:
+            with open(options['compare']) as previous_file:
+                return json.load(previous_file)
+
+        except (OSError, ValueError) as error:
+            raise CommandError('Cannot read %s: %s' % (options['compare'], error))
+
+    def run(self, options):
+        data = generate(
+            users=options['users'],
+            lists_per_user=options['lists_per_user'],
+            reusableItems=options['reusableitems'],
+            users_per_reusableItem=options['users_per_reusableitem'],
+            change_requests=options['change_requests'],
+            notifications_per_user=options['notifications_per_user'],
+            seed=options['seed'],
+            prefix='benchmark',
+        )
+
+        return Benchmark(data, options['seed']).run(options['scenario'], options['requests'], options['warmup'])
+
+    def write_results(self, results):
+        self.stdout.write('%-28s %8s %7s %9s %9s %11s %11s' % ('scenario', 'requests', 'errors', 'p50 ms', 'p99 ms', 'p50 queries', 'p99 queries'))
+
+        for name, scenario in results['scenarios'].items():
+            if scenario['requests'] == 0:
+                self.stdout.write('%-28s %8d' % (name, 0))
+                continue
+
+            self.stdout.write('%-28s %8d %7d %9.1f %9.1f %11d %11d' % (name, scenario['requests'], scenario['errors'], scenario['p50_ms'], scenario['p99_ms'], scenario['p50_queries'], scenario['p99_queries']))
+
+    def write_comparison(self, results, previous):
+        self.stdout.write('\nCompared with %s' % previous.get('started_at', 'the earlier run'))
+
+        for name, field, before, after in compare(results, previous):
+            if before is None or after is None:
+                continue
+
+            change = '%+.0f%%' % (100 * (after - before) / before) if before else ''
+            self.stdout.write('%-28s %-12s %9.1f -> %9.1f %6s' % (name, field, before, after, change))
+
+    def handle(self, *args, **options):
+        previous = self.get_previous(options)
+
+        # the data is created in a transaction that is rolled back
+        try:
+            with transaction.atomic():
+                results = self.run(options)
+                raise Rollback()
+
+        except Rollback:
+            pass
+
+        results['options'] = {key: options[key] for key in ('users', 'lists_per_user', 'reusableitems', 'users_per_reusableitem', 'change_requests', 'notifications_per_user', 'requests', 'warmup', 'seed')}
+
+        self.write_results(results)
+
+        if previous is not None:
+            self.write_comparison(results, previous)
+
+        if options['output']:
+            with open(options['output'], 'w') as output_file:
+                json.dump(results, output_file, indent=2)
+
+            self.stdout.write('Saved the results to %s' % options['output'])
@@ -0,0 +1,91 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from toptenlists.api import TopTenListViewSet
+from toptenlists.models import TopTenList, TopTenItem
+
+class Rollback(Exception):
+    pass
+
+class Command(BaseCommand):
+    """
+    Time a page of topTenLists with each profile, see toptenlists/profiles.py
+    The requests are made as a logged in user so that the cache for anonymous users is not used
+    """
+    help = 'Compare the time to serve a page of topTenLists with each profile'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=1000, help='topTenLists on the page')
+        parser.add_argument('--repeat', type=int, default=5, help='Requests for each profile; the fastest is reported')
+        parser.add_argument('--create', action='store_true', help='Create count topTenLists for the test and remove them afterwards')
+        parser.add_argument('--username', help='Make the requests as this user. By default, a user who has topTenLists')
+
+    def get_user(self, options):
+        USER = get_user_model()
+
+        if options['username']:
+            try:
+                return USER.objects.get(username=options['username'])
+
+            except USER.DoesNotExist:
+                raise CommandError('No user found with username %s' % options['username'])
+
+        user = USER.objects.filter(topTenList_created_by_id__isnull=False).first() or USER.objects.first()
+
+        if user is None:
+            raise CommandError('There are no users')
+
+        return user
+
+    def create_topTenLists(self, user, count):
+        topTenLists = [TopTenList(name='Benchmark list %d' % index, description='A topTenList for benchmarks', is_public=True, created_by=user, created_by_username=user.username) for index in range(count)]
+        TopTenList.objects.bulk_create(topTenLists)
+
+        TopTenItem.objects.bulk_create([TopTenItem(topTenList=topTenList, name='Item %d' % order, order=order) for topTenList in topTenLists for order in range(1, 11)])
+
+    def time_profile(self, user, profile, count, repeat):
+        view = TopTenListViewSet.as_view({'get': 'list'}, throttle_classes=())
+        timings = []
+
+        for index in range(repeat):
+            request = APIRequestFactory().get('/', {'limit': count, 'profile': profile})
+            force_authenticate(request, user=user)
+
+            start = time.perf_counter()
+            response = view(request)
+            response.render()
+            timings.append(time.perf_counter() - start)
+
+        return min(timings), len(response.data['results'])
+
+    def run(self, user, options):
+        results = []
+
+        for profile in ('full', 'card', 'summary'):
+            results.append((profile,) + self.time_profile(user, profile, options['count'], options['repeat']))
+
+        full_time = results[0][1]
+
+        for profile, seconds, returned in results:
+            self.stdout.write('%-8s %5d topTenLists %9.1f ms %6.1fx' % (profile, returned, seconds * 1000, full_time / seconds))
+
+    def handle(self, *args, **options):
+        user = self.get_user(options)
+
+        if not options['create']:
+            return self.run(user, options)
+
+        # the topTenLists are created in a transaction that is rolled back
+        try:
+            with transaction.atomic():
+                self.create_topTenLists(user, options['count'])
+                self.run(user, options)
+
+                raise Rollback()
+
+        except Rollback:
+            pass
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from toptenlists.cleanup import delete_all_unreferenced_reusable_items
+
+class Command(BaseCommand):
+    """
+    Delete every reusableItem that is not referenced by any topTenItem
+    Saving a topTenItem or deleting a topTenList only checks the reusableItems it referenced,
+    so run this periodically to catch anything those checks missed
+    """
+    help = 'Delete reusableItems that are not referenced by any topTenItem'
+
+    def handle(self, *args, **options):
+        deleted = delete_all_unreferenced_reusable_items()
+
+        self.stdout.write('Deleted %d unreferenced reusableItems' % deleted)
@@ -0,0 +1,47 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from toptenlists.explain import explain_query_shapes
+
+class Command(BaseCommand):
+    """
+    Replay the requests served by each viewset and show the EXPLAIN plan of every query
+    Queries that read a whole table are flagged so that a missing or unused index is noticed
+    """
+    help = 'Report EXPLAIN plans for the queries made by each viewset and flag full table scans'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', help='Make the requests as this user. By default, a user who has topTenLists')
+        parser.add_argument('--fail-on-full-scan', action='store_true', help='Exit with an error if any query reads a whole table')
+        parser.add_argument('--verbose-sql', action='store_true', help='Show the whole of each query')
+
+    def handle(self, *args, **options):
+        user = None
+
+        if options['username']:
+            try:
+                user = get_user_model().objects.get(username=options['username'])
+
+            except get_user_model().DoesNotExist:
+                raise CommandError('No user found with username %s' % options['username'])
+
+        full_scans = 0
+
+        for report in explain_query_shapes(user):
+            self.stdout.write(self.style.MIGRATE_HEADING('%s: %d queries' % (report['label'], len(report['queries']))))
+
+            for query in report['queries']:
+                sql = query['sql'] if options['verbose_sql'] else query['sql'][:200]
+                self.stdout.write('  ' + sql)
+
+                for line in query['plan']:
+                    self.stdout.write('    ' + line)
+
+                for table in query['full_scans']:
+                    full_scans = full_scans + 1
+                    self.stdout.write(self.style.WARNING('    full scan of %s' % table))
+
+        self.stdout.write('%d full scans' % full_scans)
+
+        if full_scans > 0 and options['fail_on_full_scan']:
+            raise CommandError('%d queries read a whole table' % full_scans)
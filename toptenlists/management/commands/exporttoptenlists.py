@@ -0,0 +1,46 @@
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from toptenlists.models import TopTenList
+from toptenlists.transfer import export_topTenLists
+
+class Command(BaseCommand):
+    """
+    Write topTenLists as NDJSON, one topTenList with its topTenItems per line
+    """
+    help = 'Export topTenLists and their topTenItems as NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default='-', help='File to write. Default is standard output')
+        parser.add_argument('--username', help='Only export topTenLists created by this user')
+        parser.add_argument('--public', action='store_true', help='Only export public topTenLists')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Number of topTenLists to read at a time')
+
+    def handle(self, *args, **options):
+        queryset = TopTenList.objects.all()
+
+        if options['username']:
+            try:
+                queryset = queryset.filter(created_by=get_user_model().objects.get(username=options['username']))
+
+            except get_user_model().DoesNotExist:
+                raise CommandError('No user found with username %s' % options['username'])
+
+        if options['public']:
+            queryset = queryset.filter(is_public=True)
+
+        output = sys.stdout if options['output'] == '-' else open(options['output'], 'w', encoding='utf-8')
+        count = 0
+
+        try:
+            for line in export_topTenLists(queryset, chunk_size=options['chunk_size']):
+                output.write(line)
+                count = count + 1
+
+        finally:
+            if output is not sys.stdout:
+                output.close()
+
+        self.stderr.write('Exported %d topTenLists' % count)
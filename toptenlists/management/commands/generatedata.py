@@ -0,0 +1,58 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from toptenlists.synthetic import generate
+
+class Command(BaseCommand):
+    """
+    Fill the database with synthetic users, topTenLists, reusableItems, votes and notifications for scale tests,
+    see toptenlists/synthetic.py
+    The rows are kept. Each user's username starts with the prefix, and their password is 'synthetic password'.
+    Remove them by deleting the users and then the reusableItems they created.
+    """
+    help = 'Generate synthetic data at scale'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--lists-per-user', type=int, default=3)
+        parser.add_argument('--reusableitems', type=int, default=20000)
+        parser.add_argument('--users-per-reusableitem', type=int, default=5, help='Mean number of users who reference each reusableItem')
+        parser.add_argument('--zipf', type=float, default=1.1, help='Exponent of the popularity of reusableItems; 0 gives every reusableItem the same number of users')
+        parser.add_argument('--change-requests', type=int, default=1000)
+        parser.add_argument('--votes-per-change-request', type=int, default=3, help='Votes on each change request as well as the proposer\'s')
+        parser.add_argument('--notifications-per-user', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=1, help='The same seed generates the same rows')
+        parser.add_argument('--prefix', default='synthetic', help='Start of every username')
+        parser.add_argument('--chunk-size', type=int, default=10000, help='Users or reusableItems written in each transaction')
+
+    def handle(self, *args, **options):
+        if options['users'] < 1:
+            raise CommandError('There must be at least one user')
+
+        if get_user_model().objects.filter(username__startswith=options['prefix'] + '-user-').exists():
+            raise CommandError('There are already users with the prefix %s; choose another --prefix' % options['prefix'])
+
+        start = time.perf_counter()
+
+        def progress(message):
+            self.stdout.write('%7.1f s  %s' % (time.perf_counter() - start, message))
+
+        data = generate(
+            users=options['users'],
+            lists_per_user=options['lists_per_user'],
+            reusableItems=options['reusableitems'],
+            users_per_reusableItem=options['users_per_reusableitem'],
+            zipf=options['zipf'],
+            change_requests=options['change_requests'],
+            votes_per_change_request=options['votes_per_change_request'],
+            notifications_per_user=options['notifications_per_user'],
+            seed=options['seed'],
+            prefix=options['prefix'],
+            chunk_size=options['chunk_size'],
+            keep=False,
+            progress=progress,
+        )
+
+        self.stdout.write('Created %s in %.1f s' % (', '.join('%d %s' % (count, kind) for kind, count in data.counts.items()), time.perf_counter() - start))
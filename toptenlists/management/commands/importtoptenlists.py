@@ -0,0 +1,39 @@
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from toptenlists.transfer import import_topTenLists
+
+class Command(BaseCommand):
+    """
+    Create topTenLists from NDJSON written by exporttoptenlists
+    The topTenLists belong to the given user
+    """
+    help = 'Import topTenLists and their topTenItems from NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='File to read, or - for standard input')
+        parser.add_argument('--username', required=True, help='The user who will own the topTenLists')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Number of topTenLists to create in each transaction')
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(username=options['username'])
+
+        except get_user_model().DoesNotExist:
+            raise CommandError('No user found with username %s' % options['username'])
+
+        input_file = sys.stdin if options['input'] == '-' else open(options['input'], 'r', encoding='utf-8')
+
+        try:
+            result = import_topTenLists(input_file, user, chunk_size=options['chunk_size'])
+
+        finally:
+            if input_file is not sys.stdin:
+                input_file.close()
+
+        for error in result['errors']:
+            self.stderr.write('Line %d: %s' % (error['line'], error['message']))
+
+        self.stdout.write('Imported %d topTenLists with %d topTenItems. Removed %d references to reusableItems that could not be used. Skipped %d invalid lines' % (result['topTenLists'], result['topTenItems'], result['skipped_references'], result['invalid_lines']))
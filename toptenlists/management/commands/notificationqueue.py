@@ -0,0 +1,36 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from toptenlists.fanout import get_queue_stats, get_stale_warning
+from toptenlists.models import NotificationJob
+
+class Command(BaseCommand):
+    """
+    Show the depth of the notification queue and how long jobs wait, see toptenlists/fanout.py
+    """
+    help = 'Report the depth and latency of the notification queue'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--minutes', type=int, default=60, help='Report the latency of jobs finished in this many minutes')
+        parser.add_argument('--show-failed', action='store_true', help='List the failed jobs with their last error')
+
+    def handle(self, *args, **options):
+        stats = get_queue_stats(timezone.now() - timedelta(minutes=options['minutes']))
+
+        self.stdout.write('pending: %d' % stats['pending'])
+        self.stdout.write('running: %d' % stats['running'])
+        self.stdout.write('failed: %d' % stats['failed'])
+        self.stdout.write('oldest waiting: %.1f seconds' % stats['oldest_waiting_seconds'])
+        self.stdout.write('done in the last %d minutes: %d' % (options['minutes'], stats['done_since']))
+        self.stdout.write('latency: average %.1f seconds, max %.1f seconds' % (stats['average_latency_seconds'], stats['max_latency_seconds']))
+
+        message = get_stale_warning(stats)
+
+        if message is not None:
+            self.stdout.write(self.style.WARNING(message))
+
+        if options['show_failed']:
+            for job in NotificationJob.objects.filter(status=NotificationJob.FAILED).order_by('-finished_at'):
+                self.stdout.write(self.style.WARNING('%s %s %s: %s' % (job.id, job.event, job.finished_at, job.last_error)))
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from toptenlists.fanout import process_jobs
+
+class Command(BaseCommand):
+    """
+    Create the notifications queued by requests, see toptenlists/fanout.py
+    Run this continuously, e.g. under a process supervisor, or with --once from cron
+    """
+    help = 'Work through the queue of notifications to create'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Stop when no job is due instead of waiting for more')
+        parser.add_argument('--sleep', type=float, default=2, help='Seconds to wait when no job is due')
+
+    def handle(self, *args, **options):
+        while True:
+            count = process_jobs()
+
+            if count > 0:
+                self.stdout.write('Ran %d notification jobs' % count)
+
+            if options['once']:
+                break
+
+            time.sleep(options['sleep'])
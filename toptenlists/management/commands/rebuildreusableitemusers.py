@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from toptenlists.references import rebuild_reusable_item_users
+
+class Command(BaseCommand):
+    """
+    Check the users recorded for every reusableItem against the topTenLists that reference it
+    and repair ReusableItemUser and ReusableItem.users_count
+    """
+    help = 'Rebuild the users who reference each reusableItem from the topTenItems'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Number of reusableItems to check at a time')
+
+    def handle(self, *args, **options):
+        result = rebuild_reusable_item_users(batch_size=options['batch_size'])
+
+        self.stdout.write('Added %d and removed %d reusableItem users, corrected users_count for %d reusableItems' % (result['added'], result['removed'], result['corrected']))
@@ -0,0 +1,140 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from django.urls import resolve, Resolver404
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from toptenlists.metrics import BUCKETS, RequestMetricsMiddleware, registry
+from toptenlists.models import TopTenList, ReusableItem
+
+# report field, column heading
+COLUMNS = (
+    ('requests', 'requests'),
+    ('p50_ms', 'p50 ms'),
+    ('p99_ms', 'p99 ms'),
+    ('mean_ms', 'mean ms'),
+    ('mean_queries', 'queries'),
+    ('max_queries', 'max queries'),
+    ('mean_sql_ms', 'SQL ms'),
+    ('mean_serializer_ms', 'serializer ms'),
+    ('mean_bytes', 'bytes'),
+)
+
+def format_value(value):
+    if value is None:
+        return '>%d' % BUCKETS[-1]
+
+    if isinstance(value, float):
+        return '%.1f' % value
+
+    return str(value)
+
+class Command(BaseCommand):
+    """
+    Make GET requests through RequestMetricsMiddleware in this process and report the queries and timings
+    of each viewset action, see toptenlists/metrics.py
+    A mean or maximum number of queries that grows with the data is a sign of a query made for each object
+    """
+    help = 'Report the queries and timings of API requests'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', help='Paths to request, e.g. /api/v1/content/toptenlist/?limit=50. By default, the main lists and a topTenList')
+        parser.add_argument('--repeat', type=int, default=10, help='Requests for each path')
+        parser.add_argument('--username', help='Make the requests as this user. By default, requests are anonymous')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+
+    def get_user(self, options):
+        if not options['username']:
+            return None
+
+        USER = get_user_model()
+
+        try:
+            return USER.objects.get(username=options['username'])
+
+        except USER.DoesNotExist:
+            raise CommandError('No user found with username %s' % options['username'])
+
+    def get_paths(self, user):
+        paths = [
+            '/api/v1/content/toptenlist/',
+            '/api/v1/content/reusableitem/',
+        ]
+
+        topTenList = TopTenList.objects.filter(is_public=True).first()
+
+        if topTenList is not None:
+            paths.append('/api/v1/content/toptenlistdetail/?id=%s' % topTenList.pk)
+
+        reusableItem = ReusableItem.objects.filter(is_public=True).first()
+
+        if reusableItem is not None:
+            paths.append('/api/v1/content/reusableitem/%s/' % reusableItem.pk)
+
+        if user is not None:
+            paths.append('/api/v1/content/notification/')
+
+        return paths
+
+    def get_response(self, request):
+        """
+        Call the view without throttling, so that repeated requests are not refused
+        """
+        try:
+            match = resolve(request.path_info)
+
+        except Resolver404:
+            raise CommandError('No view found for %s' % request.path_info)
+
+        view_class = getattr(match.func, 'cls', None)
+
+        if view_class is None:
+            raise CommandError('%s is not an API view' % request.path_info)
+
+        initkwargs = dict(match.func.initkwargs, throttle_classes=())
+        actions = getattr(match.func, 'actions', None)
+
+        if actions is not None:
+            view = view_class.as_view(actions, **initkwargs)
+
+        else:
+            view = view_class.as_view(**initkwargs)
+
+        self.middleware.process_view(request, view, match.args, match.kwargs)
+        response = view(request, *match.args, **match.kwargs)
+
+        if response.status_code >= 400:
+            self.stderr.write('%s %s: %d' % (request.method, request.get_full_path(), response.status_code))
+
+        return response
+
+    def handle(self, *args, **options):
+        user = self.get_user(options)
+        paths = options['paths'] or self.get_paths(user)
+
+        with override_settings(TOPTENLISTS_METRICS=True, TOPTENLISTS_METRICS_PATHS=('/',)):
+            self.middleware = RequestMetricsMiddleware(self.get_response)
+            registry.reset()
+
+            for path in paths:
+                for index in range(options['repeat']):
+                    request = APIRequestFactory().get(path)
+
+                    if user is not None:
+                        force_authenticate(request, user=user)
+
+                    self.middleware(request)
+
+        report = registry.as_dict()
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        width = max([len(key) for key in report] + [len('endpoint')])
+        self.stdout.write('  '.join(['endpoint'.ljust(width)] + [heading for name, heading in COLUMNS]))
+
+        for key, endpoint in report.items():
+            self.stdout.write('  '.join([key.ljust(width)] + [format_value(endpoint[name]).rjust(len(heading)) for name, heading in COLUMNS]))
@@ -0,0 +1,178 @@
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from toptenlists.models import ReusableItem, ReusableItemUser, NotificationJob
+from toptenlists.history import get_history
+from toptenlists.serializers import ReusableItemSerializer
+from toptenlists.voting import StaleChangeRequest, cast_vote, VOTE_FIELDS, get_vote_table
+
+MAX_LATE_VOTES = 1000
+
+class Command(BaseCommand):
+    """
+    Many users vote at once on a reusableItem's change requests, see toptenlists/voting.py
+    Each vote reads the reusableItem and votes, as a request to the API would. The voter whose vote resolves
+    a change request submits the next one, and voters who were too late vote again on the next one.
+
+    Checks that each change request was resolved exactly once, with one history entry and one notification job,
+    that every vote was counted by exactly one change request, and that the counts match the vote tables.
+    The users and the reusableItem are created for the test and deleted afterwards.
+
+    SQLite locks the whole database, so with SQLite most votes must be retried: set TOPTENLISTS_VOTE_ATTEMPTS to 20 or more.
+    """
+    help = 'Vote on a change request from many threads at once and check the result'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--voters', type=int, default=200, help='Users who vote, once each')
+        parser.add_argument('--threads', type=int, default=20)
+        parser.add_argument('--yes', type=int, default=90, help='Percentage of yes votes')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def create_reusableItem(self, voters):
+        USER = get_user_model()
+        run = uuid.uuid4().hex[:8]
+
+        users = [USER(username='stressvotes-%s-%d' % (run, index), email='stressvotes-%s-%d@example.com' % (run, index)) for index in range(voters)]
+        USER.objects.bulk_create(users)
+
+        reusableItem = ReusableItem.objects.create(name='Stress test', is_public=True, created_by=users[0], created_by_username=users[0].username, change_request={'name': 'Stress test'}, change_request_by=users[0])
+
+        ReusableItemUser.objects.bulk_create([ReusableItemUser(reusableItem=reusableItem, user=user) for user in users])
+        ReusableItem.objects.filter(pk=reusableItem.pk).update(users_count=len(users))
+
+        return reusableItem, users
+
+    def submit_change_request(self, reusableItem_id, user):
+        ReusableItem.objects.filter(pk=reusableItem_id).update(change_request={'name': 'Stress test ' + uuid.uuid4().hex[:8]}, change_request_by=user)
+
+    def vote(self, reusableItem_id, user, vote):
+        """
+        Vote on the open change request, and again on the next one if it is resolved first
+        Return 'counted' or the resolution, and the number of late votes
+        """
+        for late in range(MAX_LATE_VOTES):
+            reusableItem = ReusableItem.objects.get(pk=reusableItem_id)
+
+            if reusableItem.change_request is None:
+                # the next change request has not been submitted yet
+                time.sleep(0.001)
+                continue
+
+            try:
+                resolution = cast_vote(reusableItem, user, vote, ReusableItemSerializer.resolve_change_request)
+
+            except StaleChangeRequest:
+                continue
+
+            if resolution is None:
+                return 'counted', late
+
+            self.submit_change_request(reusableItem_id, user)
+
+            return resolution, late
+
+        raise CommandError('No change request was open for %d attempts' % MAX_LATE_VOTES)
+
+    def run_voters(self, reusableItem, votes, threads):
+        outcomes = Counter()
+        errors = []
+        lock = threading.Lock()
+        queue = list(votes)
+
+        def voter():
+            try:
+                while True:
+                    with lock:
+                        if len(queue) == 0:
+                            return
+
+                        user, vote = queue.pop()
+
+                    try:
+                        outcome, late = self.vote(reusableItem.pk, user, vote)
+
+                    except Exception as error:
+                        outcome, late = 'error', 0
+                        errors.append(repr(error))
+
+                    with lock:
+                        outcomes[outcome] += 1
+                        outcomes['late'] += late
+
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=voter) for index in range(threads)]
+        start = time.perf_counter()
+
+        for worker in workers:
+            worker.start()
+
+        for worker in workers:
+            worker.join()
+
+        return outcomes, errors, time.perf_counter() - start
+
+    def find_problems(self, reusableItem, outcomes, errors):
+        """
+        Return a list of problems
+        """
+        problems = list(errors[:5])
+        reusableItem.refresh_from_db()
+        history = get_history(reusableItem)
+
+        resolutions = outcomes['accepted'] + outcomes['rejected']
+        jobs = NotificationJob.objects.filter(reusableItem=reusableItem, event__in=['changeRequestAccepted', 'changeRequestRejected']).count()
+
+        if len(history) != resolutions or jobs != resolutions:
+            problems.append('%d change requests resolved, with %d history entries and %d notification jobs' % (resolutions, len(history), jobs))
+
+        # each vote is counted by the change request that was resolved after it, or the open one
+        counted = sum(entry['change_request_votes_yes_count'] + entry['change_request_votes_no_count'] for entry in history)
+        counted += reusableItem.change_request_votes_yes_count + reusableItem.change_request_votes_no_count
+        cast = outcomes['counted'] + resolutions
+
+        if counted != cast:
+            problems.append('%d votes were cast but %d were counted' % (cast, counted))
+
+        for vote, (field_name, count_field) in VOTE_FIELDS.items():
+            through, field = get_vote_table(vote)
+            rows = through.objects.filter(**{field.m2m_field_name(): reusableItem.pk}).count()
+
+            if getattr(reusableItem, count_field) != rows:
+                problems.append('%s is %d but there are %d votes' % (count_field, getattr(reusableItem, count_field), rows))
+
+        return problems
+
+    def handle(self, *args, **options):
+        if options['voters'] < 2:
+            raise CommandError('There must be at least 2 voters')
+
+        rng = random.Random(options['seed'])
+        reusableItem, users = self.create_reusableItem(options['voters'])
+
+        try:
+            votes = [(user, 'yes' if rng.randrange(100) < options['yes'] else 'no') for user in users]
+            rng.shuffle(votes)
+
+            outcomes, errors, seconds = self.run_voters(reusableItem, votes, options['threads'])
+            problems = self.find_problems(reusableItem, outcomes, errors)
+
+        finally:
+            reusableItem.delete()
+            get_user_model().objects.filter(pk__in=[user.pk for user in users]).delete()
+
+        self.stdout.write('%d votes from %d threads in %.2f s: %.0f votes per second' % (len(votes), options['threads'], seconds, len(votes) / seconds))
+        self.stdout.write('%d change requests accepted, %d rejected; %d votes were too late and cast again; %d errors' % (outcomes['accepted'], outcomes['rejected'], outcomes['late'], outcomes['error']))
+
+        if len(problems) > 0:
+            raise CommandError('; '.join(problems))
+
+        self.stdout.write('each change request was resolved once and every vote was counted once')
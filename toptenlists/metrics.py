@@ -0,0 +1,270 @@
+"""
+Query counts and timings for each API endpoint
+
+RequestMetricsMiddleware measures each request whose path starts with one of TOPTENLISTS_METRICS_PATHS:
+the number of SQL queries, the time spent in SQL, the time spent in serializers, the total time
+and the size of the response. It is only used if TOPTENLISTS_METRICS is True.
+
+The measurements are added up for each viewset action, e.g. 'TopTenListViewSet.list', in this process.
+The time taken by each request is counted in a histogram, from which percentiles are estimated.
+Staff can read the report from content/metrics/, and the requestmetrics command makes requests and reports on them.
+
+Serializer time is measured for viewsets that use MetricsMixin.
+
+A request that takes longer than TOPTENLISTS_METRICS_SLOW_REQUEST milliseconds is logged to 'toptenlists.metrics'
+with its SQL, so that e.g. a query repeated for each object in a list can be seen.
+"""
+
+import logging
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger('toptenlists.metrics')
+
+# upper bounds of the histogram's buckets, in milliseconds; the last bucket has no upper bound
+BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+MAX_LOGGED_QUERIES = 100
+
+def get_setting(name, default):
+    return getattr(settings, 'TOPTENLISTS_METRICS_' + name, default)
+
+
+class RequestMetrics(object):
+    """
+    The measurements of one request
+    """
+    def __init__(self, keep_sql=False):
+        self.queries = 0
+        self.sql_time = 0
+        self.serializer_time = 0
+        self.keep_sql = keep_sql
+        self.sql = []
+
+    def __call__(self, execute, sql, params, many, context):
+        """
+        Count and time each query, as a database execute_wrapper
+        """
+        start = time.perf_counter()
+
+        try:
+            return execute(sql, params, many, context)
+
+        finally:
+            duration = time.perf_counter() - start
+            self.queries += 1
+            self.sql_time += duration
+
+            if self.keep_sql and len(self.sql) < MAX_LOGGED_QUERIES:
+                self.sql.append((duration, sql))
+
+local = threading.local()
+
+def get_request_metrics():
+    """
+    The measurements of the request being handled by this thread, or None if it is not measured
+    """
+    return getattr(local, 'metrics', None)
+
+
+class EndpointMetrics(object):
+    """
+    The totals for one viewset action
+    """
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.histogram = [0] * (len(BUCKETS) + 1)
+        self.time = 0
+        self.queries = 0
+        self.max_queries = 0
+        self.sql_time = 0
+        self.serializer_time = 0
+        self.bytes = 0
+
+    def add(self, metrics, duration, status_code, size):
+        milliseconds = duration * 1000
+        bucket = 0
+
+        while bucket < len(BUCKETS) and milliseconds > BUCKETS[bucket]:
+            bucket += 1
+
+        self.count += 1
+        self.errors += status_code >= 500
+        self.histogram[bucket] += 1
+        self.time += duration
+        self.queries += metrics.queries
+        self.max_queries = max(self.max_queries, metrics.queries)
+        self.sql_time += metrics.sql_time
+        self.serializer_time += metrics.serializer_time
+        self.bytes += size
+
+    def get_percentile(self, percentile):
+        """
+        The upper bound of the bucket that holds the percentile, in milliseconds, or None if that is the last bucket
+        """
+        rank = percentile / 100 * self.count
+        seen = 0
+
+        for bucket, count in enumerate(self.histogram):
+            seen += count
+
+            if seen >= rank and count > 0:
+                return BUCKETS[bucket] if bucket < len(BUCKETS) else None
+
+        return None
+
+    def as_dict(self):
+        return {
+            'requests': self.count,
+            'errors': self.errors,
+            'mean_ms': 1000 * self.time / self.count,
+            'p50_ms': self.get_percentile(50),
+            'p95_ms': self.get_percentile(95),
+            'p99_ms': self.get_percentile(99),
+            'mean_queries': self.queries / self.count,
+            'max_queries': self.max_queries,
+            'mean_sql_ms': 1000 * self.sql_time / self.count,
+            'mean_serializer_ms': 1000 * self.serializer_time / self.count,
+            'mean_bytes': self.bytes / self.count,
+            'histogram': dict(zip([str(bound) for bound in BUCKETS] + ['more'], self.histogram)),
+        }
+
+
+class MetricsRegistry(object):
+    """
+    EndpointMetrics for each viewset action, in this process
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.endpoints = {}
+
+    def record(self, key, metrics, duration, status_code, size):
+        with self.lock:
+            if key not in self.endpoints:
+                self.endpoints[key] = EndpointMetrics()
+
+            self.endpoints[key].add(metrics, duration, status_code, size)
+
+    def as_dict(self):
+        with self.lock:
+            return {key: self.endpoints[key].as_dict() for key in sorted(self.endpoints)}
+
+registry = MetricsRegistry()
+
+def get_endpoint_key(request, view_func):
+    """
+    e.g. 'TopTenListViewSet.list' for a viewset, or 'NotificationStreamView.get' for another view
+    """
+    view_class = getattr(view_func, 'cls', None)
+    method = request.method.lower()
+
+    if view_class is None:
+        return getattr(view_func, '__name__', 'unknown') + '.' + method
+
+    actions = getattr(view_func, 'actions', None) or {}
+
+    return view_class.__name__ + '.' + actions.get(method, method)
+
+
+class RequestMetricsMiddleware(object):
+    """
+    Measure each request to TOPTENLISTS_METRICS_PATHS, see above
+    """
+    def __init__(self, get_response):
+        if not getattr(settings, 'TOPTENLISTS_METRICS', False):
+            raise MiddlewareNotUsed()
+
+        self.get_response = get_response
+        self.paths = tuple(get_setting('PATHS', ('/api/v1/content/',)))
+
+    def __call__(self, request):
+        if not request.path.startswith(self.paths):
+            return self.get_response(request)
+
+        slow = get_setting('SLOW_REQUEST', None)
+        metrics = RequestMetrics(keep_sql=slow is not None)
+        local.metrics = metrics
+        start = time.perf_counter()
+
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics))
+
+                response = self.get_response(request)
+
+                # DRF's responses are usually rendered by now, but render any that is not, so its time is counted
+                if hasattr(response, 'render') and not getattr(response, 'is_rendered', True):
+                    response.render()
+
+        finally:
+            local.metrics = None
+
+        duration = time.perf_counter() - start
+        key = getattr(request, '_metrics_key', None) or 'unresolved'
+        size = 0 if response.streaming else len(response.content)
+
+        registry.record(key, metrics, duration, response.status_code, size)
+
+        if slow is not None and duration * 1000 >= slow:
+            self.log_slow_request(request, key, metrics, duration)
+
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._metrics_key = get_endpoint_key(request, view_func)
+
+    def log_slow_request(self, request, key, metrics, duration):
+        lines = ['%.1f ms  %s' % (sql_time * 1000, sql) for sql_time, sql in metrics.sql]
+
+        logger.warning(
+            'Slow request %s %s (%s): %.1f ms, %d queries in %.1f ms, serializers %.1f ms\n%s',
+            request.method, request.get_full_path(), key, duration * 1000, metrics.queries, metrics.sql_time * 1000, metrics.serializer_time * 1000, '\n'.join(lines)
+        )
+
+
+class TimedSerializer(object):
+    """
+    Stands in for a serializer, adding the time taken to get its data to the request's measurements
+    Anything else is passed to the serializer
+    """
+    def __init__(self, serializer, metrics):
+        self.serializer = serializer
+        self.metrics = metrics
+
+    def __getattr__(self, name):
+        return getattr(self.serializer, name)
+
+    @property
+    def data(self):
+        start = time.perf_counter()
+
+        try:
+            return self.serializer.data
+
+        finally:
+            self.metrics.serializer_time += time.perf_counter() - start
+
+
+class MetricsMixin(object):
+    """
+    Use with a viewset so that its serializer time is measured by RequestMetricsMiddleware
+    """
+    def get_serializer(self, *args, **kwargs):
+        serializer = super(MetricsMixin, self).get_serializer(*args, **kwargs)
+        metrics = get_request_metrics()
+
+        if metrics is None:
+            return serializer
+
+        return TimedSerializer(serializer, metrics)
@@ -0,0 +1,61 @@
+# Generated by Django 2.0.10 on 2026-10-18 09:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+def populate_reusable_item_users(apps, schema_editor):
+    """
+    Record the users who already reference each reusableItem
+    """
+    ReusableItem = apps.get_model('toptenlists', 'ReusableItem')
+    ReusableItemUser = apps.get_model('toptenlists', 'ReusableItemUser')
+    TopTenItem = apps.get_model('toptenlists', 'TopTenItem')
+
+    references = TopTenItem.objects.exclude(reusableItem=None).order_by().values_list('reusableItem', 'topTenList__created_by').distinct()
+
+    ReusableItemUser.objects.bulk_create([ReusableItemUser(reusableItem_id=reusableItem_id, user_id=user_id) for (reusableItem_id, user_id) in references], batch_size=1000)
+
+    counts = ReusableItemUser.objects.order_by().values('reusableItem').annotate(count=models.Count('id')).values_list('reusableItem', 'count')
+
+    for reusableItem_id, count in counts:
+        ReusableItem.objects.filter(pk=reusableItem_id).update(users_count=count)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('toptenlists', '0002_auto_20190922_1307'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReusableItemUser',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='reusableitem',
+            name='users_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='reusableitemuser',
+            name='reusableItem',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reusableItemUser', to='toptenlists.ReusableItem'),
+        ),
+        migrations.AddField(
+            model_name='reusableitemuser',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reusableItemUser_user', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterUniqueTogether(
+            name='reusableitemuser',
+            unique_together={('reusableItem', 'user')},
+        ),
+        migrations.RunPython(populate_reusable_item_users, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+from django.db import migrations
+
+# columns searched by search.MySQLFullTextSearchBackend
+# replaced by indexes with the built-in parser in migration 0010
+FULLTEXT_INDEXES = [
+    ('toptenlists_toptenlist', 'name'),
+    ('toptenlists_toptenlist', 'created_by_username'),
+    ('toptenlists_toptenitem', 'name'),
+    ('toptenlists_reusableitem', 'name'),
+]
+
+def get_index_name(table, column):
+    return '%s_%s_fulltext' % (table, column.lower())
+
+def create_fulltext_indexes(apps, schema_editor):
+    # other databases use search.InvertedIndexSearchBackend which does not need an index
+    if schema_editor.connection.vendor != 'mysql':
+        return
+
+    for table, column in FULLTEXT_INDEXES:
+        schema_editor.execute('CREATE FULLTEXT INDEX `%s` ON `%s` (`%s`) WITH PARSER ngram' % (get_index_name(table, column), table, column))
+
+def drop_fulltext_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+
+    for table, column in FULLTEXT_INDEXES:
+        schema_editor.execute('DROP INDEX `%s` ON `%s`' % (get_index_name(table, column), table))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('toptenlists', '0003_reusableitemuser'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fulltext_indexes, drop_fulltext_indexes),
+    ]
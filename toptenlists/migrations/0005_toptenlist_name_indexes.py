@@ -0,0 +1,21 @@
+# Generated by Django 2.0.10 on 2026-10-18 09:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('toptenlists', '0004_fulltext_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='toptenlist',
+            index=models.Index(fields=['name', 'id'], name='toptenlist_name_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='toptenlist',
+            index=models.Index(fields=['is_public', 'name', 'id'], name='toptenlist_public_name_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 2.0.10 on 2026-10-18 09:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('toptenlists', '0005_toptenlist_name_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['created_by', 'created_at'], name='notification_owner_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reusableitem',
+            index=models.Index(fields=['is_public', 'name'], name='reusableitem_public_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='toptenitem',
+            index=models.Index(fields=['topTenList', 'order'], name='toptenitem_list_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='toptenitem',
+            index=models.Index(fields=['reusableItem', 'topTenList'], name='toptenitem_reusable_list_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='toptenlist',
+            index=models.Index(fields=['created_by', 'name'], name='toptenlist_owner_name_idx'),
+        ),
+    ]
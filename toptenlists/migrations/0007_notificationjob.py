@@ -0,0 +1,41 @@
+# Generated by Django 2.0.10 on 2026-10-18 10:06
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('toptenlists', '0006_hot_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('context', models.CharField(blank=True, default='', max_length=255)),
+                ('event', models.CharField(blank=True, default='', max_length=5000)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('attempts', models.IntegerField(default=0)),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now)),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('last_user', models.UUIDField(blank=True, null=True)),
+                ('notifications_created', models.IntegerField(default=0)),
+                ('exclude_user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='notificationJob_exclude_user', to=settings.AUTH_USER_MODEL)),
+                ('reusableItem', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notificationJob', to='toptenlists.ReusableItem')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='notificationjob',
+            index=models.Index(fields=['status', 'run_after'], name='notificationjob_status_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 2.0.10 on 2026-10-18 10:23
+
+from django.db import migrations, models
+
+
+def count_votes(apps, schema_editor):
+    """
+    Count the votes already cast on each reusableItem's change request
+    """
+    ReusableItem = apps.get_model('toptenlists', 'ReusableItem')
+
+    ReusableItem.objects.update(change_request_votes_yes_count=0, change_request_votes_no_count=0)
+
+    for field_name in ('change_request_votes_yes', 'change_request_votes_no'):
+        through = ReusableItem._meta.get_field(field_name).remote_field.through
+        counts = through.objects.order_by().values('reusableitem').annotate(count=models.Count('id')).values_list('reusableitem', 'count')
+
+        for reusableItem_id, count in counts:
+            ReusableItem.objects.filter(pk=reusableItem_id).update(**{field_name + '_count': count})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('toptenlists', '0007_notificationjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reusableitem',
+            name='change_request_version',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_votes, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='reusableitem',
+            name='change_request_votes_no_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='reusableitem',
+            name='change_request_votes_yes_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 2.0.10 on 2026-10-18 10:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import django_mysql.models
+from django.utils.dateparse import parse_datetime
+import uuid
+
+
+def copy_history(apps, schema_editor):
+    """
+    Copy each reusableItem's history into a row for each entry
+    An entry's date is when its change request was resolved, or when the reusableItem was created
+    """
+    ReusableItem = apps.get_model('toptenlists', 'ReusableItem')
+    ReusableItemHistory = apps.get_model('toptenlists', 'ReusableItemHistory')
+
+    entries = []
+
+    for reusableItem_id, history, created_at in ReusableItem.objects.values_list('id', 'history', 'created_at').iterator():
+        for order, entry in enumerate(history or []):
+            entry_at = None
+
+            try:
+                entry_at = parse_datetime(entry.get('changed_request_resolved_at') or '')
+
+            except ValueError:
+                pass
+
+            entries.append(ReusableItemHistory(reusableItem_id=reusableItem_id, order=order, created_at=entry_at or created_at, entry=entry))
+
+        if len(entries) >= 1000:
+            ReusableItemHistory.objects.bulk_create(entries)
+            entries = []
+
+    ReusableItemHistory.objects.bulk_create(entries)
+
+def copy_history_back(apps, schema_editor):
+    ReusableItem = apps.get_model('toptenlists', 'ReusableItem')
+    ReusableItemHistory = apps.get_model('toptenlists', 'ReusableItemHistory')
+
+    histories = {}
+
+    for reusableItem_id, entry in ReusableItemHistory.objects.order_by('reusableItem', 'order').values_list('reusableItem', 'entry').iterator():
+        histories.setdefault(reusableItem_id, []).append(entry)
+
+    for reusableItem_id, history in histories.items():
+        ReusableItem.objects.filter(pk=reusableItem_id).update(history=history)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('toptenlists', '0008_reusableitem_vote_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReusableItemHistory',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('order', models.IntegerField(editable=False)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+                ('entry', django_mysql.models.JSONField(default=dict)),
+            ],
+            options={
+                'ordering': ['order'],
+            },
+        ),
+        migrations.AddField(
+            model_name='reusableitemhistory',
+            name='reusableItem',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='reusableItemHistory', to='toptenlists.ReusableItem'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='reusableitemhistory',
+            unique_together={('reusableItem', 'order')},
+        ),
+        migrations.RunPython(copy_history, copy_history_back),
+        migrations.RemoveField(
+            model_name='reusableitem',
+            name='history',
+        ),
+    ]
@@ -0,0 +1,45 @@
+from django.db import migrations
+
+# columns searched by search.MySQLFullTextSearchBackend
+# the ngram indexes of migration 0004 matched any two letters in a row rather than the start of a word,
+# and dropped every ngram containing a stopword such as 'a' or 'i', so they are replaced by indexes using the built-in parser.
+# stopwords are disabled while the indexes are created, so every word of at least innodb_ft_min_token_size letters is indexed
+FULLTEXT_INDEXES = [
+    ('toptenlists_toptenlist', 'name'),
+    ('toptenlists_toptenlist', 'created_by_username'),
+    ('toptenlists_toptenitem', 'name'),
+    ('toptenlists_reusableitem', 'name'),
+]
+
+def get_index_name(table, column):
+    return '%s_%s_fulltext' % (table, column.lower())
+
+def recreate_fulltext_indexes(schema_editor, parser):
+    # other databases use search.InvertedIndexSearchBackend which does not need an index
+    if schema_editor.connection.vendor != 'mysql':
+        return
+
+    schema_editor.execute('SET SESSION innodb_ft_enable_stopword = OFF')
+
+    for table, column in FULLTEXT_INDEXES:
+        schema_editor.execute('DROP INDEX `%s` ON `%s`' % (get_index_name(table, column), table))
+        schema_editor.execute('CREATE FULLTEXT INDEX `%s` ON `%s` (`%s`)%s' % (get_index_name(table, column), table, column, parser))
+
+    schema_editor.execute('SET SESSION innodb_ft_enable_stopword = ON')
+
+def use_word_parser(apps, schema_editor):
+    recreate_fulltext_indexes(schema_editor, '')
+
+def use_ngram_parser(apps, schema_editor):
+    recreate_fulltext_indexes(schema_editor, ' WITH PARSER ngram')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('toptenlists', '0009_reusableitemhistory'),
+    ]
+
+    operations = [
+        migrations.RunPython(use_word_parser, use_ngram_parser),
+    ]
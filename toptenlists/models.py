@@ -3,6 +3,8 @@
 import uuid
 
 from django.db import models
+from django.db.models import BooleanField, Exists, OuterRef, Value
+from django.utils import timezone
 from django.utils.http import int_to_base36
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.contrib.auth import get_user_model
@@ -26,10 +28,50 @@ class TopTenList(models.Model):
     description = models.CharField(max_length=5000, blank=True, default='')
     is_public = models.BooleanField(default=False)
 
+    class Meta:
+        # keyset pagination by name, see pagination.py
+        # (is_public, name, id) also serves public topTenLists ordered by name
+        indexes = [
+            models.Index(fields=['name', 'id'], name='toptenlist_name_id_idx'),
+            models.Index(fields=['is_public', 'name', 'id'], name='toptenlist_public_name_idx'),
+            models.Index(fields=['created_by', 'name'], name='toptenlist_owner_name_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
 
+class ReusableItemQuerySet(models.QuerySet):
+    """
+    Queryset for reusableItems
+    """
+    def _votes(self, field_name):
+        # the through table rows for one vote field, correlated with the outer reusableItem
+        field = self.model._meta.get_field(field_name)
+        through = field.remote_field.through
+
+        return through, field, through.objects.filter(**{field.m2m_field_name(): OuterRef('pk')})
+
+    def _my_vote(self, field_name, user):
+        if not user.is_authenticated:
+            return Value(False, output_field=BooleanField())
+
+        through, field, votes = self._votes(field_name)
+
+        return Exists(votes.filter(**{field.m2m_reverse_field_name(): user.pk}))
+
+    def with_votes(self, user):
+        """
+        Annotate the user's own vote on the change request
+        so that the serializer does not need to query the vote tables for each reusableItem
+        The vote counts are kept on the reusableItem, see voting.py
+        """
+        return self.annotate(
+            annotated_my_vote_yes=self._my_vote('change_request_votes_yes', user),
+            annotated_my_vote_no=self._my_vote('change_request_votes_no', user),
+        )
+
+
 class ReusableItem(models.Model):
     """
     Model for reusableItem
@@ -45,8 +87,8 @@ class ReusableItem(models.Model):
     link = models.CharField(max_length=255, blank=True, default='')
 
     modified_at = models.DateTimeField(auto_now_add=True)
-    history = JSONField(default=list, blank=True) # array of version objects
-   
+    # the history of versions is kept in ReusableItemHistory
+
     change_request = JSONField(default=None, blank=True, null=True) # change request object
     change_request_at = models.DateTimeField(blank=True, null=True) # when the change request was submitted
     change_request_by = models.ForeignKey(USER, on_delete=models.SET_NULL, null=True,
@@ -56,14 +98,71 @@ class ReusableItem(models.Model):
     change_request_votes_yes = models.ManyToManyField(USER, blank=True, related_name='reusableItem_votes_yes')
     change_request_votes_no = models.ManyToManyField(USER, blank=True, related_name='reusableItem_votes_no')
 
-    # these should never be saved. They are generated dynamically by the serializer.
-    change_request_votes_yes_count = models.IntegerField(blank=True, null=True)
-    change_request_votes_no_count = models.IntegerField(blank=True, null=True)
+    # the number of votes on the change request, kept in step with the vote tables by voting.py
+    change_request_votes_yes_count = models.IntegerField(default=0, editable=False)
+    change_request_votes_no_count = models.IntegerField(default=0, editable=False)
+
+    # changed each time a change request is resolved, so that a vote or resolution by a request that read
+    # an earlier change request is not applied, see voting.py
+    change_request_version = models.IntegerField(default=0, editable=False)
+
+    # this should never be saved. It is generated dynamically by the serializer.
     change_request_my_vote = models.CharField(max_length=255, blank=True, null=True)
 
+    # number of users who reference this reusableItem in any topTenList
+    # this is maintained by references.py, see ReusableItemUser
+    users_count = models.IntegerField(default=0, editable=False)
+
     # blank=True says the field is not required in forms. This is necessary for Django admin interface to work.
     # default=... provides a default value to the database.
-    
+
+    objects = ReusableItemQuerySet.as_manager()
+
+    # updated in the database by references.py and voting.py while an instance may be held in memory
+    # so an existing reusableItem must not write back their stale values
+    database_fields = ('users_count', 'change_request_votes_yes_count', 'change_request_votes_no_count', 'change_request_version')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['is_public', 'name'], name='reusableitem_public_name_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [field.name for field in self._meta.concrete_fields if not field.primary_key and field.name not in self.database_fields]
+
+        super(ReusableItem, self).save(*args, **kwargs)
+
+
+class ReusableItemHistory(models.Model):
+    """
+    An entry in a reusableItem's history: its first version, then each change request as it is resolved
+    Entries are only ever added, one row each, see history.py
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    reusableItem = models.ForeignKey(ReusableItem, on_delete=models.CASCADE, related_name='reusableItemHistory', editable=False)
+    order = models.IntegerField(editable=False) # position in the reusableItem's history, from 0
+    created_at = models.DateTimeField(default=timezone.now, editable=False) # not auto_now_add, so that existing history could be copied with its dates
+    entry = JSONField(default=dict) # the version or resolved change request
+
+    class Meta:
+        unique_together = ('reusableItem', 'order')
+        ordering = ['order']
+
+
+class ReusableItemUser(models.Model):
+    """
+    A user who references a reusableItem in any of their topTenLists
+    Maintained by references.py when topTenItems and topTenLists are saved or deleted
+    so that voting on a change request does not need to search the topTenLists
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    reusableItem = models.ForeignKey(ReusableItem, on_delete=models.CASCADE, related_name='reusableItemUser')
+    user = models.ForeignKey(USER, on_delete=models.CASCADE, related_name='reusableItemUser_user')
+
+    class Meta:
+        unique_together = ('reusableItem', 'user')
+
 
 class TopTenItem(models.Model):
     """
@@ -80,6 +179,10 @@ class TopTenItem(models.Model):
     class Meta:
         # unique_together = ('topTenList', 'order') # not using this because it prevents topTenItems from being swapped because deferred is not available in mysql
         ordering = ['order']
+        indexes = [
+            models.Index(fields=['topTenList', 'order'], name='toptenitem_list_order_idx'),
+            models.Index(fields=['reusableItem', 'topTenList'], name='toptenitem_reusable_list_idx'),
+        ]
 
     def __unicode__(self):
         return '%d: %s' % (self.order, self.name)
@@ -110,3 +213,49 @@ class Notification(models.Model):
     unread = models.BooleanField(default=True)
     new = models.BooleanField(default=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_by', 'created_at'], name='notification_owner_created_idx'),
+        ]
+
+
+class NotificationJob(models.Model):
+    """
+    A notification waiting to be created for every user who references a reusableItem
+    The job is queued by the request and run when it commits, or by the processnotifications command, see fanout.py
+    last_user records progress so that a retried job does not notify anybody twice
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True, editable=False)
+
+    context = models.CharField(max_length=255, blank=True, default='') # copied to each Notification
+    event = models.CharField(max_length=5000, blank=True, default='') # copied to each Notification
+    reusableItem = models.ForeignKey(ReusableItem, on_delete=models.CASCADE, related_name='notificationJob') # nobody is notified about a deleted reusableItem
+    exclude_user = models.ForeignKey(USER, on_delete=models.SET_NULL, blank=True, null=True, related_name='notificationJob_exclude_user') # e.g. the user who made the change request
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.IntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now) # a failed job waits before it is retried
+    locked_at = models.DateTimeField(blank=True, null=True) # when a worker took the job
+    finished_at = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True, default='')
+
+    last_user = models.UUIDField(blank=True, null=True) # users are notified in order of id
+    notifications_created = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='notificationjob_status_idx'),
+        ]
@@ -0,0 +1,144 @@
+"""
+Keyset pagination for topTenLists ordered by name
+
+Each page continues from the (name, id) of the last topTenList on the previous page,
+so a deep page costs the same as the first and no COUNT is needed.
+"""
+
+import base64
+import json
+import uuid
+from collections import OrderedDict
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetOrLimitOffsetPagination(LimitOffsetPagination):
+    """
+    With URL parameter pagination=cursor, or a cursor from a previous page, topTenLists are returned in pages
+    ordered by name and id, with links to the next and previous pages
+    Otherwise limit and offset work as before
+    """
+    cursor_query_param = 'cursor'
+    mode_query_param = 'pagination'
+    default_page_size = 20
+    max_page_size = 100
+    ordering = ('name', 'id')
+    invalid_cursor_message = 'Invalid cursor'
+
+    def use_keyset(self, request):
+        return request.query_params.get(self.mode_query_param) == 'cursor' or self.cursor_query_param in request.query_params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.use_keyset(request)
+
+        if not self.keyset:
+            return super(KeysetOrLimitOffsetPagination, self).paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        reverse = cursor is not None and cursor['reverse']
+
+        # any other ordering, such as search rank, is replaced
+        if reverse:
+            queryset = queryset.order_by(*['-' + field for field in self.ordering])
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if cursor is not None:
+            name, pk = cursor['position']
+
+            # name__gte lets the database start from the position in the (name, id) index
+            if reverse:
+                queryset = queryset.filter(Q(name__lte=name) & (Q(name__lt=name) | Q(id__lt=pk)))
+            else:
+                queryset = queryset.filter(Q(name__gte=name) & (Q(name__gt=name) | Q(id__gt=pk)))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+
+        if reverse:
+            results.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+
+        else:
+            self.has_next = has_more
+            self.has_previous = cursor is not None
+
+        self.page = results
+
+        return results
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.limit_query_param, self.default_page_size))
+
+        except ValueError:
+            return self.default_page_size
+
+        return max(min(page_size, self.max_page_size), 1)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+
+        if not encoded:
+            return None
+
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+
+            return {'position': (str(data['n']), uuid.UUID(data['i'])), 'reverse': bool(data.get('r'))}
+
+        except (TypeError, ValueError, KeyError, AttributeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, topTenList, reverse):
+        # a page read with values(), see profiles.py, has dicts instead of topTenLists
+        if isinstance(topTenList, dict):
+            data = {'n': topTenList['name'], 'i': str(topTenList['id'])}
+        else:
+            data = {'n': topTenList.name, 'i': str(topTenList.id)}
+
+        if reverse:
+            data['r'] = 1
+
+        encoded = base64.urlsafe_b64encode(json.dumps(data).encode('utf-8')).decode('ascii')
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.offset_query_param)
+
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super(KeysetOrLimitOffsetPagination, self).get_next_link()
+
+        if not self.has_next or len(self.page) == 0:
+            return None
+
+        return self.encode_cursor(self.page[-1], False)
+
+    def get_previous_link(self):
+        if not self.keyset:
+            return super(KeysetOrLimitOffsetPagination, self).get_previous_link()
+
+        if not self.has_previous or len(self.page) == 0:
+            return None
+
+        return self.encode_cursor(self.page[0], True)
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super(KeysetOrLimitOffsetPagination, self).get_paginated_response(data)
+
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data)
+        ]))
@@ -0,0 +1,14 @@
+from rest_framework.parsers import BaseParser
+
+class NDJSONParser(BaseParser):
+    """
+    request.data is an iterator over the lines of the body, so a large upload is not read into memory
+    Each line is bytes and is parsed by the view
+    """
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if stream is None:
+            return iter(())
+
+        return iter(stream.readline, b'')
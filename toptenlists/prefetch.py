@@ -0,0 +1,66 @@
+"""
+Prefetch the related objects each serializer needs, according to the expand and fields parameters
+
+Without these, serializing a topTenList queries its topTenItems, and each topTenItem queries its topTenList,
+its reusableItem and the reusableItem's votes.
+"""
+
+from django.db.models import Prefetch
+
+from .models import ReusableItem
+
+def get_requested_fields(view):
+    """
+    Return (expand, fields) as the flex fields serializer will see them
+    fields is None if all fields are returned
+    """
+    request = view.request
+    context = view.get_serializer_context()
+
+    if context.get('expandable') is False:
+        # FlexFieldsModelViewSet list only allows the expands in permit_list_expands
+        expand = list(context.get('force_expand', []))
+    else:
+        expand = (request.query_params.get('expand') or '').split(',')
+
+    fields = request.query_params.get('fields')
+
+    if request.method != 'GET' or not fields:
+        return [field for field in expand if field], None
+
+    return [field for field in expand if field], fields.split(',')
+
+def prefetch_reusable_item_votes(request, lookup):
+    """
+    Prefetch reusableItems with their change request vote counts and the user's vote annotated
+    so nested reusableItems are serialized without further queries
+    """
+    return Prefetch(lookup, queryset=ReusableItem.objects.with_votes(request.user))
+
+def get_topTenList_prefetch_lookups(view):
+    expand, fields = get_requested_fields(view)
+
+    if fields is not None and 'topTenItem' not in fields:
+        return []
+
+    # the expanded topTenItem only has its own fields
+    if 'topTenItem' in expand:
+        return ['topTenItem']
+
+    # the prefetched topTenItems have their topTenList set, for created_by_username
+    return ['topTenItem', prefetch_reusable_item_votes(view.request, 'topTenItem__reusableItem')]
+
+def get_topTenItem_prefetch_lookups(view):
+    expand, fields = get_requested_fields(view)
+
+    if fields is not None and 'reusableItem' not in fields:
+        return []
+
+    return [prefetch_reusable_item_votes(view.request, 'reusableItem')]
+
+def get_notification_prefetch_lookups(view):
+    # notifications always include their topTenItem and reusableItem in full
+    return [
+        prefetch_reusable_item_votes(view.request, 'topTenItem__reusableItem'),
+        prefetch_reusable_item_votes(view.request, 'reusableItem'),
+    ]
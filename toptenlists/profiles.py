@@ -0,0 +1,156 @@
+"""
+Named serialization profiles for list views
+
+With URL parameter profile=summary or profile=card, a list view returns fewer fields, read with values()
+so that no model instances or DRF serializer fields are created. profile=full, the default,
+uses the viewset's serializer as before.
+
+Each profile is a FlatProfile, built once when this module is imported: it knows which columns to read
+and which of them need converting, e.g. uuids to strings and datetimes to the format DRF uses.
+A profile may include the rows of a related model, e.g. a topTenList card includes its topTenItems;
+these are read with one more query for the whole page.
+
+The fields of each profile have the same names and values as the full serializer gives them.
+"""
+
+from collections import OrderedDict
+
+from django.db import models
+from rest_framework import serializers
+from rest_framework.exceptions import ParseError
+from rest_framework.response import Response
+
+from .models import TopTenList, TopTenItem, ReusableItem
+
+PROFILE_PARAM = 'profile'
+DEFAULT_PROFILE = 'full'
+
+def get_converter(model_field):
+    """
+    Return a function to convert a value from values() to what the full serializer returns, or None if it is unchanged
+    """
+    if isinstance(model_field, (models.UUIDField, models.ForeignKey)):
+        return str
+
+    if isinstance(model_field, models.DateTimeField):
+        return serializers.DateTimeField().to_representation
+
+    return None
+
+class FlatProfile(object):
+    """
+    fields are names for values(), e.g. 'topTenList_id'
+    children maps an output name to (FlatProfile, the name of the child's foreign key to this model)
+    """
+    def __init__(self, model, fields, children=None):
+        self.model = model
+        self.fields = tuple(fields)
+        self.children = children or {}
+
+        self.converters = []
+
+        for name in self.fields:
+            converter = get_converter(self.get_model_field(name))
+
+            if converter is not None:
+                self.converters.append((name, converter))
+
+    def get_model_field(self, name):
+        for model_field in self.model._meta.concrete_fields:
+            if name in (model_field.name, model_field.attname):
+                return model_field
+
+        raise ValueError('%s has no field %s' % (self.model.__name__, name))
+
+    def get_rows(self, queryset):
+        """
+        A queryset of dicts, which can be filtered, ordered and paginated like the model queryset
+        """
+        return queryset.prefetch_related(None).values(*self.fields)
+
+    def add_children(self, rows):
+        ids = [row['id'] for row in rows]
+
+        for name, (profile, foreign_key) in self.children.items():
+            found = OrderedDict((pk, []) for pk in ids)
+            child_rows = profile.model.objects.filter(**{foreign_key + '__in': ids}).values(foreign_key, *profile.fields)
+
+            for child_row in child_rows:
+                found[child_row.pop(foreign_key)].append(child_row)
+
+            for row in rows:
+                row[name] = profile.serialize(found[row['id']])
+
+    def serialize(self, rows):
+        """
+        Return the data for a list of rows read by get_rows
+        """
+        rows = list(rows)
+
+        if len(rows) > 0 and len(self.children) > 0:
+            self.add_children(rows)
+
+        for name, converter in self.converters:
+            for row in rows:
+                value = row[name]
+
+                if value is not None:
+                    row[name] = converter(value)
+
+        return rows
+
+TOPTENITEM_SUMMARY_FIELDS = ('id', 'name', 'order', 'topTenList_id')
+
+PROFILES = {
+    TopTenList: {
+        'summary': FlatProfile(TopTenList, ('id', 'name', 'created_by_username')),
+        'card': FlatProfile(
+            TopTenList,
+            ('id', 'name', 'description', 'is_public', 'created_by', 'created_by_username', 'created_at', 'modified_at'),
+            children={'topTenItem': (FlatProfile(TopTenItem, ('id', 'name', 'order', 'reusableItem_id')), 'topTenList_id')},
+        ),
+    },
+    TopTenItem: {
+        'summary': FlatProfile(TopTenItem, TOPTENITEM_SUMMARY_FIELDS),
+        'card': FlatProfile(TopTenItem, TOPTENITEM_SUMMARY_FIELDS + ('description', 'modified_at', 'reusableItem_id')),
+    },
+    ReusableItem: {
+        'summary': FlatProfile(ReusableItem, ('id', 'name')),
+        'card': FlatProfile(ReusableItem, ('id', 'name', 'definition', 'link', 'is_public', 'created_by', 'created_by_username', 'created_at')),
+    },
+}
+
+class ProfileListMixin(object):
+    """
+    Use with a viewset to let list requests choose a profile
+    The viewset's model must be in PROFILES
+    """
+    def get_profile(self):
+        """
+        Return the FlatProfile for the request, or None for the full serializer
+        """
+        name = self.request.query_params.get(PROFILE_PARAM, DEFAULT_PROFILE)
+
+        if name == DEFAULT_PROFILE or self.action != 'list':
+            return None
+
+        profiles = PROFILES[self.model]
+
+        if name not in profiles:
+            raise ParseError('profile must be one of: %s' % ', '.join(sorted(list(profiles) + [DEFAULT_PROFILE])))
+
+        return profiles[name]
+
+    def list(self, request, *args, **kwargs):
+        profile = self.get_profile()
+
+        if profile is None:
+            return super(ProfileListMixin, self).list(request, *args, **kwargs)
+
+        rows = profile.get_rows(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+
+        if page is not None:
+            return self.get_paginated_response(profile.serialize(page))
+
+        return Response(profile.serialize(rows))
@@ -0,0 +1,168 @@
+"""
+Publish messages to channels and wait for them, so that new notifications can be pushed to users
+
+Each channel numbers its messages in order. A subscriber asks for the messages after the last number it has seen,
+and waits if there are none, so a client that reconnects with its last number does not miss a message
+unless it has already been discarded. Only the most recent messages on each channel are kept.
+
+Two backends are provided:
+CachePubSub keeps the messages in the toptenlists cache, see cache.py. It is the default. With a shared cache,
+such as the database cache used in production, messages published by one process, for example
+the processnotifications worker, reach subscribers in every process.
+Waiting subscribers read the cache every TOPTENLISTS_PUBSUB_INTERVAL seconds; the Notification table is not read.
+InMemoryPubSub works within one process, so it only suits a single server process and tests.
+
+A message can still be lost, e.g. if the cache evicts it, so the counts returned with each long poll are read
+from the database or a shared cache, and the client fetches its notifications again when they do not match its own.
+
+The backend is set by TOPTENLISTS_PUBSUB_BACKEND in settings.
+"""
+
+import collections
+import threading
+import time
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .cache import get_cache
+
+MAX_MESSAGES = 100 # kept for each channel
+
+class InMemoryPubSub(object):
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.channels = {}
+
+    def get_channel(self, channel):
+        if channel not in self.channels:
+            self.channels[channel] = {'last': 0, 'messages': collections.deque(maxlen=MAX_MESSAGES)}
+
+        return self.channels[channel]
+
+    def publish(self, channel, message):
+        with self.condition:
+            data = self.get_channel(channel)
+            data['last'] = data['last'] + 1
+            data['messages'].append((data['last'], message))
+            self.condition.notify_all()
+
+            return data['last']
+
+    def read(self, data, after):
+        """
+        Return (messages, last, missed)
+        """
+        if after is None:
+            return [], data['last'], False
+
+        # after is ahead if this process has restarted
+        missed = after > data['last'] or (len(data['messages']) > 0 and data['messages'][0][0] > after + 1)
+
+        return [message for number, message in data['messages'] if number > after], data['last'], missed
+
+    def wait(self, channel, after=None, timeout=0):
+        """
+        Return (messages published after number after, the last number, whether messages were missed)
+        Wait up to timeout seconds for a message if there are none
+        If after is None, only messages published from now on are returned
+        """
+        deadline = time.time() + timeout
+
+        with self.condition:
+            data = self.get_channel(channel)
+
+            if after is None:
+                after = data['last']
+
+            while True:
+                messages, last, missed = self.read(data, after)
+                remaining = deadline - time.time()
+
+                if len(messages) > 0 or missed or remaining <= 0:
+                    return messages, last, missed
+
+                self.condition.wait(remaining)
+
+
+class CachePubSub(object):
+    def __init__(self, interval=None):
+        if interval is None:
+            interval = getattr(settings, 'TOPTENLISTS_PUBSUB_INTERVAL', 0.5)
+
+        self.interval = interval # seconds between reads of the cache by a waiting subscriber
+
+    def get_last_key(self, channel):
+        return 'pubsub:%s:last' % channel
+
+    def get_message_key(self, channel, number):
+        return 'pubsub:%s:%d' % (channel, number)
+
+    def get_timeout(self):
+        return getattr(settings, 'TOPTENLISTS_PUBSUB_MESSAGE_TIMEOUT', 300)
+
+    def publish(self, channel, message):
+        cache = get_cache()
+        key = self.get_last_key(channel)
+
+        cache.add(key, 0, None)
+
+        try:
+            last = cache.incr(key)
+
+        except ValueError: # evicted since add
+            cache.add(key, 1, None)
+            last = 1
+
+        cache.set(self.get_message_key(channel, last), message, self.get_timeout())
+
+        return last
+
+    def get_last(self, channel):
+        return get_cache().get(self.get_last_key(channel), 0)
+
+    def wait(self, channel, after=None, timeout=0):
+        """
+        As InMemoryPubSub.wait
+        """
+        deadline = time.time() + timeout
+        last = self.get_last(channel)
+
+        if after is None:
+            after = last
+
+        while last == after and time.time() < deadline:
+            time.sleep(min(self.interval, max(deadline - time.time(), 0)))
+            last = self.get_last(channel)
+
+        if last < after:
+            return [], last, True
+
+        first = max(after + 1, last - MAX_MESSAGES + 1)
+        keys = [self.get_message_key(channel, number) for number in range(first, last + 1)]
+        found = get_cache().get_many(keys)
+
+        return [found[key] for key in keys if key in found], last, first > after + 1 or len(found) < len(keys)
+
+
+_pubsub = None
+
+def get_pubsub():
+    global _pubsub
+
+    if _pubsub is None:
+        _pubsub = import_string(getattr(settings, 'TOPTENLISTS_PUBSUB_BACKEND', None) or 'toptenlists.pubsub.CachePubSub')()
+
+    return _pubsub
+
+def get_notification_channel(user_id):
+    return 'notification:%s' % user_id
+
+def publish_notifications(notifications):
+    """
+    Tell each notification's user about it
+    """
+    pubsub = get_pubsub()
+
+    for notification in notifications:
+        pubsub.publish(get_notification_channel(notification.created_by_id), str(notification.id))
@@ -0,0 +1,88 @@
+"""
+Keep track of which users reference each reusableItem
+
+A user references a reusableItem if a topTenItem in any of their topTenLists references it.
+ReusableItemUser records each such user and ReusableItem.users_count counts them,
+so that change request voting can find and count the users without searching the topTenLists.
+
+signals.py and TopTenListSerializer.create call update_reusable_item_users with the
+(reusableItem, user) pairs that a write may have changed.
+The rebuildreusableitemusers management command checks and repairs everything with rebuild_reusable_item_users.
+"""
+
+from django.db.models import Count
+
+from .models import ReusableItem, ReusableItemUser, TopTenItem
+
+def _sync(reusableItem_ids, referenced, existing):
+    """
+    referenced: set of (reusableItem_id, user_id) that should have a ReusableItemUser
+    existing: dict of {(reusableItem_id, user_id): ReusableItemUser id} for the rows that do
+    only pairs in referenced or existing are changed
+    then users_count is recounted for each of reusableItem_ids
+    """
+    to_add = [ReusableItemUser(reusableItem_id=reusableItem_id, user_id=user_id) for (reusableItem_id, user_id) in referenced if (reusableItem_id, user_id) not in existing]
+    to_remove = [pk for key, pk in existing.items() if key not in referenced]
+
+    ReusableItemUser.objects.bulk_create(to_add)
+
+    if len(to_remove) > 0:
+        ReusableItemUser.objects.filter(id__in=to_remove).delete()
+
+    counts = dict(ReusableItemUser.objects.filter(reusableItem_id__in=reusableItem_ids).order_by().values('reusableItem').annotate(count=Count('id')).values_list('reusableItem', 'count'))
+
+    corrected = 0
+
+    for reusableItem_id, users_count in ReusableItem.objects.filter(id__in=reusableItem_ids).values_list('id', 'users_count'):
+        count = counts.get(reusableItem_id, 0)
+
+        if users_count != count:
+            ReusableItem.objects.filter(pk=reusableItem_id).update(users_count=count)
+            corrected = corrected + 1
+
+    return {'added': len(to_add), 'removed': len(to_remove), 'corrected': corrected}
+
+def update_reusable_item_users(references):
+    """
+    references: iterable of (reusableItem_id, user_id) whose topTenItems may have changed
+    """
+    references = {(reusableItem_id, user_id) for (reusableItem_id, user_id) in references if reusableItem_id is not None and user_id is not None}
+
+    if len(references) == 0:
+        return
+
+    reusableItem_ids = {reusableItem_id for (reusableItem_id, user_id) in references}
+    user_ids = {user_id for (reusableItem_id, user_id) in references}
+
+    referenced = set(TopTenItem.objects.filter(reusableItem_id__in=reusableItem_ids, topTenList__created_by_id__in=user_ids).order_by().values_list('reusableItem', 'topTenList__created_by').distinct()) & references
+
+    existing = {}
+
+    for pk, reusableItem_id, user_id in ReusableItemUser.objects.filter(reusableItem_id__in=reusableItem_ids, user_id__in=user_ids).values_list('id', 'reusableItem', 'user'):
+        if (reusableItem_id, user_id) in references:
+            existing[(reusableItem_id, user_id)] = pk
+
+    _sync(reusableItem_ids, referenced, existing)
+
+def rebuild_reusable_item_users(batch_size=1000):
+    """
+    Check every reusableItem against its topTenItems and repair ReusableItemUser and users_count
+    returns the number of rows added and removed and the number of users_count values corrected
+    """
+    totals = {'added': 0, 'removed': 0, 'corrected': 0}
+
+    reusableItem_ids = list(ReusableItem.objects.order_by('id').values_list('id', flat=True))
+
+    for start in range(0, len(reusableItem_ids), batch_size):
+        batch = reusableItem_ids[start:start + batch_size]
+
+        referenced = set(TopTenItem.objects.filter(reusableItem_id__in=batch).order_by().values_list('reusableItem', 'topTenList__created_by').distinct())
+
+        existing = {(reusableItem_id, user_id): pk for pk, reusableItem_id, user_id in ReusableItemUser.objects.filter(reusableItem_id__in=batch).values_list('id', 'reusableItem', 'user')}
+
+        result = _sync(batch, referenced, existing)
+
+        for key in totals:
+            totals[key] = totals[key] + result[key]
+
+    return totals
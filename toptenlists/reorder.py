@@ -0,0 +1,81 @@
+"""
+Change the order of the topTenItems in a topTenList
+
+The new orders are written with a single UPDATE ... CASE in a transaction,
+after locking the topTenList's topTenItems so that two requests cannot leave duplicate orders.
+update() does not send signals, so the cached topTenList is invalidated here.
+"""
+
+from django.db import transaction
+from django.db.models import Case, IntegerField, Value, When
+
+from .cache import invalidate_topTenLists
+from .models import TopTenItem
+
+class ReorderError(ValueError):
+    pass
+
+def _lock_orders(topTenList_id):
+    """
+    Return {topTenItem id: order} for the topTenList, locking the rows until the transaction ends
+    """
+    return dict(TopTenItem.objects.select_for_update().filter(topTenList_id=topTenList_id).values_list('id', 'order'))
+
+def _update_orders(current_orders, new_orders):
+    """
+    new_orders maps some of the topTenItems in current_orders to new orders
+    which must be a rearrangement of their current orders
+    """
+    if not set(new_orders).issubset(current_orders):
+        raise ReorderError('TopTenItems must belong to the TopTenList')
+
+    if sorted(new_orders.values()) != sorted(current_orders[pk] for pk in new_orders):
+        raise ReorderError('TopTenItems can only exchange their orders')
+
+    changed = {pk: order for pk, order in new_orders.items() if current_orders[pk] != order}
+
+    if len(changed) > 0:
+        TopTenItem.objects.filter(pk__in=changed).update(order=Case(
+            *[When(pk=pk, then=Value(order)) for pk, order in changed.items()],
+            output_field=IntegerField(),
+        ))
+
+    return changed
+
+def reorder_topTenItems(topTenList_id, topTenItem_ids):
+    """
+    topTenItem_ids lists every topTenItem in the topTenList in the new order, first at the top
+    Return {topTenItem id: order} for the topTenItems that moved
+    """
+    with transaction.atomic():
+        current_orders = _lock_orders(topTenList_id)
+
+        if len(topTenItem_ids) != len(current_orders) or set(topTenItem_ids) != set(current_orders):
+            raise ReorderError('Every TopTenItem in the TopTenList must be given exactly once')
+
+        # the topTenList's orders are kept, so a list with gaps keeps its gaps
+        orders = sorted(current_orders.values())
+        changed = _update_orders(current_orders, dict(zip(topTenItem_ids, orders)))
+
+    invalidate_topTenLists([topTenList_id])
+
+    return changed
+
+def move_topTenItem_up(topTenItem):
+    """
+    Swap the topTenItem with the one above it
+    """
+    with transaction.atomic():
+        current_orders = _lock_orders(topTenItem.topTenList_id)
+        order = current_orders[topTenItem.pk]
+
+        above = [pk for pk, other_order in current_orders.items() if other_order == order - 1]
+
+        if order == 1 or len(above) == 0:
+            raise ReorderError('TopTenItem is already at top of TopTenList')
+
+        changed = _update_orders(current_orders, {topTenItem.pk: order - 1, above[0]: order})
+
+    invalidate_topTenLists([topTenItem.topTenList_id])
+
+    return changed
@@ -0,0 +1,370 @@
+"""
+Full text search for topTenLists, topTenItems and reusableItems
+
+The search term is split into words and every word must match the start of a word in the field,
+so 'jan aus' finds 'Jane Austen' but 'sten' does not. search() ranks the results with the best matches first,
+a whole word ranking above the start of a word; filter() keeps the queryset's own order.
+
+Two backends are provided:
+MySQLFullTextSearchBackend uses the FULLTEXT indexes created by migration 0010, with InnoDB's built-in parser.
+InvertedIndexSearchBackend keeps an inverted index in memory, for databases without full text search such as SQLite in tests.
+
+The backend is set by TOPTENLISTS_SEARCH_BACKEND in settings.
+If that is None, the backend is chosen to suit the database.
+
+The backends only filter and order the queryset they are given,
+so permission filtering (public or own) must already have been applied by the view.
+"""
+
+import bisect
+import operator
+import re
+import threading
+from functools import reduce
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.utils.module_loading import import_string
+from rest_framework import filters
+
+# words are runs of letters and numbers, so MySQL boolean mode operators are never passed through
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+def get_words(text):
+    return WORD_RE.findall((text or '').lower())
+
+
+class BaseSearchBackend(object):
+    """
+    A search backend filters a queryset to the rows whose fields match every word of the search term
+    and orders them by rank, best first
+    """
+    def search(self, queryset, fields, term):
+        raise NotImplementedError('search() must be implemented')
+
+    def filter(self, queryset, fields, term):
+        """
+        As search, but the queryset keeps its order, e.g. for a paginated list
+        """
+        raise NotImplementedError('filter() must be implemented')
+
+    def update(self, model, instances):
+        """
+        Index instances that were saved without sending post_save, e.g. by bulk_create or update()
+        """
+        pass
+
+    def remove(self, model, pks):
+        pass
+
+
+class MySQLFullTextSearchBackend(BaseSearchBackend):
+    """
+    MATCH ... AGAINST in boolean mode
+    Each word is required, and is matched as the start of a word: '+jan*'.
+    A second MATCH without the wildcard ranks whole words higher.
+
+    Words shorter than innodb_ft_min_token_size (3 by default) are not indexed, so a search word that short
+    is matched against the start of each word with REGEXP instead, and does not add to the rank.
+    The indexes are created with stopwords disabled, so words such as 'the' are indexed and can be searched for;
+    innodb_ft_enable_stopword need not be changed on the server.
+    """
+    def __init__(self):
+        self.min_token_size = None
+
+    def get_min_token_size(self):
+        if self.min_token_size is None:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT @@innodb_ft_min_token_size')
+                self.min_token_size = cursor.fetchone()[0]
+
+        return self.min_token_size
+
+    def get_matches(self, queryset, fields):
+        table = queryset.model._meta.db_table
+
+        return ['MATCH(`%s`.`%s`) AGAINST (%%s IN BOOLEAN MODE)' % (table, queryset.model._meta.get_field(field).column) for field in fields]
+
+    def filter_words(self, queryset, fields, words):
+        """
+        Return the filtered queryset and the indexed words
+        """
+        min_token_size = self.get_min_token_size()
+        indexed_words = [word for word in words if len(word) >= min_token_size]
+
+        for word in words:
+            if len(word) < min_token_size:
+                # the word is only letters and numbers, so it is safe in the regular expression
+                queryset = queryset.filter(reduce(operator.or_, [Q(**{field + '__iregex': '(^|[^[:alnum:]])' + word}) for field in fields]))
+
+        if len(indexed_words) > 0:
+            matches = self.get_matches(queryset, fields)
+            against = ' '.join('+' + word + '*' for word in indexed_words)
+
+            queryset = queryset.extra(
+                where=['(' + ' OR '.join(matches) + ')'],
+                params=[against] * len(matches),
+            )
+
+        return queryset, indexed_words
+
+    def filter(self, queryset, fields, term):
+        words = get_words(term)
+
+        if len(words) == 0:
+            return queryset
+
+        return self.filter_words(queryset, fields, words)[0]
+
+    def search(self, queryset, fields, term):
+        words = get_words(term)
+
+        if len(words) == 0:
+            return queryset
+
+        queryset, indexed_words = self.filter_words(queryset, fields, words)
+
+        if len(indexed_words) == 0:
+            return queryset.order_by(*fields)
+
+        matches = self.get_matches(queryset, fields)
+        prefixes = ' '.join(word + '*' for word in indexed_words)
+        whole_words = ' '.join(indexed_words)
+
+        return queryset.extra(
+            select={'search_rank': ' + '.join(matches * 2)},
+            select_params=[prefixes] * len(matches) + [whole_words] * len(matches),
+        ).order_by('-search_rank', *fields)
+
+
+class InvertedIndex(object):
+    """
+    Map each word to the primary keys of the rows whose field contains it
+    The vocabulary is kept sorted so that words starting with a prefix can be found with bisect
+    """
+    def __init__(self):
+        self.postings = {} # word: set of pk
+        self.documents = {} # pk: tuple of words
+        self.vocabulary = [] # sorted list of words
+
+    def add(self, pk, text):
+        self.remove(pk)
+
+        words = tuple(set(get_words(text)))
+        self.documents[pk] = words
+
+        for word in words:
+            if word not in self.postings:
+                self.postings[word] = set()
+                bisect.insort(self.vocabulary, word)
+
+            self.postings[word].add(pk)
+
+    def remove(self, pk):
+        for word in self.documents.pop(pk, ()):
+            pks = self.postings[word]
+            pks.discard(pk)
+
+            if len(pks) == 0:
+                del self.postings[word]
+                del self.vocabulary[bisect.bisect_left(self.vocabulary, word)]
+
+    def search(self, words):
+        """
+        Return {pk: rank} for the rows that contain a word starting with each of the search words
+        A whole word match ranks above a prefix match
+        """
+        ranks = None
+
+        for word in words:
+            word_ranks = {}
+            start = bisect.bisect_left(self.vocabulary, word)
+
+            for index in range(start, len(self.vocabulary)):
+                vocabulary_word = self.vocabulary[index]
+
+                if not vocabulary_word.startswith(word):
+                    break
+
+                rank = 2 if vocabulary_word == word else 1
+
+                for pk in self.postings[vocabulary_word]:
+                    word_ranks[pk] = max(word_ranks.get(pk, 0), rank)
+
+            if ranks is None:
+                ranks = word_ranks
+            else:
+                ranks = {pk: rank + word_ranks[pk] for pk, rank in ranks.items() if pk in word_ranks}
+
+            if len(ranks) == 0:
+                break
+
+        return ranks or {}
+
+
+class InvertedIndexSearchBackend(BaseSearchBackend):
+    """
+    An index is built for each model field the first time it is searched
+    and is kept up to date by the signals in signals.py
+
+    Each process has its own index, so this is intended for development and tests.
+    Candidates are read back through the view's queryset, best first, so rows the user may not see
+    and stale entries are skipped rather than taking the place of the user's matches.
+    Only the best TOPTENLISTS_SEARCH_MAX_RESULTS matches are returned, to keep the query within SQLite's parameter limit.
+    """
+    def __init__(self):
+        self.indexes = {} # (model label, field): InvertedIndex
+        self.lock = threading.Lock()
+
+    @property
+    def max_results(self):
+        return getattr(settings, 'TOPTENLISTS_SEARCH_MAX_RESULTS', 300)
+
+    def get_index(self, model, field):
+        key = (model._meta.label, field)
+
+        if key not in self.indexes:
+            index = InvertedIndex()
+
+            for pk, text in model._default_manager.values_list('pk', field).iterator():
+                index.add(pk, text)
+
+            self.indexes[key] = index
+
+        return self.indexes[key]
+
+    def get_best(self, queryset, ranks):
+        """
+        The best max_results candidates that are in the queryset, best first
+        Candidates are checked max_results at a time, stopping once enough are found
+        """
+        candidates = sorted(ranks, key=ranks.get, reverse=True)
+        best = []
+
+        for start in range(0, len(candidates), self.max_results):
+            chunk = candidates[start:start + self.max_results]
+            found = set(queryset.filter(pk__in=chunk).values_list('pk', flat=True))
+            best.extend(pk for pk in chunk if pk in found)
+
+            if len(best) >= self.max_results:
+                break
+
+        return best[:self.max_results]
+
+    def search(self, queryset, fields, term):
+        words = get_words(term)
+
+        if len(words) == 0:
+            return queryset
+
+        ranks = {}
+
+        with self.lock:
+            for field in fields:
+                for pk, rank in self.get_index(queryset.model, field).search(words).items():
+                    ranks[pk] = ranks.get(pk, 0) + rank
+
+        if len(ranks) > self.max_results:
+            best = self.get_best(queryset, ranks)
+
+        else:
+            best = list(ranks)
+
+        if len(best) == 0:
+            return queryset.none()
+
+        queryset = queryset.filter(pk__in=best)
+
+        for word in words:
+            word_filter = Q()
+
+            for field in fields:
+                word_filter |= Q(**{field + '__icontains': word})
+
+            queryset = queryset.filter(word_filter)
+
+        # one When per rank value rather than per row
+        pks_by_rank = {}
+
+        for pk in best:
+            pks_by_rank.setdefault(ranks[pk], []).append(pk)
+
+        return queryset.annotate(search_rank=Case(
+            *[When(pk__in=pks, then=Value(rank)) for rank, pks in pks_by_rank.items()],
+            default=Value(0),
+            output_field=IntegerField(),
+        )).order_by('-search_rank', *fields)
+
+    def filter(self, queryset, fields, term):
+        """
+        The matching rows, in the queryset's order
+        If there are more than max_results candidates, each word is matched against the start of a word by the database instead
+        """
+        words = get_words(term)
+
+        if len(words) == 0:
+            return queryset
+
+        with self.lock:
+            candidates = set()
+
+            for field in fields:
+                candidates.update(self.get_index(queryset.model, field).search(words))
+
+        if len(candidates) <= self.max_results:
+            queryset = queryset.filter(pk__in=list(candidates))
+
+        # the index may have stale entries, so the words are checked by the database
+        for word in words:
+            queryset = queryset.filter(reduce(operator.or_, [Q(**{field + '__iregex': r'(^|\W)' + word}) for field in fields]))
+
+        return queryset
+
+    def update(self, model, instances):
+        with self.lock:
+            for (label, field), index in self.indexes.items():
+                if label == model._meta.label:
+                    for instance in instances:
+                        index.add(instance.pk, getattr(instance, field))
+
+    def remove(self, model, pks):
+        with self.lock:
+            for (label, field), index in self.indexes.items():
+                if label == model._meta.label:
+                    for pk in pks:
+                        index.remove(pk)
+
+
+_search_backend = None
+
+def get_search_backend():
+    global _search_backend
+
+    if _search_backend is None:
+        backend_path = getattr(settings, 'TOPTENLISTS_SEARCH_BACKEND', None)
+
+        if backend_path is None:
+            if connection.vendor == 'mysql':
+                backend_path = 'toptenlists.search.MySQLFullTextSearchBackend'
+            else:
+                backend_path = 'toptenlists.search.InvertedIndexSearchBackend'
+
+        _search_backend = import_string(backend_path)()
+
+    return _search_backend
+
+
+class FullTextSearchFilter(filters.SearchFilter):
+    """
+    Replaces DRF SearchFilter, which searches with LIKE '%term%'
+    The view's search_fields are searched with the search backend
+    """
+    def filter_queryset(self, request, queryset, view):
+        search_fields = getattr(view, 'search_fields', None)
+        term = request.query_params.get(self.search_param, '')
+
+        if not search_fields or not term.strip():
+            return queryset
+
+        return get_search_backend().search(queryset, search_fields, term)
@@ -2,7 +2,7 @@ from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 from django.utils import timezone
 from rest_framework.response import Response
-from allauth.account.models import EmailAddress
+from users.verified import is_email_verified
 
 from django.contrib.auth import get_user_model
 USER = get_user_model()
@@ -16,7 +16,13 @@ from dynamic_rest.serializers import DynamicModelSerializer
 
 from rest_flex_fields import FlexFieldsModelSerializer
 
-from .models import TopTenList, TopTenItem, ReusableItem, Notification
+from .models import TopTenList, TopTenItem, ReusableItem, ReusableItemHistory, Notification
+from .references import update_reusable_item_users
+from .search import get_search_backend
+from .cache import invalidate_topTenLists
+from .fanout import enqueue_notification
+from .voting import StaleChangeRequest, cast_vote, count_votes, resolve_change_request
+from .history import add_history_entry
 
 from dynamic_rest.fields import (
     CountField,
@@ -55,14 +61,21 @@ class ReusableItemSerializer(FlexFieldsModelSerializer):
         model = ReusableItem
         # note that change_request_votes_yes and change_request_votes_no must not be returned
         # they are lists of user email addresses
-        fields = ('id', 'name', 'definition', 'is_public', 'created_by', 'created_by_username', 'created_at', 'link', 'change_request_at', 'change_request', 'change_request_by', 'history', 'change_request_votes_yes_count', 'change_request_votes_no_count', 'change_request_my_vote')
+        fields = ('id', 'name', 'definition', 'is_public', 'created_by', 'created_by_username', 'created_at', 'link', 'change_request_at', 'change_request', 'change_request_by', 'change_request_votes_yes_count', 'change_request_votes_no_count', 'change_request_my_vote')
 
     # magic method name to return calculated field
     def get_change_request_my_vote(cls, instance):
         # return the user's recorded vote, if any
-        #print('cls', cls)
-        #print('cls.context', cls.context)
-        #print('get_change_request_my_vote')
+        # use the values annotated by ReusableItemQuerySet.with_votes if the view provided them
+        if hasattr(instance, 'annotated_my_vote_yes'):
+            if instance.annotated_my_vote_yes:
+                return 'yes'
+
+            if instance.annotated_my_vote_no:
+                return 'no'
+
+            return ''
+
         current_user = cls.context['request'].user
 
         if current_user in instance.change_request_votes_yes.all():
@@ -75,13 +88,13 @@ class ReusableItemSerializer(FlexFieldsModelSerializer):
 
     # magic method name
     def get_change_request_votes_yes_count(cls, instance):
-        # return the number of users who have voted yes to a change request
-        return instance.change_request_votes_yes.count()
+        # return the number of users who have voted yes to a change request, kept on the reusableItem by voting.py
+        return instance.change_request_votes_yes_count
 
     # magic method name
     def get_change_request_votes_no_count(cls, instance):
-        # return the number of users who have voted no to a change request
-            return instance.change_request_votes_no.count()
+        # return the number of users who have voted no to a change request, kept on the reusableItem by voting.py
+        return instance.change_request_votes_no_count
 
     @classmethod # required for cls to be consistently passed automatically as the first parameter. Otherwise it depends on whether you call the method with 'self.remove_my_votes()' or 'ReusableItemSerializer.remove_my_votes()'
 
@@ -89,225 +102,100 @@ class ReusableItemSerializer(FlexFieldsModelSerializer):
     def find_users(cls, instance):
         """
         find all users who reference this reusableItem in any topTenList
+        ReusableItemUser is kept up to date by references.py, so the topTenLists do not need to be searched
         """
 
-        # find the topTenItems that reference this reusableItem
-        selected_toptenitems = TopTenItem.objects.filter(reusableItem=instance)
-
-        # and find the topTenLists to which those topTenItems belong
-        selected_toptenlist_ids = selected_toptenitems.values_list('topTenList_id', flat=True)
-        selected_toptenlists = TopTenList.objects.filter(id__in=selected_toptenlist_ids)
-
-        # print('selectedTopTenLists', selected_toptenlists.values())
-
-        # and finally select the users who created these topTenLists
-        selected_userids = selected_toptenlists.values_list('created_by', flat=True)
-
-        return USER.objects.filter(id__in=selected_userids)
+        return USER.objects.filter(reusableItemUser_user__reusableItem=instance)
 
     @classmethod
     def count_users(cls, instance):
         """
         count the users who reference this reusableItem in any topTenList
+        read from the database because users_count is not updated on instances already in memory
         """
 
-        return cls.find_users(instance).count()
+        return ReusableItem.objects.filter(pk=instance.pk).values_list('users_count', flat=True).first() or 0
 
     @classmethod
-    def create_notification(cls, instance, users, data):
+    def create_notification(cls, instance, data, exclude_user=None):
         """
         Create a notification, e.g. because a change request has been submitted
-        Create it for every user in users
+        Create it for every user of the reusableItem except exclude_user
+        The notifications are created in the background, see fanout.py
         """
 
-        notificationObjs = []
-
-        for user in users:
-            NewNotificationObj = Notification(
-                context=data['context'],
-                event=data['event'],
-                created_by=user,
-                reusableItem=instance
-            )
-
-            notificationObjs.append(NewNotificationObj)
-
-        Notification.objects.bulk_create(notificationObjs)
-
-    @classmethod
-    def remove_my_votes(cls, instance, user):
-        """ remove any previous vote by this user """
-        try:
-            instance.change_request_votes_yes.remove(user)
-        except ValueError: # avoid error if user has not previously voted
-            pass
-
-        try:
-            instance.change_request_votes_no.remove(user)
-        except ValueError: # avoid error if user has not previously voted
-            pass
+        enqueue_notification(instance, data, exclude_user)
 
     @classmethod
     def cast_vote(cls, instance, user, vote):
+        """
+        Record the vote and resolve the change request if the vote decides it, see voting.py
+        """
         if instance.change_request is None:
             return
 
         # if vote is '' then the user has withdrawn their vote
         # if yes or no, add the vote
+        try:
+            cast_vote(instance, user, vote, cls.resolve_change_request)
 
-        cls.remove_my_votes(instance, user)
+        except StaleChangeRequest:
+            raise ValidationError({'update reusable item error: the change request has already been resolved'})
 
-        if vote == 'yes':
-            instance.change_request_votes_yes.add(user)
+    @classmethod
+    def remove_my_votes(cls, instance, user):
+        """
+        remove any previous vote by this user, e.g. because they no longer reference the reusableItem
+        the change request is resolved if the remaining votes decide it
+        """
+        if instance.change_request is None:
+            return
 
-        elif vote == 'no':
-            instance.change_request_votes_no.add(user)
+        try:
+            cast_vote(instance, user, '', cls.resolve_change_request)
 
-        cls.count_votes(instance)
+        except StaleChangeRequest:
+            # the change request has been resolved, or the reusableItem deleted
+            pass
 
     # process votes on a reusableItem to see if a change request has been accepted or rejected
+    # e.g. when the number of users who reference it has changed
     @classmethod
     def count_votes(cls, instance):
-        
-        # print('count_votes instance')
-        if not hasattr(instance, 'change_request'):
-            print('doesnt exist', instance)
-            return
-
         if instance.change_request is None:
             return
 
-        #print('count_votes instance', instance.change_request)
-        #print('count_votes')
-        #print('for', instance.change_request_votes_yes.count())
-        #print('against', instance.change_request_votes_no.count())
-
-        change_request_votes_yes = instance.change_request_votes_yes.count()
-        change_request_votes_no = instance.change_request_votes_no.count()
-        total_votes = change_request_votes_yes + change_request_votes_no
-
-        if total_votes == 0:
-            return
-
-        # count the users who reference this reusableItem in any topTenList
-        number_of_selected_users = cls.count_users(instance)
-        #print('number_of_selected_users', number_of_selected_users)
+        try:
+            count_votes(instance, cls.resolve_change_request)
 
-        """ voting rules
-        Once a quorum is reached, the change request is approved if enough users have voted for it, otherwise it is rejected.
+        except StaleChangeRequest:
+            # another request has resolved the change request
+            pass
 
-        number_of_users: rule applies to reusableItem referenced by this number of users, or fewer
-        quorum: number of votes that must be cast to resolve change request
-        accept_percentage: this % of votes must be cast for the change, for it to be accepted
-        elibibility_scheme: who is eligible to vote. Initially just 'A', but with the potential to have different schemes depending on the popularity of the reusableItem ('B', 'C' etc). For example, can people vote even if they only reference the reusableItem in private topTenLists?
+    @classmethod
+    def resolve_change_request(cls, instance, resolution):
         """
-        voting_rules = [
-        { # one user so change will happen immediately
-        'number_of_users': 1,
-        'quorum': 1,
-        'accept_percentage': 100,
-        'voting_scheme': 'A'
-        },
-        { # 2 users: all must vote
-        'number_of_users': 2,
-        'quorum': 2,
-        'accept_percentage': 100,
-        'voting_scheme': 'A'
-        },
-        { # 3 users
-        'number_of_users': 3,
-        'quorum': 3,
-        'accept_percentage': 60,
-        'voting_scheme': 'A'
-        },
-        { # 4 or 5 users
-        'number_of_users': 5,
-        'quorum': 3,
-        'accept_percentage': 60,
-        'voting_scheme': 'A'
-        },
-        { # 6 - 10 users
-        'number_of_users': 10,
-        'quorum': 4,
-        'accept_percentage': 70,
-        'voting_scheme': 'A'
-        },
-        { # 11 - 20 users
-        'number_of_users': 20,
-        'quorum': 6,
-        'accept_percentage': 80,
-        'voting_scheme': 'A'
-        },
-        { # 21 - 100 users
-        'number_of_users': 100,
-        'quorum': 10,
-        'accept_percentage': 80,
-        'voting_scheme': 'A'
-        },
-        { # 101 - 1000 users
-        'number_of_users': 1000,
-        'quorum': 20,
-        'accept_percentage': 80,
-        'voting_scheme': 'A'
-        },
-        { # 1001 - 5000 users
-        'number_of_users': 5000,
-        'quorum': 30,
-        'accept_percentage': 80,
-        'voting_scheme': 'A'
-        }
-        ]
-
-        selected_rule =  voting_rules[-1] # this default will apply if there are more users than the last voting rule covers
-
-        for rule in voting_rules:
-            if number_of_selected_users <= rule['number_of_users']:
-                selected_rule = rule
-                break
-
-        #print('got rule: ', selected_rule)
-        #print('total_votes', total_votes)
-
-        # if total_votes is > quorum
-        # use % of votes not of quorum
-        # in case for example people dereference a reusable item with a pending change request
-        # I'm not sure this will happen, but it seems best to cover for it
-
-        max_votes = max(total_votes, selected_rule['quorum'])
-
-        # enough have voted 'yes'
-        if 100 * change_request_votes_yes / max_votes >= selected_rule['accept_percentage']:
+        Called by voting.py, exactly once for each change request that the votes decide
+        """
+        if resolution == 'accepted':
             cls.accept_change(instance)
+            event = 'changeRequestAccepted'
 
-            # notify users who use this reusable item
-            users = cls.find_users(instance)
-
-            # only notify if more than one user - do not notify if only one user because it will be accepted as soon as created
-            if users.count() > 1:
-                notificationData = {
-                'context': 'reusableItem',
-                'event': 'changeRequestAccepted'
-                }
-                
-                cls.create_notification(instance, users, notificationData)
-
-        # even if all remaining users vote 'yes', the accept percentage cannot be reached
-        elif 100 * change_request_votes_no / max_votes > 100 - selected_rule['accept_percentage']:
-            cls.reject_change(instance, 'rejected')
+        else:
+            cls.reject_change(instance, resolution)
+            event = 'changeRequestRejected'
 
-            # notify users who use this reusable item
-            users = cls.find_users(instance)
+        # notify users who use this reusable item
+        users = cls.find_users(instance)
 
-            # only notify if more than one user - do not notify if only one user because it will be accepted as soon as created
-            if users.count() > 1:
-                notificationData = {
-                'context': 'reusableItem',
-                'event': 'changeRequestRejected'
-                }
-                
-            cls.create_notification(instance, users, notificationData)
+        # only notify if more than one user - do not notify if only one user because it will be accepted as soon as created
+        if users.count() > 1:
+            notificationData = {
+            'context': 'reusableItem',
+            'event': event
+            }
 
-        return
+            cls.create_notification(instance, notificationData)
 
     @classmethod
     def accept_change(cls, instance):
@@ -326,7 +214,9 @@ class ReusableItemSerializer(FlexFieldsModelSerializer):
 
             if key == 'name':
                 # update the name of any Top Ten Item that references this Reusable Item
-                topTenItems = TopTenItem.objects.filter(reusableItem=instance).update(name=value)
+                topTenItems = TopTenItem.objects.filter(reusableItem=instance)
+                topTenItems.update(name=value)
+                get_search_backend().update(TopTenItem, topTenItems)
 
         history_entry['changed_request_submitted_by_id'] = getattr(instance, 'change_request_by').id.__str__()
         history_entry['change_request_resolution'] = 'accepted'
@@ -336,7 +226,7 @@ class ReusableItemSerializer(FlexFieldsModelSerializer):
         history_entry['change_request_votes_no_count'] = cls.get_change_request_votes_no_count(cls, instance)
         history_entry['number_of_users'] = cls.count_users(instance)
 
-        instance.history.append(history_entry)
+        add_history_entry(instance, history_entry)
 
         setattr(instance, 'modified_at', timezone.now().__str__())
 
@@ -366,7 +256,7 @@ class ReusableItemSerializer(FlexFieldsModelSerializer):
         history_entry['change_request_votes_no_count'] = cls.get_change_request_votes_no_count(cls, instance)
         history_entry['number_of_users'] = cls.count_users(instance)
 
-        instance.history.append(history_entry)
+        add_history_entry(instance, history_entry)
 
         cls.remove_change_request(instance)
         instance.save()
@@ -384,6 +274,10 @@ class ReusableItemSerializer(FlexFieldsModelSerializer):
         instance.change_request_votes_yes.clear()
         instance.change_request_votes_no.clear()
 
+        # the counts are set to 0 in the database by signals.py
+        instance.change_request_votes_yes_count = 0
+        instance.change_request_votes_no_count = 0
+
     def to_internal_value(self, data):
         """ intercept update data before it is validated
         data may contain one of these updates:
@@ -472,9 +366,10 @@ class ReusableItemSerializer(FlexFieldsModelSerializer):
             if validated_data.get(key, None) is not None:
                 history_entry[key] = validated_data[key]
 
-        validated_data['history'] = [history_entry]
+        reusableItem = ReusableItem.objects.create(**validated_data)
+        add_history_entry(reusableItem, history_entry)
 
-        return ReusableItem.objects.create(**validated_data)
+        return reusableItem
 
     # @classmethod here breaks the function
     def update(self, instance, validated_data):
@@ -494,15 +389,15 @@ class ReusableItemSerializer(FlexFieldsModelSerializer):
         if not current_user.is_authenticated:
             raise ValidationError({'update reusable item error: user is not logged in'})
 
-        try:
-            email_address = EmailAddress.objects.get(user_id=current_user.id)
-
-            if not email_address.verified:
-                raise ValidationError({'update reusable item error: user does not have a verified email address'})
+        # usually already known from the permission check, see users/verified.py
+        verified = is_email_verified(current_user, self.context['request'])
 
-        except:
+        if verified is None:
             raise ValidationError({'update reusable item error: error getting email_address'})
 
+        if not verified:
+            raise ValidationError({'update reusable item error: user does not have a verified email address'})
+
         if self.change_type not in change_types:
             raise ValidationError({'update reusable item error: invalid change type'})
 
@@ -582,9 +477,10 @@ class ReusableItemSerializer(FlexFieldsModelSerializer):
             instance.change_request_at = timezone.now()
             instance.change_request_by = current_user
             self.reset_change_votes(instance)
-            self.cast_vote(instance, current_user, 'yes')
 
+            # save the change request before voting, because voting.py may need to read it again
             instance.save()
+            self.cast_vote(instance, current_user, 'yes')
 
             # notify other users who use this reusable item
             users = self.find_users(instance).exclude(pk=current_user.pk)
@@ -595,7 +491,7 @@ class ReusableItemSerializer(FlexFieldsModelSerializer):
                 'event': 'changeRequestCreated'
                 }
 
-                self.create_notification(instance, users, notificationData)
+                self.create_notification(instance, notificationData, current_user)
 
             return instance
 
@@ -609,7 +505,11 @@ class ReusableItemSerializer(FlexFieldsModelSerializer):
             if instance.change_request_by != current_user:
                 raise ValidationError({'update reusable item error: you cannot cancel a change request that you did not create'})
             
-            self.reject_change(instance, 'cancelled')
+            try:
+                resolve_change_request(instance, 'cancelled', self.reject_change)
+
+            except StaleChangeRequest:
+                raise ValidationError({'update reusable item error: the change request has already been resolved'})
 
             # notify other users who use this reusable item
             users = self.find_users(instance).exclude(pk=current_user.pk)
@@ -620,7 +520,7 @@ class ReusableItemSerializer(FlexFieldsModelSerializer):
                 'event': 'changeRequestCancelled'
                 }
 
-                self.create_notification(instance, users, notificationData)
+                self.create_notification(instance, notificationData, current_user)
 
             return instance
 
@@ -636,13 +536,23 @@ class ReusableItemSerializer(FlexFieldsModelSerializer):
 
             # if vote is '' then the user has withdrawn their vote already
             # if yes or no, add the vote
+            # the vote is saved by voting.py, so the instance is not saved here: it may be out of date
             if validated_data['vote'] in ['yes', 'no', '']:
                 self.cast_vote(instance, current_user, validated_data['vote'])
-
-            instance.save()
             return instance
 
 
+class ReusableItemHistorySerializer(serializers.ModelSerializer):
+    """
+    Serializer for a reusableItem's history, which is read one page at a time, see history.py
+    """
+
+    class Meta:
+        model = ReusableItemHistory
+        fields = ('order', 'created_at', 'entry')
+        read_only_fields = fields
+
+
 class TopTenItemSerializer(FlexFieldsModelSerializer):
     """
     A topTenItem must belong to a topTenList
@@ -659,7 +569,7 @@ class TopTenItemSerializer(FlexFieldsModelSerializer):
     # https://github.com/encode/django-rest-framework/issues/627
 
     expandable_fields = {
-        'reusableItem': (ReusableItemSerializer, {'source': 'topTenItem', 'many': True, 'fields': ['id', 'name', 'definition', 'is_public', 'link', 'change_request_at', 'change_request', 'change_request_by', 'history', 'change_request_votes_yes_count', 'change_request_votes_no_count', 'change_request_my_vote']})
+        'reusableItem': (ReusableItemSerializer, {'source': 'topTenItem', 'many': True, 'fields': ['id', 'name', 'definition', 'is_public', 'link', 'change_request_at', 'change_request', 'change_request_by', 'change_request_votes_yes_count', 'change_request_votes_no_count', 'change_request_my_vote']})
     }
 
     class Meta:
@@ -668,12 +578,16 @@ class TopTenItemSerializer(FlexFieldsModelSerializer):
         # note 'topTenList_id' is the field that can be returned, even though 'topTenList' is the actual foreign key in the model
 
     def to_representation(self, instance):
+        data = super(TopTenItemSerializer, self).to_representation(instance)
+
+        return self.finish_representation(instance, data)
+
+    def finish_representation(self, instance, data):
         """
         We must check permissions before returning a reusableItem as part of a topTenItem.
         The permissions defined in the api for reusableItem are not applied here.
+        Also called with the data from the compiled serializer, see compiled.py
         """
-        data = super(TopTenItemSerializer, self).to_representation(instance)
-
         current_user = self.context['request'].user
 
         reusableItemData = data.get('reusableItem')
@@ -928,6 +842,11 @@ class TopTenListSerializer(FlexFieldsModelSerializer):
 
         TopTenItem.objects.bulk_create(itemObjs)
 
+        # bulk_create does not send signals, so record the new references, index the new topTenItems and invalidate the cached topTenList here
+        update_reusable_item_users([(itemObj.reusableItem_id, newTopTenList.created_by_id) for itemObj in itemObjs])
+        get_search_backend().update(TopTenItem, itemObjs)
+        invalidate_topTenLists([newTopTenList.id])
+
         return newTopTenList
 
 class NotificationSerializer(serializers.ModelSerializer):
@@ -1,20 +1,55 @@
 # app/signals.py
 
-from . models import TopTenList, TopTenItem, ReusableItem
-from django.db.models.signals import post_delete, post_save
+from . models import TopTenList, TopTenItem, ReusableItem, Notification
+from . cleanup import delete_unreferenced_reusable_items
+from . references import update_reusable_item_users
+from . search import get_search_backend
+from . suggest import suggest_index
+from . cache import invalidate_topTenLists
+from . counters import adjust_notification_counts
+from . pubsub import publish_notifications
+from . voting import recount_votes
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_delete
+from django.db import transaction
 from django.dispatch import receiver
 
-# delete any reusableItem that is not referenced by any topTenItem
-# when the topTenItem is saved (created or updated)
+# remember which reusableItem a topTenItem referenced when it was loaded
+# so that only that reusableItem needs to be checked when the topTenItem is saved
+# a deferred reusableItem_id is not loaded here, because that would cost a query per topTenItem
+@receiver([post_init], sender=TopTenItem)
+def init_topTenItem(sender, instance, **kwargs):
+	instance._original_reusableItem_id = instance.__dict__.get('reusableItem_id')
+
+# when the topTenItem is saved (created or updated) with a different reusableItem
+# update the users who reference the old and new reusableItems
+# and delete the old reusableItem if no topTenItem references it any longer
 @receiver([post_save], sender=TopTenItem)
 def update_topTenItem(sender, instance, using, **kwargs):
-	ReusableItem.objects.filter(topTenItem__isnull=True).delete()
+	original_reusableItem_id = getattr(instance, '_original_reusableItem_id', None)
+
+	if original_reusableItem_id != instance.reusableItem_id:
+		if TopTenItem.topTenList.is_cached(instance):
+			user_id = instance.topTenList.created_by_id
+		else:
+			user_id = TopTenList.objects.filter(pk=instance.topTenList_id).values_list('created_by', flat=True).first()
+
+		update_reusable_item_users([(original_reusableItem_id, user_id), (instance.reusableItem_id, user_id)])
+		delete_unreferenced_reusable_items([original_reusableItem_id])
+
+	instance._original_reusableItem_id = instance.reusableItem_id
+
+# find the reusableItems referenced by the list's topTenItems before they are deleted
+@receiver([pre_delete], sender=TopTenList)
+def pre_delete_topTenList(sender, instance, using, **kwargs):
+	instance._reusableItem_ids = list(TopTenItem.objects.filter(topTenList=instance).exclude(reusableItem=None).values_list('reusableItem_id', flat=True))
 
 # when the parent list is deleted
 @receiver([post_delete], sender=TopTenList)
 def delete_topTenList(sender, instance, using, **kwargs):
-	ReusableItem.objects.filter(topTenItem__isnull=True).delete()
-	# topTenItem__isnull references the related_name of reusableItem in the TopTenItem model.
+	reusableItem_ids = getattr(instance, '_reusableItem_ids', [])
+
+	update_reusable_item_users([(reusableItem_id, instance.created_by_id) for reusableItem_id in reusableItem_ids])
+	delete_unreferenced_reusable_items(reusableItem_ids)
 	
 # when a reusableItem is saved (created or updated)
 # if it has no created_by, it should be deleted if not public
@@ -32,3 +67,82 @@ def update_reusableItem(sender, instance, using, **kwargs):
 		if instance.is_public == False:
 			print('is_public False')
 			ReusableItem.objects.filter(id=instance.id).delete()
+
+# keep the search index up to date
+@receiver([post_save], sender=TopTenList)
+@receiver([post_save], sender=TopTenItem)
+@receiver([post_save], sender=ReusableItem)
+def update_search_index(sender, instance, using, **kwargs):
+	get_search_backend().update(sender, [instance])
+
+@receiver([post_delete], sender=TopTenList)
+@receiver([post_delete], sender=TopTenItem)
+@receiver([post_delete], sender=ReusableItem)
+def remove_from_search_index(sender, instance, using, **kwargs):
+	get_search_backend().remove(sender, [instance.pk])
+
+# keep the type-ahead suggestions for public reusableItems up to date
+# the index is changed when the transaction commits, so a change that is rolled back is not suggested
+@receiver([post_save], sender=ReusableItem)
+def update_suggest_index(sender, instance, using, **kwargs):
+	change = (instance.pk, instance.name, instance.definition, instance.is_public)
+	transaction.on_commit(lambda: suggest_index.change(*change))
+
+@receiver([post_delete], sender=ReusableItem)
+def remove_from_suggest_index(sender, instance, using, **kwargs):
+	pk = instance.pk
+	transaction.on_commit(lambda: suggest_index.remove(pk))
+
+# invalidate cached topTenLists when anything they include changes
+@receiver([post_save], sender=TopTenList)
+@receiver([post_delete], sender=TopTenList)
+def invalidate_cached_topTenList(sender, instance, using, **kwargs):
+	invalidate_topTenLists([instance.id])
+
+# deleting a topTenList sets the parent_topTenItem of its child topTenLists to null without sending signals
+@receiver([pre_delete], sender=TopTenList)
+def invalidate_cached_child_topTenLists(sender, instance, using, **kwargs):
+	invalidate_topTenLists(TopTenList.objects.filter(parent_topTenItem__topTenList=instance).values_list('id', flat=True))
+
+@receiver([post_save], sender=TopTenItem)
+def invalidate_cached_topTenItem(sender, instance, using, **kwargs):
+	invalidate_topTenLists([instance.topTenList_id])
+
+# deleting a reusableItem sets the reusableItem of its topTenItems to null without sending signals
+@receiver([post_save], sender=ReusableItem)
+@receiver([pre_delete], sender=ReusableItem)
+def invalidate_cached_reusableItem(sender, instance, using, **kwargs):
+	invalidate_topTenLists(TopTenItem.objects.filter(reusableItem=instance).values_list('topTenList_id', flat=True))
+
+# votes on change requests are shown with the reusableItem
+# votes cast by voting.py do not send this signal; other changes to the votes, e.g. by the admin, are counted again here
+@receiver([m2m_changed], sender=ReusableItem.change_request_votes_yes.through)
+@receiver([m2m_changed], sender=ReusableItem.change_request_votes_no.through)
+def votes_changed(sender, instance, action, reverse, pk_set, **kwargs):
+	if not reverse:
+		reusableItem_ids = [instance.pk]
+
+	# instance is a user, and clear does not give the reusableItems, so find them before they are cleared
+	elif action == 'pre_clear':
+		field = ReusableItem.change_request_votes_yes.field
+		instance._cleared_vote_reusableItem_ids = list(sender.objects.filter(**{field.m2m_reverse_field_name(): instance}).values_list(field.m2m_field_name(), flat=True))
+		return
+
+	elif action == 'post_clear':
+		reusableItem_ids = getattr(instance, '_cleared_vote_reusableItem_ids', [])
+
+	else:
+		reusableItem_ids = pk_set or []
+
+	if action in ('post_add', 'post_remove', 'post_clear'):
+		recount_votes(reusableItem_ids)
+		invalidate_topTenLists(TopTenItem.objects.filter(reusableItem_id__in=list(reusableItem_ids)).values_list('topTenList_id', flat=True))
+
+# keep the user's cached notification counts in step, see counters.py, and tell the user about a new notification, see pubsub.py
+# notifications created with bulk_create, and flags changed by NotificationViewSet, do this themselves
+# there is no post_delete receiver, because it would stop Notification querysets being deleted without loading them
+@receiver([post_save], sender=Notification)
+def count_new_notification(sender, instance, created, **kwargs):
+	if created:
+		adjust_notification_counts(instance.created_by_id, unread=int(instance.unread), new=int(instance.new))
+		transaction.on_commit(lambda: publish_notifications([instance]))
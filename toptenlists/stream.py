@@ -0,0 +1,127 @@
+"""
+Push new notifications to the user instead of the user polling for them
+
+NotificationViewSet.wait is a long poll: it returns as soon as the user has a new notification, or after a timeout.
+NotificationStreamView sends server-sent events for as long as the connection is held open, up to a limit.
+
+Both are told about new notifications by pubsub.py, so while the user has no new notification they do not read
+the database. Each response gives the number of the last message, which the client sends back as 'after'
+(or Last-Event-ID for server-sent events) so that a notification created between requests is not missed.
+If messages have been missed anyway, 'missed' is true and the client should fetch its notifications again.
+
+Each open connection holds a server thread for as long as it waits. Passenger runs one request at a time in each process,
+so a few dozen open pages would take every process. Holding connections open is therefore off unless
+TOPTENLISTS_NOTIFICATION_PUSH is True, which needs a server with many concurrent threads or an async server; see deploy/README.md.
+While it is off, wait returns at once, with 'push' false so the client polls it at intervals instead,
+and the stream of server-sent events is not available.
+"""
+
+import json
+import time
+
+from django.conf import settings
+from rest_framework.utils.encoders import JSONEncoder
+
+from .counters import get_notification_counts
+from .models import Notification
+from .pubsub import get_pubsub, get_notification_channel
+from .serializers import NotificationSerializer
+
+def get_after(value):
+    """
+    The number of the last message the client has seen, or None
+    """
+    try:
+        return int(value)
+
+    except (TypeError, ValueError):
+        return None
+
+def is_push_enabled():
+    return getattr(settings, 'TOPTENLISTS_NOTIFICATION_PUSH', False)
+
+def get_wait_timeout(value):
+    """
+    Seconds to wait, from the client's request if given, but no more than TOPTENLISTS_NOTIFICATION_WAIT_MAX
+    Do not wait unless push is enabled
+    """
+    if not is_push_enabled():
+        return 0
+
+    maximum = getattr(settings, 'TOPTENLISTS_NOTIFICATION_WAIT_MAX', 55)
+
+    try:
+        return max(0, min(float(value), maximum))
+
+    except (TypeError, ValueError):
+        return min(25, maximum)
+
+def serialize_notifications(request, notification_ids):
+    """
+    Return the data for the user's notifications with the given ids
+    A notification that has already been deleted is left out
+    """
+    if len(notification_ids) == 0:
+        return []
+
+    notifications = Notification.objects.filter(created_by=request.user, id__in=notification_ids).select_related('reusableItem', 'topTenItem').order_by('created_at')
+
+    return NotificationSerializer(notifications, many=True, context={'request': request}).data
+
+def wait_for_notifications(request, after, timeout):
+    """
+    Wait for new notifications and return the data for the long poll
+    """
+    messages, last, missed = get_pubsub().wait(get_notification_channel(request.user.id), after, timeout)
+
+    return {
+        'notifications': serialize_notifications(request, messages),
+        'last': last,
+        'missed': missed,
+        'counts': get_notification_counts(request.user.id),
+        'push': is_push_enabled(), # if false, the client should wait before asking again
+    }
+
+def format_event(event, data, event_id=None):
+    lines = []
+
+    if event_id is not None:
+        lines.append('id: %s' % event_id)
+
+    lines.append('event: %s' % event)
+    lines.append('data: %s' % json.dumps(data, cls=JSONEncoder))
+
+    return '\n'.join(lines) + '\n\n'
+
+def notification_events(request, after):
+    """
+    Yield server-sent events for the user's new notifications until TOPTENLISTS_NOTIFICATION_STREAM_MAX seconds have passed
+    The browser reconnects when the stream ends
+    """
+    keepalive = getattr(settings, 'TOPTENLISTS_NOTIFICATION_STREAM_KEEPALIVE', 15)
+    deadline = time.time() + getattr(settings, 'TOPTENLISTS_NOTIFICATION_STREAM_MAX', 300)
+    channel = get_notification_channel(request.user.id)
+
+    yield 'retry: 2000\n\n'
+    yield format_event('counts', get_notification_counts(request.user.id))
+
+    while True:
+        remaining = deadline - time.time()
+
+        if remaining <= 0:
+            return
+
+        messages, last, missed = get_pubsub().wait(channel, after, min(keepalive, remaining))
+
+        if missed:
+            yield format_event('missed', {}, last)
+
+        elif len(messages) > 0:
+            yield format_event('notifications', serialize_notifications(request, messages), last)
+            yield format_event('counts', get_notification_counts(request.user.id))
+
+        else:
+            # a comment stops proxies closing an idle connection
+            yield ': keepalive\n\n'
+
+        after = last
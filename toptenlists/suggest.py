@@ -0,0 +1,183 @@
+"""
+Type-ahead suggestions for public reusableItem names
+
+The names are held in memory in a sorted array so that a prefix is found with bisect,
+without a database query. Every word of a name is a key, so 'aus' suggests 'Jane Austen'
+as well as 'Austen Chamberlain'; a key runs from its word to the end of the name,
+so 'jane au' only suggests names containing 'jane au...'.
+
+The index is loaded on first use and updated by the signals in signals.py when a reusableItem is saved or deleted
+and the transaction commits. Each process holds its own index and only sees the changes it makes itself,
+so the index is reloaded after TOPTENLISTS_SUGGEST_MAX_AGE seconds. The reload is done by one thread in the background
+while the old index goes on serving suggestions; changes made during the reload are applied again to the new index.
+"""
+
+import bisect
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from .models import ReusableItem
+
+WORD_START_RE = re.compile(r'\b\w', re.UNICODE)
+
+def normalize(text):
+    return ' '.join((text or '').lower().split())
+
+def get_keys(name):
+    """
+    the name from the start of each word
+    """
+    name = normalize(name)
+
+    return {name[match.start():] for match in WORD_START_RE.finditer(name)}
+
+
+class SuggestIndex(object):
+    """
+    keys is a sorted list of (key, id)
+    items maps id to (name, definition, keys)
+    """
+    def __init__(self):
+        self.keys = []
+        self.items = {}
+        self.loaded_at = None
+        self.lock = threading.Lock()
+        self.load_lock = threading.RLock() # one load at a time
+        self.refreshing = False
+        self.changes = None # (pk, name, definition, is_public) made while loading, to apply to the new index
+
+    def load(self):
+        with self.load_lock:
+            with self.lock:
+                self.changes = []
+
+            try:
+                keys = []
+                items = {}
+
+                for pk, name, definition in ReusableItem.objects.filter(is_public=True).values_list('id', 'name', 'definition').iterator():
+                    item_keys = get_keys(name)
+                    items[pk] = (name, definition, item_keys)
+                    keys.extend((key, pk) for key in item_keys)
+
+                keys.sort()
+
+                with self.lock:
+                    self.keys = keys
+                    self.items = items
+
+                    for change in self.changes:
+                        self._change(*change)
+
+                    self.loaded_at = time.time()
+
+            finally:
+                with self.lock:
+                    self.changes = None
+
+    def refresh(self):
+        """
+        Reload the index in this thread, then allow another refresh
+        """
+        try:
+            self.load()
+
+        finally:
+            with self.lock:
+                self.refreshing = False
+
+            # the thread has its own database connection
+            connection.close()
+
+    def start_refresh(self):
+        """
+        Reload the index in a background thread, unless that is already being done
+        """
+        with self.lock:
+            if self.refreshing:
+                return
+
+            self.refreshing = True
+
+        threading.Thread(target=self.refresh, daemon=True).start()
+
+    def is_stale(self):
+        max_age = getattr(settings, 'TOPTENLISTS_SUGGEST_MAX_AGE', 300)
+
+        return self.loaded_at is None or (max_age is not None and time.time() - self.loaded_at > max_age)
+
+    def _remove(self, pk):
+        name, definition, item_keys = self.items.pop(pk)
+
+        for key in item_keys:
+            del self.keys[bisect.bisect_left(self.keys, (key, pk))]
+
+    def _change(self, pk, name, definition, is_public):
+        if pk in self.items:
+            self._remove(pk)
+
+        if is_public:
+            item_keys = get_keys(name)
+            self.items[pk] = (name, definition, item_keys)
+
+            for key in item_keys:
+                bisect.insort(self.keys, (key, pk))
+
+    def change(self, pk, name, definition, is_public):
+        """
+        add, change or remove a single reusableItem
+        """
+        with self.lock:
+            if self.changes is not None:
+                self.changes.append((pk, name, definition, is_public))
+
+            if self.loaded_at is not None:
+                self._change(pk, name, definition, is_public)
+
+    def remove(self, pk):
+        self.change(pk, None, None, False)
+
+    def suggest(self, prefix, limit=10):
+        """
+        Return up to limit reusableItems with a word that starts with prefix, in alphabetical order of the matching words
+        """
+        if self.loaded_at is None:
+            with self.load_lock:
+                if self.loaded_at is None:
+                    self.load()
+
+        elif self.is_stale():
+            self.start_refresh()
+
+        prefix = normalize(prefix)
+
+        if prefix == '':
+            return []
+
+        results = []
+        seen = set()
+
+        with self.lock:
+            index = bisect.bisect_left(self.keys, (prefix,))
+
+            while index < len(self.keys) and len(results) < limit:
+                key, pk = self.keys[index]
+
+                if not key.startswith(prefix):
+                    break
+
+                if pk not in seen:
+                    seen.add(pk)
+                    name, definition, item_keys = self.items[pk]
+                    results.append({'id': pk, 'name': name, 'definition': definition})
+
+                index = index + 1
+
+        return results
+
+
+suggest_index = SuggestIndex()
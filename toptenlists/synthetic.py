@@ -0,0 +1,299 @@
+"""
+Synthetic users, topTenLists, reusableItems, change requests, votes and notifications, for benchmarks and scale tests
+
+generate creates the rows with bulk_create, so no signals are sent for them: ReusableItemUser, users_count and the
+vote counts are written directly, and the search and suggestion indexes of this process are brought up to date.
+The same seed and prefix always generate the same rows, with the same ids.
+
+Every user has a verified email address and lists_per_user public topTenLists of 10 topTenItems.
+Each reusableItem is referenced by a topTenItem of users_per_reusableItem users on average. If zipf is given,
+the number of users of the reusableItem ranked k is proportional to 1 / k ** zipf, so that a few reusableItems
+are used by many users and most by a few; otherwise every reusableItem has the same number of users.
+A user references no more reusableItems than they have topTenItems.
+
+The first change_requests reusableItems with more than one user have a change request proposed by one of their users,
+who has voted yes, and up to votes_per_change_request more votes from their other users that do not resolve it.
+
+Rows are written chunk_size users or reusableItems at a time, each chunk in a transaction.
+Pass keep=False to keep only the number of rows of each kind rather than the instances, when generating millions.
+"""
+
+import random
+import uuid
+from collections import OrderedDict
+
+from allauth.account.models import EmailAddress
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import TopTenList, TopTenItem, ReusableItem, ReusableItemUser, Notification
+from .search import get_search_backend
+from .suggest import suggest_index
+from .voting import get_resolution, get_vote_table
+
+# names are made from these words, so that searches find results
+WORDS = (
+    'apple', 'autumn', 'blue', 'book', 'bridge', 'castle', 'city', 'cloud', 'coffee', 'dance',
+    'desert', 'dragon', 'dream', 'forest', 'garden', 'glass', 'golden', 'harbour', 'island', 'jazz',
+    'journey', 'lake', 'light', 'marble', 'meadow', 'moon', 'mountain', 'music', 'night', 'ocean',
+    'orchard', 'paper', 'piano', 'river', 'silver', 'song', 'spring', 'star', 'stone', 'summer',
+    'tea', 'thunder', 'tower', 'valley', 'velvet', 'village', 'winter', 'wolf',
+)
+
+PASSWORD = 'synthetic password'
+
+BATCH_SIZE = 1000
+
+def bulk_create(model, instances):
+    """
+    Django 2.0 does not reduce a batch_size that is too large for the database, e.g. SQLite's limit on query parameters
+    """
+    batch_size = min(BATCH_SIZE, max(connection.ops.bulk_batch_size(model._meta.concrete_fields, instances), 1))
+
+    model._default_manager.bulk_create(instances, batch_size=batch_size)
+
+
+class SyntheticData(object):
+    """
+    The number of rows of each kind and, if keep is True, the generated instances
+    """
+    kinds = ('users', 'topTenLists', 'topTenItems', 'reusableItems', 'reusableItemUsers', 'change_requests', 'votes', 'notifications')
+
+    def __init__(self, keep=True):
+        self.keep = keep
+        self.counts = OrderedDict((kind, 0) for kind in self.kinds)
+        self.users = []
+        self.topTenLists = []
+        self.topTenItems = []
+        self.reusableItems = []
+        self.reusableItemUsers = []
+        self.change_requests = [] # reusableItems with a change request
+        self.votes = []
+        self.notifications = []
+        self.reusableItem_users = {} # reusableItem id: ids of the users who reference it, the proposer of its change request first
+
+    def add(self, kind, instances):
+        self.counts[kind] += len(instances)
+
+        if self.keep:
+            getattr(self, kind).extend(instances)
+
+    def as_dict(self):
+        return dict(self.counts)
+
+
+class Generator(object):
+    def __init__(self, seed=1, prefix='synthetic', chunk_size=10000, progress=None):
+        # the prefix is part of the seed, so that data generated with another prefix has other ids
+        self.random = random.Random('%s:%s' % (prefix, seed))
+        self.prefix = prefix
+        self.chunk_size = chunk_size
+        self.progress = progress or (lambda message: None)
+        self.now = timezone.now()
+        self.search_backend = get_search_backend()
+
+    def get_id(self):
+        return uuid.UUID(int=self.random.getrandbits(128), version=4)
+
+    def get_name(self, words):
+        return ' '.join(self.random.choices(WORDS, k=words)).capitalize()
+
+    def get_username(self, index):
+        return '%s-user-%d' % (self.prefix, index)
+
+    def get_chunks(self, count):
+        for start in range(0, count, self.chunk_size):
+            yield range(start, min(start + self.chunk_size, count))
+
+    def get_users_counts(self, users, reusableItems, users_per_reusableItem, zipf):
+        """
+        The number of users to give each reusableItem, most popular first
+        """
+        if not zipf:
+            return [min(users_per_reusableItem, users)] * reusableItems
+
+        weights = [1 / rank ** zipf for rank in range(1, reusableItems + 1)]
+        scale = users_per_reusableItem * reusableItems / sum(weights)
+
+        return [min(max(round(weight * scale), 1), users) for weight in weights]
+
+    def assign_reusableItems(self, users, users_counts, slots):
+        """
+        Return the indexes of the users of each reusableItem
+        A user whose topTenItems all reference a reusableItem already is not given another
+        """
+        used = [0] * users
+        reusableItem_users = []
+
+        for users_count in users_counts:
+            chosen = [user for user in self.random.sample(range(users), users_count) if used[user] < slots]
+
+            for user in chosen:
+                used[user] += 1
+
+            reusableItem_users.append(chosen)
+
+        return reusableItem_users
+
+    def create_users(self, data, users):
+        USER = get_user_model()
+        password = make_password(PASSWORD) # hashed once, it is slow
+        user_ids = []
+
+        for chunk in self.get_chunks(users):
+            instances = []
+
+            for index in chunk:
+                username = self.get_username(index)
+                instances.append(USER(id=self.get_id(), username=username, email=username + '@example.com', password=password, email_verified=True))
+
+            with transaction.atomic():
+                bulk_create(USER, instances)
+                bulk_create(EmailAddress, [EmailAddress(user=user, email=user.email, primary=True, verified=True) for user in instances])
+
+            user_ids.extend(user.id for user in instances)
+            data.add('users', instances)
+            self.progress('%d users' % data.counts['users'])
+
+        return user_ids
+
+    def vote(self, reusableItem, voter_ids, votes_per_change_request):
+        """
+        The proposer's yes vote, and more votes that leave the change request open
+        """
+        votes = {'yes': [voter_ids[0]], 'no': []}
+
+        for user_id in voter_ids[1:votes_per_change_request + 1]:
+            vote = self.random.choice(('yes', 'no'))
+            votes_yes = len(votes['yes']) + (vote == 'yes')
+            votes_no = len(votes['no']) + (vote == 'no')
+
+            if get_resolution(votes_yes, votes_no, len(voter_ids)) is None:
+                votes[vote].append(user_id)
+
+        reusableItem.change_request_votes_yes_count = len(votes['yes'])
+        reusableItem.change_request_votes_no_count = len(votes['no'])
+
+        return votes
+
+    def create_reusableItems(self, data, user_ids, reusableItem_users, change_requests, votes_per_change_request):
+        reusableItem_ids = []
+        names = []
+        tables = {vote: get_vote_table(vote) for vote in ('yes', 'no')}
+
+        for chunk in self.get_chunks(len(reusableItem_users)):
+            instances = []
+            votes = []
+
+            for index in chunk:
+                users = reusableItem_users[index]
+                creator = users[0] if users else index % len(user_ids)
+
+                reusableItem = ReusableItem(id=self.get_id(), name=self.get_name(2), definition=self.get_name(4), is_public=True, created_by_id=user_ids[creator], created_by_username=self.get_username(creator), users_count=len(users))
+
+                if data.counts['change_requests'] < change_requests and len(users) > 1:
+                    reusableItem.change_request = {'name': reusableItem.name + ' revised'}
+                    reusableItem.change_request_at = self.now
+                    reusableItem.change_request_by_id = user_ids[users[0]]
+
+                    for vote, voter_ids in self.vote(reusableItem, [user_ids[user] for user in users], votes_per_change_request).items():
+                        through, field = tables[vote]
+                        votes.extend(through(**{field.m2m_column_name(): reusableItem.id, field.m2m_reverse_name(): user_id}) for user_id in voter_ids)
+
+                    data.add('change_requests', [reusableItem])
+
+                if data.keep:
+                    data.reusableItem_users[reusableItem.id] = [user_ids[user] for user in users]
+
+                instances.append(reusableItem)
+
+            with transaction.atomic():
+                bulk_create(ReusableItem, instances)
+
+                for through, field in tables.values():
+                    bulk_create(through, [vote for vote in votes if isinstance(vote, through)])
+
+            self.search_backend.update(ReusableItem, instances)
+            reusableItem_ids.extend(reusableItem.id for reusableItem in instances)
+            names.extend(reusableItem.name for reusableItem in instances)
+            data.add('reusableItems', instances)
+            data.add('votes', votes)
+            self.progress('%d reusableItems' % data.counts['reusableItems'])
+
+        return reusableItem_ids, names
+
+    def create_topTenLists(self, data, user_ids, lists_per_user, notifications_per_user, user_reusableItems, reusableItem_ids, names):
+        """
+        Each user's topTenLists, with a topTenItem for each of their reusableItems, and their notifications
+        Related objects are given by id, which is quicker than by instance
+        """
+        for chunk in self.get_chunks(len(user_ids)):
+            topTenLists = []
+            topTenItems = []
+            reusableItemUsers = []
+            notifications = []
+
+            for index in chunk:
+                user_id = user_ids[index]
+                username = self.get_username(index)
+                items = []
+
+                for list_index in range(lists_per_user):
+                    topTenList = TopTenList(id=self.get_id(), name=self.get_name(3), description=self.get_name(6), is_public=True, created_by_id=user_id, created_by_username=username)
+                    topTenLists.append(topTenList)
+
+                    items.extend(TopTenItem(id=self.get_id(), topTenList_id=topTenList.id, name=self.get_name(2), order=order) for order in range(1, 11))
+
+                reusableItems = user_reusableItems.get(index, [])
+
+                for topTenItem, reusableItem in zip(self.random.sample(items, len(reusableItems)), reusableItems):
+                    topTenItem.reusableItem_id = reusableItem_ids[reusableItem]
+                    topTenItem.name = names[reusableItem]
+                    reusableItemUsers.append(ReusableItemUser(id=self.get_id(), reusableItem_id=reusableItem_ids[reusableItem], user_id=user_id))
+
+                if reusableItems:
+                    for notification_index in range(notifications_per_user):
+                        notifications.append(Notification(id=self.get_id(), context='reusableItem', event='changeRequestCreated', reusableItem_id=reusableItem_ids[self.random.choice(reusableItems)], created_by_id=user_id, unread=self.random.random() < 0.5, new=self.random.random() < 0.2))
+
+                topTenItems.extend(items)
+
+            with transaction.atomic():
+                bulk_create(TopTenList, topTenLists)
+                bulk_create(TopTenItem, topTenItems)
+                bulk_create(ReusableItemUser, reusableItemUsers)
+                bulk_create(Notification, notifications)
+
+            self.search_backend.update(TopTenList, topTenLists)
+            self.search_backend.update(TopTenItem, topTenItems)
+            data.add('topTenLists', topTenLists)
+            data.add('topTenItems', topTenItems)
+            data.add('reusableItemUsers', reusableItemUsers)
+            data.add('notifications', notifications)
+            self.progress('%d topTenLists' % data.counts['topTenLists'])
+
+def generate(users=100, lists_per_user=2, reusableItems=50, users_per_reusableItem=5, zipf=None, change_requests=20, votes_per_change_request=0, notifications_per_user=10, seed=1, prefix='synthetic', chunk_size=10000, keep=True, progress=None):
+    """
+    Create the rows, see above, and return SyntheticData
+    prefix starts every username, so it must not have been used before in this database
+    progress, if given, is called with a message after each chunk
+    """
+    generator = Generator(seed, prefix, chunk_size, progress)
+    data = SyntheticData(keep)
+
+    reusableItem_users = generator.assign_reusableItems(users, generator.get_users_counts(users, reusableItems, users_per_reusableItem, zipf), lists_per_user * 10)
+    user_reusableItems = {}
+
+    for reusableItem, indexes in enumerate(reusableItem_users):
+        for user in indexes:
+            user_reusableItems.setdefault(user, []).append(reusableItem)
+
+    user_ids = generator.create_users(data, users)
+    reusableItem_ids, names = generator.create_reusableItems(data, user_ids, reusableItem_users, change_requests, votes_per_change_request)
+    generator.create_topTenLists(data, user_ids, lists_per_user, notifications_per_user, user_reusableItems, reusableItem_ids, names)
+
+    if not suggest_index.is_stale():
+        suggest_index.load()
+
+    return data
@@ -0,0 +1,110 @@
+"""
+Test the synthetic data, the API benchmark and the generatedata command
+"""
+
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from users.models import CustomUser
+from toptenlists.models import TopTenList, TopTenItem, ReusableItem, Notification
+from toptenlists.references import rebuild_reusable_item_users
+from toptenlists.synthetic import generate
+from toptenlists.benchmark import get_percentile
+from toptenlists.voting import get_resolution
+
+class SyntheticDataTest(TestCase):
+    def test_generate(self):
+        data = generate(users=10, lists_per_user=2, reusableItems=5, users_per_reusableItem=3, change_requests=2, notifications_per_user=2)
+
+        self.assertEqual(TopTenList.objects.count(), 20)
+        self.assertEqual(TopTenItem.objects.count(), 200)
+        self.assertEqual(Notification.objects.count(), len(data.notifications))
+        self.assertEqual(ReusableItem.objects.filter(change_request__isnull=False).count(), 2)
+
+        for reusableItem in ReusableItem.objects.all():
+            self.assertEqual(reusableItem.users_count, 3)
+
+        for reusableItem in ReusableItem.objects.filter(change_request__isnull=False):
+            self.assertEqual(reusableItem.change_request_votes_yes_count, 1)
+            self.assertEqual(list(reusableItem.change_request_votes_yes.all()), [reusableItem.change_request_by])
+
+        # the users of each reusableItem are as they would be if the topTenItems had been saved one by one
+        self.assertEqual(rebuild_reusable_item_users(), {'added': 0, 'removed': 0, 'corrected': 0})
+
+    def test_zipf(self):
+        data = generate(users=50, reusableItems=20, users_per_reusableItem=5, zipf=1.2, change_requests=5, votes_per_change_request=4, notifications_per_user=0)
+
+        users_counts = [reusableItem.users_count for reusableItem in data.reusableItems]
+        self.assertEqual(users_counts, sorted(users_counts, reverse=True))
+        self.assertGreater(users_counts[0], 5 * users_counts[-1])
+        self.assertEqual(rebuild_reusable_item_users(), {'added': 0, 'removed': 0, 'corrected': 0})
+
+        # the votes are counted, and do not resolve the change requests
+        self.assertGreater(data.counts['votes'], data.counts['change_requests'])
+
+        for reusableItem in ReusableItem.objects.filter(change_request__isnull=False):
+            self.assertEqual(reusableItem.change_request_votes_yes_count, reusableItem.change_request_votes_yes.count())
+            self.assertEqual(reusableItem.change_request_votes_no_count, reusableItem.change_request_votes_no.count())
+            self.assertIsNone(get_resolution(reusableItem.change_request_votes_yes_count, reusableItem.change_request_votes_no_count, reusableItem.users_count))
+
+    def test_command(self):
+        out = StringIO()
+        call_command('generatedata', '--users', '20', '--reusableitems', '10', '--change-requests', '2', '--chunk-size', '7', stdout=out)
+
+        self.assertIn('Created 20 users, 60 topTenLists, 600 topTenItems, 10 reusableItems', out.getvalue())
+        self.assertEqual(TopTenItem.objects.count(), 600)
+        self.assertEqual(rebuild_reusable_item_users(), {'added': 0, 'removed': 0, 'corrected': 0})
+
+        with self.assertRaises(CommandError):
+            call_command('generatedata', '--users', '20', stdout=StringIO())
+
+    def test_seed(self):
+        first = generate(users=3, reusableItems=2, seed=5, prefix='first')
+        second = generate(users=3, reusableItems=2, seed=6, prefix='second')
+
+        self.assertNotEqual([topTenList.name for topTenList in first.topTenLists], [topTenList.name for topTenList in second.topTenLists])
+
+        ReusableItem.objects.all().delete()
+        CustomUser.objects.all().delete()
+
+        again = generate(users=3, reusableItems=2, seed=5, prefix='first')
+
+        self.assertEqual([topTenList.id for topTenList in first.topTenLists], [topTenList.id for topTenList in again.topTenLists])
+        self.assertEqual([topTenList.name for topTenList in first.topTenLists], [topTenList.name for topTenList in again.topTenLists])
+
+class BenchmarkTest(TestCase):
+    def test_percentile(self):
+        samples = list(range(1, 101))
+
+        self.assertEqual(get_percentile(samples, 50), 50)
+        self.assertEqual(get_percentile(samples, 99), 99)
+        self.assertEqual(get_percentile([7], 99), 7)
+        self.assertIsNone(get_percentile([], 50))
+
+    def test_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'results.json')
+            out = StringIO()
+            call_command('benchmarkapi', '--users', '10', '--reusableitems', '5', '--change-requests', '3', '--requests', '3', '--output', output, stdout=out)
+
+            with open(output) as output_file:
+                results = json.load(output_file)
+
+            self.assertEqual(set(results['scenarios']), {'toptenlist_list', 'toptenlist_list_anonymous', 'toptenlist_detail', 'reusableitem_detail', 'search', 'notification_list', 'vote'})
+
+            for name, scenario in results['scenarios'].items():
+                self.assertEqual(scenario['requests'], 3, name)
+                self.assertEqual(scenario['errors'], 0, name)
+                self.assertGreater(scenario['p99_queries'], 0, name)
+
+            # the data was rolled back
+            self.assertEqual(TopTenList.objects.count(), 0)
+
+            out = StringIO()
+            call_command('benchmarkapi', '--users', '10', '--reusableitems', '5', '--requests', '3', '--scenario', 'search', '--compare', output, stdout=out)
+            self.assertIn('search                       p50_ms', out.getvalue())
@@ -0,0 +1,229 @@
+"""
+Tests for the cache of topTenLists served to anonymous users
+"""
+
+import json
+
+from django.db import transaction
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITransactionTestCase
+from users.models import CustomUser
+from allauth.account.models import EmailAddress
+from toptenlists.models import TopTenList, TopTenItem, ReusableItem
+from toptenlists.cache import cache_stats, get_cache
+
+# disable throttling for testing
+from toptenlists.api import TopTenListViewSet, TopTenListDetailViewSet
+
+TopTenListViewSet.throttle_classes = ()
+TopTenListDetailViewSet.throttle_classes = ()
+
+toptenlist_data_1 = {'name': 'Favourite writers', 'description':'', 'is_public': True,
+'topTenItem': [{'name': 'Writer ' + str(order), 'description': '', 'order': order} for order in range(1, 11)]}
+
+create_list_url = reverse('topTenLists:TopTenLists-list')
+detail_url = reverse('topTenLists:TopTenListDetail-list')
+cache_stats_url = reverse('topTenLists:cachestats')
+
+def create_user(self, index):
+    email_address = 'person_' + str(index) + '@example.com'
+
+    user = CustomUser.objects.create_user('Test user ' + str(index), email_address, email_address)
+    EmailAddress.objects.create(user=user, email=email_address, primary=True, verified=True)
+
+    setattr(self, 'user_' + str(index), user)
+
+class TopTenListCacheTest(APITransactionTestCase):
+    """
+    Cached topTenLists are invalidated when a transaction commits, so these tests commit
+    """
+    def setUp(self):
+        for index in range(1, 4):
+            create_user(self, index)
+
+        get_cache().clear()
+        cache_stats.reset()
+
+        self.client.force_authenticate(user=self.user_1)
+        response = self.client.post(create_list_url, toptenlist_data_1, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.client.logout()
+
+        self.topTenList = TopTenList.objects.get(created_by=self.user_1)
+        self.reusableItem = ReusableItem.objects.create(name='Jane Austen', is_public=True, created_by=self.user_1, created_by_username=self.user_1.username)
+
+        self.topTenItem = TopTenItem.objects.get(topTenList=self.topTenList, order=1)
+        self.topTenItem.reusableItem = self.reusableItem
+        self.topTenItem.save()
+
+        # a change request so that votes can be cast
+        self.reusableItem.change_request = {'name': 'Emily Bronte'}
+        self.reusableItem.change_request_by = self.user_1
+        self.reusableItem.save()
+
+        self.list_url = reverse('topTenLists:TopTenLists-detail', kwargs={'pk': self.topTenList.id})
+
+    def get_topTenList(self, params=None):
+        response = self.client.get(self.list_url, params or {})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        return json.loads(response.content)
+
+    def test_anonymous_read_is_cached(self):
+        """
+        The second anonymous read is a hit and makes fewer queries
+        """
+        first = self.get_topTenList()
+
+        with self.assertNumQueries(1):
+            second = self.get_topTenList()
+
+        self.assertEqual(first, second)
+        self.assertEqual(cache_stats.as_dict()['hits'], 1)
+        self.assertEqual(cache_stats.as_dict()['misses'], 1)
+
+    def test_variants_are_cached_separately(self):
+        """
+        Different expand / fields parameters give different data
+        """
+        full = self.get_topTenList()
+        names = self.get_topTenList({'fields': 'id,name'})
+
+        self.assertIn('topTenItem', full)
+        self.assertEqual(set(names.keys()), {'id', 'name'})
+        self.assertEqual(cache_stats.as_dict()['misses'], 2)
+
+    def test_list_page_is_cached(self):
+        response = self.client.get(create_list_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # count and select only
+        with self.assertNumQueries(2):
+            cached_response = self.client.get(create_list_url)
+
+        self.assertEqual(json.loads(response.content), json.loads(cached_response.content))
+
+    def test_invalidated_by_topTenList_save(self):
+        self.get_topTenList()
+
+        self.topTenList.name = 'Favourite novelists'
+        self.topTenList.save()
+
+        self.assertEqual(self.get_topTenList()['name'], 'Favourite novelists')
+
+    def test_invalidated_on_commit(self):
+        """
+        A read before the change commits does not cache the old data under the new version
+        """
+        self.get_topTenList()
+
+        with transaction.atomic():
+            self.topTenList.name = 'Favourite novelists'
+            self.topTenList.save()
+
+            # still the old version
+            with self.assertNumQueries(1):
+                self.client.get(self.list_url)
+
+        self.assertEqual(self.get_topTenList()['name'], 'Favourite novelists')
+
+    def test_invalidated_by_topTenItem_save(self):
+        self.get_topTenList()
+
+        self.topTenItem.description = 'Pride and Prejudice'
+        self.topTenItem.save()
+
+        self.assertEqual(self.get_topTenList()['topTenItem'][0]['description'], 'Pride and Prejudice')
+
+    def test_invalidated_by_reusableItem_save(self):
+        self.get_topTenList()
+
+        self.reusableItem.definition = 'Novelist'
+        self.reusableItem.save()
+
+        self.assertEqual(self.get_topTenList()['topTenItem'][0]['reusableItem']['definition'], 'Novelist')
+
+    def test_invalidated_by_votes(self):
+        self.get_topTenList()
+
+        self.reusableItem.change_request_votes_yes.add(self.user_2)
+
+        self.assertEqual(self.get_topTenList()['topTenItem'][0]['reusableItem']['change_request_votes_yes_count'], 1)
+
+        self.user_2.reusableItem_votes_yes.clear()
+
+        self.assertEqual(self.get_topTenList()['topTenItem'][0]['reusableItem']['change_request_votes_yes_count'], 0)
+
+    def test_invalidated_by_reusableItem_delete(self):
+        self.get_topTenList()
+
+        self.reusableItem.delete()
+
+        self.assertIsNone(self.get_topTenList()['topTenItem'][0]['reusableItem'])
+
+    def test_deleted_topTenList_not_served(self):
+        self.get_topTenList()
+
+        self.topTenList.delete()
+
+        response = self.client.get(self.list_url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_private_topTenList_not_served(self):
+        """
+        Permissions are checked by the queryset before the cache is used
+        """
+        self.get_topTenList()
+
+        TopTenList.objects.filter(pk=self.topTenList.pk).update(is_public=False)
+
+        response = self.client.get(self.list_url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_my_vote_not_leaked(self):
+        """
+        A logged in user's vote is never cached or served to anyone else
+        """
+        self.reusableItem.change_request_votes_yes.add(self.user_2)
+        self.get_topTenList()
+
+        self.client.force_authenticate(user=self.user_2)
+        self.assertEqual(self.get_topTenList()['topTenItem'][0]['reusableItem']['change_request_my_vote'], 'yes')
+
+        self.client.force_authenticate(user=self.user_3)
+        self.assertEqual(self.get_topTenList()['topTenItem'][0]['reusableItem']['change_request_my_vote'], '')
+
+        self.client.logout()
+        self.assertEqual(self.get_topTenList()['topTenItem'][0]['reusableItem']['change_request_my_vote'], '')
+
+        # logged in users are not served from the cache
+        self.assertEqual(cache_stats.as_dict()['hits'], 1)
+        self.assertEqual(cache_stats.as_dict()['misses'], 1)
+
+    def test_detail_uses_cache(self):
+        response = self.client.get(detail_url, {'id': self.topTenList.id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        cached_response = self.client.get(detail_url, {'id': self.topTenList.id})
+
+        self.assertEqual(json.loads(response.content), json.loads(cached_response.content))
+        self.assertEqual(cache_stats.as_dict()['hits'], 1)
+
+    def test_cache_stats_staff_only(self):
+        self.get_topTenList()
+
+        response = self.client.get(cache_stats_url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.client.force_authenticate(user=self.user_2)
+        response = self.client.get(cache_stats_url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.user_1.is_staff = True
+        self.user_1.save()
+        self.client.force_authenticate(user=self.user_1)
+
+        response = self.client.get(cache_stats_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(response.content), {'hits': 0, 'misses': 1, 'hit_rate': 0.0})
@@ -0,0 +1,99 @@
+"""
+Tests for deleting unreferenced reusableItems
+"""
+
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from users.models import CustomUser
+from toptenlists.models import TopTenList, TopTenItem, ReusableItem
+
+def create_reusable_items(user, count):
+    return ReusableItem.objects.bulk_create([ReusableItem(name='Item ' + str(index), created_by=user, created_by_username=user.username) for index in range(count)])
+
+class CleanupReusableItemTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user('Test user', 'person@example.com', '12345')
+
+    def setUp(self):
+        self.topTenList = TopTenList.objects.create(name='Test topTenList', description='A description', created_by=self.user, created_by_username=self.user.username)
+        TopTenItem.objects.bulk_create([TopTenItem(name='', order=order, topTenList=self.topTenList) for order in range(1, 11)])
+
+        self.reusableItem = ReusableItem.objects.create(name='Jane Austen', created_by=self.user, created_by_username=self.user.username)
+        self.topTenItem = self.topTenList.topTenItem.all()[0]
+        self.topTenItem.reusableItem = self.reusableItem
+        self.topTenItem.save()
+
+    def test_dereference_deletes_reusableitem(self):
+        """
+        A reusableItem is deleted when its last topTenItem stops referencing it
+        """
+        topTenItem = TopTenItem.objects.get(pk=self.topTenItem.id)
+        topTenItem.reusableItem = None
+        topTenItem.save()
+
+        self.assertFalse(ReusableItem.objects.filter(pk=self.reusableItem.id).exists())
+
+    def test_dereference_keeps_referenced_reusableitem(self):
+        """
+        A reusableItem that is still referenced by another topTenItem is not deleted
+        """
+        other_topTenItem = self.topTenList.topTenItem.all()[1]
+        other_topTenItem.reusableItem = self.reusableItem
+        other_topTenItem.save()
+
+        topTenItem = TopTenItem.objects.get(pk=self.topTenItem.id)
+        topTenItem.reusableItem = None
+        topTenItem.save()
+
+        self.assertTrue(ReusableItem.objects.filter(pk=self.reusableItem.id).exists())
+
+    def test_save_ignores_other_reusableitems(self):
+        """
+        Saving a topTenItem only checks the reusableItem it referenced
+        Other unreferenced reusableItems are left for the full sweep
+        """
+        orphan = create_reusable_items(self.user, 1)[0]
+
+        topTenItem = TopTenItem.objects.get(pk=self.topTenItem.id)
+        topTenItem.reusableItem = None
+        topTenItem.save()
+
+        self.assertTrue(ReusableItem.objects.filter(pk=orphan.id).exists())
+
+        out = StringIO()
+        call_command('cleanupreusableitems', stdout=out)
+
+        self.assertFalse(ReusableItem.objects.filter(pk=orphan.id).exists())
+        self.assertIn('Deleted 1 unreferenced reusableItems', out.getvalue())
+
+    def test_delete_topTenList_deletes_reusableitems(self):
+        """
+        Deleting a topTenList deletes the reusableItems that only it referenced
+        """
+        self.topTenList.delete()
+
+        self.assertFalse(ReusableItem.objects.filter(pk=self.reusableItem.id).exists())
+
+    def test_save_cost_does_not_grow(self):
+        """
+        The queries needed to save a topTenItem do not depend on the number of reusableItems
+        """
+        def save_count():
+            topTenItem = TopTenItem.objects.get(pk=self.topTenItem.id)
+            topTenItem.reusableItem = None
+
+            with self.assertNumQueries(18): # update the topTenItem and the users of the reusableItem, then find and delete the unreferenced reusableItem, its relations, its history, its notification jobs and its cached topTenLists
+                topTenItem.save()
+
+            topTenItem.reusableItem = ReusableItem.objects.create(name='Jane Austen', created_by=self.user, created_by_username=self.user.username)
+            topTenItem.save()
+            self.topTenItem = topTenItem
+
+        save_count()
+
+        create_reusable_items(self.user, 200)
+
+        save_count()
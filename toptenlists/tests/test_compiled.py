@@ -0,0 +1,188 @@
+"""
+Golden tests for compiled serializers: the compiled data must be the same as DRF's
+"""
+
+import json
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.request import Request
+from rest_framework.test import APITestCase, APIRequestFactory
+from rest_framework.utils.encoders import JSONEncoder
+from users.models import CustomUser
+from allauth.account.models import EmailAddress
+from toptenlists.models import TopTenList, TopTenItem, ReusableItem, Notification
+from toptenlists.serializers import TopTenListSerializer, TopTenItemSerializer, NotificationSerializer
+from toptenlists.compiled import CompiledSerializer, get_plan
+from toptenlists.history import add_history_entry
+
+# disable throttling for testing
+from toptenlists.api import TopTenListViewSet, TopTenListDetailViewSet, SearchListsItemsView, NotificationViewSet
+
+TopTenListViewSet.throttle_classes = ()
+TopTenListDetailViewSet.throttle_classes = ()
+SearchListsItemsView.throttle_classes = ()
+NotificationViewSet.throttle_classes = ()
+
+toptenlist_list_url = reverse('topTenLists:TopTenLists-list')
+toptenlist_detail_list_url = reverse('topTenLists:TopTenListDetail-list')
+search_lists_items_url = reverse('topTenLists:searchlistsitems-list')
+notification_list_url = reverse('topTenLists:Notifications-list')
+
+def create_user(index):
+    email_address = 'person_' + str(index) + '@example.com'
+    user = CustomUser.objects.create_user('Test user ' + str(index), email_address, email_address)
+    EmailAddress.objects.create(user=user, email=email_address, primary=True, verified=True)
+
+    return user
+
+class CompiledTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user_1 = create_user(1)
+        cls.user_2 = create_user(2)
+
+        public = ReusableItem.objects.create(name='Jane Austen', definition='English novelist', is_public=True, created_by=cls.user_2, created_by_username=cls.user_2.username)
+        private_2 = ReusableItem.objects.create(name='Emma', is_public=False, created_by=cls.user_2, created_by_username=cls.user_2.username)
+        private_1 = ReusableItem.objects.create(name='Persuasion', link='http://example.com', is_public=False, created_by=cls.user_1, created_by_username=cls.user_1.username)
+
+        public.change_request = {'name': 'Miss Austen'}
+        public.change_request_by = cls.user_1
+        public.change_request_at = timezone.now()
+        public.save()
+        add_history_entry(public, {'name': 'J. Austen'})
+        public.change_request_votes_yes.add(cls.user_1)
+        public.change_request_votes_no.add(cls.user_2)
+
+        reusableItems = [public, private_2, private_1, None]
+
+        for index, (user, is_public) in enumerate([(cls.user_1, True), (cls.user_1, False), (cls.user_2, True)]):
+            topTenList = TopTenList.objects.create(name='List ' + str(index), description='Description', is_public=is_public, created_by=user, created_by_username=user.username)
+
+            for order in range(1, 5):
+                TopTenItem.objects.create(topTenList=topTenList, name='Item ' + str(order), description='', order=order, reusableItem=reusableItems[order - 1])
+
+        # a child topTenList
+        TopTenList.objects.filter(name='List 2').update(parent_topTenItem=TopTenItem.objects.get(topTenList__name='List 0', order=1))
+
+        Notification.objects.create(context='reusableItem', event='changeRequestCreated', reusableItem=public, created_by=cls.user_1)
+        Notification.objects.create(context='topTenItem', event='reusableItemFromTopTenItem', topTenItem=TopTenItem.objects.filter(reusableItem=private_1).first(), reusableItem=private_1, created_by=cls.user_1)
+        Notification.objects.create(context='reusableItem', event='changeRequestRejected', created_by=cls.user_1, unread=False, new=False)
+
+class CompiledSerializerTest(CompiledTestCase):
+    def get_request(self, user, params):
+        request = Request(APIRequestFactory().get('/', params))
+        request.user = user
+
+        return request
+
+    def assertSameData(self, serializer_class, queryset, params=None, many=True):
+        """
+        For each user, the compiled data is the same as DRF's, including the order of keys and the types of values
+        """
+        for user in (AnonymousUser(), self.user_1, self.user_2):
+            context = {'request': self.get_request(user, params or {})}
+            instance = queryset if many else queryset.first()
+
+            expected = serializer_class(instance, many=many, context=context).data
+            compiled = CompiledSerializer(serializer_class(instance, many=many, context=context))
+
+            self.assertIsNotNone(get_plan(compiled.child if many else compiled.serializer))
+            self.assertEqual(json.dumps(compiled.data, cls=JSONEncoder), json.dumps(expected, cls=JSONEncoder))
+            self.assertEqual(type(compiled.data), type(expected))
+
+    def test_topTenLists(self):
+        queryset = TopTenList.objects.order_by('name')
+
+        self.assertSameData(TopTenListSerializer, queryset)
+        self.assertSameData(TopTenListSerializer, queryset, many=False)
+        self.assertSameData(TopTenListSerializer, queryset, {'expand': 'topTenItem'})
+        self.assertSameData(TopTenListSerializer, queryset, {'fields': 'id,name,topTenItem'})
+
+    def test_topTenItems(self):
+        queryset = TopTenItem.objects.order_by('topTenList__name', 'order')
+
+        self.assertSameData(TopTenItemSerializer, queryset)
+        self.assertSameData(TopTenItemSerializer, queryset, {'fields': 'id,created_by_username,reusableItem'})
+
+    def test_notifications(self):
+        queryset = Notification.objects.order_by('event')
+
+        self.assertSameData(NotificationSerializer, queryset)
+
+    def test_time_zone(self):
+        with timezone.override('Europe/London'):
+            self.assertSameData(TopTenListSerializer, TopTenList.objects.order_by('name'))
+
+    def test_private_reusableItem(self):
+        """
+        finish_representation removes another user's private reusableItem from a topTenItem
+        """
+        context = {'request': self.get_request(self.user_1, {})}
+        topTenItems = TopTenItem.objects.filter(topTenList__name='List 0').order_by('order')
+        data = CompiledSerializer(TopTenItemSerializer(topTenItems, many=True, context=context)).data
+
+        self.assertEqual(data[0]['reusableItem']['name'], 'Jane Austen')
+        self.assertNotIn('reusableItem', data[1])
+        self.assertEqual(data[2]['reusableItem']['name'], 'Persuasion')
+        self.assertIsNone(data[3]['reusableItem'])
+
+    def test_not_compilable(self):
+        """
+        A serializer that overrides to_representation without finish_representation is serialized by DRF
+        """
+        class ExtraSerializer(TopTenListSerializer):
+            def to_representation(self, instance):
+                data = super(ExtraSerializer, self).to_representation(instance)
+                data['extra'] = True
+
+                return data
+
+        context = {'request': self.get_request(self.user_1, {})}
+        serializer = ExtraSerializer(TopTenList.objects.order_by('name'), many=True, context=context)
+
+        self.assertIsNone(get_plan(serializer.child))
+        self.assertTrue(all(topTenList['extra'] for topTenList in CompiledSerializer(serializer).data))
+
+class CompiledViewTest(CompiledTestCase):
+    def get(self, url, params):
+        with override_settings(TOPTENLISTS_COMPILED_SERIALIZERS=False):
+            expected = self.client.get(url, params)
+
+        response = self.client.get(url, params)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, expected.content)
+
+        return response
+
+    def test_views(self):
+        topTenList = TopTenList.objects.get(name='List 0')
+
+        for user in (None, self.user_1):
+            self.client.force_authenticate(user=user)
+
+            self.get(toptenlist_list_url, {})
+            self.get(toptenlist_list_url, {'expand': 'topTenItem', 'limit': 2})
+            self.get(toptenlist_list_url + str(topTenList.id) + '/', {})
+            self.get(toptenlist_detail_list_url, {'id': topTenList.id})
+            self.get(search_lists_items_url, {})
+            self.get(search_lists_items_url, {'search': 'item'})
+
+        self.get(notification_list_url, {})
+
+    def test_drf_fields_not_used(self):
+        """
+        The compiled plan reads character fields without DRF's CharField
+        """
+        self.client.force_authenticate(user=self.user_1)
+
+        with mock.patch.object(serializers.CharField, 'to_representation', side_effect=AssertionError):
+            response = self.client.get(toptenlist_list_url, {})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 3)
@@ -0,0 +1,44 @@
+"""
+Tests for the explainqueries management command
+"""
+
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from users.models import CustomUser
+from toptenlists.models import TopTenList, TopTenItem, ReusableItem
+from toptenlists.explain import explain_query_shapes, find_full_scans
+
+class ExplainQueriesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user('Test user 1', 'person_1@example.com', 'person_1@example.com')
+        reusableItem = ReusableItem.objects.create(name='Jane Austen', is_public=True, created_by=cls.user, created_by_username=cls.user.username)
+
+        topTenList = TopTenList.objects.create(name='Writers', is_public=True, created_by=cls.user, created_by_username=cls.user.username)
+        TopTenItem.objects.bulk_create([TopTenItem(topTenList=topTenList, name='Writer ' + str(order), order=order, reusableItem=reusableItem if order == 1 else None) for order in range(1, 11)])
+
+    def test_explain_query_shapes(self):
+        reports = explain_query_shapes()
+        labels = [report['label'] for report in reports]
+
+        self.assertIn('my topTenLists', labels)
+        self.assertIn('topTenLists referencing a reusableItem', labels)
+
+        for report in reports:
+            self.assertGreater(len(report['queries']), 0, report['label'])
+
+            for query in report['queries']:
+                self.assertTrue(query['sql'].startswith('SELECT'))
+                self.assertGreater(len(query['plan']), 0)
+
+    def test_find_full_scans(self):
+        self.assertEqual(find_full_scans(['SCAN toptenlists_toptenitem', 'SCAN toptenlists_toptenlist USING INDEX toptenlist_name_id_idx', 'SEARCH toptenlists_reusableitem USING INDEX reusableitem_public_name_idx (is_public=?)']), ['toptenlists_toptenitem'])
+
+    def test_command(self):
+        out = StringIO()
+        call_command('explainqueries', username=self.user.username, stdout=out)
+
+        self.assertIn('my topTenLists', out.getvalue())
+        self.assertIn('full scans', out.getvalue())
@@ -0,0 +1,178 @@
+"""
+Tests for creating notifications in the background
+"""
+
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from users.models import CustomUser
+from toptenlists.models import ReusableItem, ReusableItemUser, Notification, NotificationJob
+from toptenlists.fanout import enqueue_notification, process_jobs, notify_chunk, get_queue_stats, run_queued_job, check_notification_queue
+
+notification_data = {'context': 'reusableItem', 'event': 'changeRequestCreated'}
+
+@override_settings(TOPTENLISTS_NOTIFICATION_CHUNK_SIZE=4, TOPTENLISTS_NOTIFICATION_MAX_ATTEMPTS=2)
+class NotificationFanoutTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = []
+
+        for index in range(10):
+            email_address = 'person_' + str(index) + '@example.com'
+            cls.users.append(CustomUser.objects.create_user('Test user ' + str(index), email_address, email_address))
+
+        cls.reusableItem = ReusableItem.objects.create(name='Jane Austen', is_public=True, created_by=cls.users[0], created_by_username=cls.users[0].username)
+
+        ReusableItemUser.objects.bulk_create([ReusableItemUser(reusableItem=cls.reusableItem, user=user) for user in cls.users])
+
+    def test_enqueue_does_not_notify(self):
+        with self.assertNumQueries(1):
+            enqueue_notification(self.reusableItem, notification_data, self.users[0])
+
+        self.assertEqual(Notification.objects.count(), 0)
+        self.assertEqual(get_queue_stats()['pending'], 1)
+
+    def test_run_on_commit(self):
+        """
+        The job is started when the request commits, without waiting for processnotifications
+        """
+        with mock.patch('toptenlists.fanout.transaction.on_commit') as on_commit, mock.patch('toptenlists.fanout.start_job') as start_job:
+            job = enqueue_notification(self.reusableItem, notification_data, self.users[0])
+
+            self.assertEqual(on_commit.call_count, 1)
+            on_commit.call_args[0][0]()
+            start_job.assert_called_once_with(job.pk)
+
+        self.assertTrue(run_queued_job(job.pk))
+        self.assertEqual(Notification.objects.count(), 9)
+
+        # a worker does not run it again
+        self.assertFalse(run_queued_job(job.pk))
+        self.assertEqual(process_jobs(), 0)
+
+    @override_settings(TOPTENLISTS_NOTIFICATION_RUN_ON_COMMIT=False)
+    def test_run_on_commit_off(self):
+        with mock.patch('toptenlists.fanout.transaction.on_commit') as on_commit:
+            enqueue_notification(self.reusableItem, notification_data)
+
+        self.assertEqual(on_commit.call_count, 0)
+
+    def test_stale_warning(self):
+        job = enqueue_notification(self.reusableItem, notification_data)
+
+        self.assertEqual(check_notification_queue(None), [])
+
+        NotificationJob.objects.filter(pk=job.pk).update(created_at=timezone.now() - timedelta(hours=1))
+
+        messages = check_notification_queue(None)
+        self.assertEqual(len(messages), 1)
+        self.assertEqual(messages[0].id, 'toptenlists.W001')
+
+        out = StringIO()
+        call_command('notificationqueue', stdout=out)
+        self.assertIn('Check that processnotifications is running', out.getvalue())
+
+    def test_process(self):
+        job = enqueue_notification(self.reusableItem, notification_data, self.users[0])
+
+        self.assertEqual(process_jobs(), 1)
+
+        # everybody except the user who made the change
+        self.assertEqual(set(Notification.objects.values_list('created_by', flat=True)), {user.id for user in self.users[1:]})
+        self.assertEqual(Notification.objects.filter(event='changeRequestCreated', reusableItem=self.reusableItem).count(), 9)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, NotificationJob.DONE)
+        self.assertEqual(job.notifications_created, 9)
+        self.assertEqual(job.attempts, 1)
+
+        # nothing left to do
+        self.assertEqual(process_jobs(), 0)
+        self.assertEqual(get_queue_stats()['done_since'], 1)
+
+    def test_retry_resumes(self):
+        """
+        A job that fails part way is retried without notifying anybody twice
+        """
+        job = enqueue_notification(self.reusableItem, notification_data)
+
+        original_notify_chunk = notify_chunk
+        calls = []
+
+        def failing_notify_chunk(job, chunk_size):
+            calls.append(job)
+
+            if len(calls) == 2:
+                raise RuntimeError('database went away')
+
+            return original_notify_chunk(job, chunk_size)
+
+        with mock.patch('toptenlists.fanout.notify_chunk', failing_notify_chunk):
+            process_jobs()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, NotificationJob.PENDING)
+        self.assertEqual(job.notifications_created, 4)
+        self.assertIn('database went away', job.last_error)
+        self.assertGreater(job.run_after, timezone.now())
+
+        # not due yet
+        self.assertEqual(process_jobs(), 0)
+
+        NotificationJob.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        self.assertEqual(process_jobs(), 1)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, NotificationJob.DONE)
+        self.assertEqual(job.attempts, 2)
+        self.assertEqual(Notification.objects.count(), 10)
+        self.assertEqual(Notification.objects.values('created_by').distinct().count(), 10)
+
+    def test_failed(self):
+        job = enqueue_notification(self.reusableItem, notification_data)
+
+        with mock.patch('toptenlists.fanout.notify_chunk', side_effect=RuntimeError('broken')):
+            process_jobs()
+            NotificationJob.objects.filter(pk=job.pk).update(run_after=timezone.now())
+            process_jobs()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, NotificationJob.FAILED)
+        self.assertEqual(get_queue_stats()['failed'], 1)
+
+        # a failed job is not retried
+        self.assertEqual(process_jobs(), 0)
+
+    def test_stale_job_taken(self):
+        """
+        A job whose worker stopped is taken by another worker
+        """
+        job = enqueue_notification(self.reusableItem, notification_data)
+        NotificationJob.objects.filter(pk=job.pk).update(status=NotificationJob.RUNNING, attempts=1, locked_at=timezone.now())
+
+        self.assertEqual(process_jobs(), 0)
+
+        NotificationJob.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(process_jobs(), 1)
+        self.assertEqual(Notification.objects.count(), 10)
+
+    def test_commands(self):
+        enqueue_notification(self.reusableItem, notification_data)
+
+        out = StringIO()
+        call_command('notificationqueue', stdout=out)
+        self.assertIn('pending: 1', out.getvalue())
+
+        out = StringIO()
+        call_command('processnotifications', once=True, stdout=out)
+        self.assertIn('Ran 1 notification jobs', out.getvalue())
+
+        out = StringIO()
+        call_command('notificationqueue', stdout=out)
+        self.assertIn('pending: 0', out.getvalue())
+        self.assertIn('done in the last 60 minutes: 1', out.getvalue())
@@ -0,0 +1,87 @@
+"""
+Tests for the history of reusableItems, see toptenlists/history.py
+"""
+
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from users.models import CustomUser
+from allauth.account.models import EmailAddress
+from toptenlists.models import ReusableItem, ReusableItemHistory
+from toptenlists.serializers import ReusableItemSerializer
+from toptenlists.history import add_history_entry, get_history
+
+# disable throttling for testing
+from toptenlists.api import ReusableItemViewSet
+
+ReusableItemViewSet.throttle_classes = ()
+
+def create_user(index):
+    email_address = 'person_' + str(index) + '@example.com'
+    user = CustomUser.objects.create_user('Test user ' + str(index), email_address, email_address)
+    EmailAddress.objects.create(user=user, email=email_address, primary=True, verified=True)
+
+    return user
+
+def get_history_url(reusableItem):
+    return reverse('topTenLists:ReusableItems-history', kwargs={'pk': reusableItem.id})
+
+class HistoryTest(APITestCase):
+    def setUp(self):
+        self.user_1 = create_user(1)
+        self.user_2 = create_user(2)
+
+        self.reusableItem = ReusableItemSerializer.create({'name': 'Jane Austen', 'definition': 'Novelist', 'is_public': True, 'created_by': self.user_1, 'created_by_username': self.user_1.username})
+
+        for index in range(1, 25):
+            add_history_entry(self.reusableItem, {'change_request': {'name': 'Name ' + str(index)}, 'change_request_resolution': 'rejected'})
+
+    def test_entries(self):
+        history = get_history(self.reusableItem)
+
+        self.assertEqual(len(history), 25)
+        self.assertEqual(history[0], {'name': 'Jane Austen', 'definition': 'Novelist'})
+        self.assertEqual(history[-1]['change_request']['name'], 'Name 24')
+        self.assertEqual(list(ReusableItemHistory.objects.filter(reusableItem=self.reusableItem).values_list('order', flat=True)), list(range(25)))
+
+    def test_not_in_reusableItem(self):
+        self.client.force_authenticate(user=self.user_1)
+        response = self.client.get(reverse('topTenLists:ReusableItems-detail', kwargs={'pk': self.reusableItem.id}))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('history', response.data)
+
+    def test_pages(self):
+        response = self.client.get(get_history_url(self.reusableItem))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 25)
+        self.assertEqual(len(response.data['results']), 20)
+        self.assertEqual(response.data['results'][0]['order'], 0)
+        self.assertEqual(response.data['results'][0]['entry']['name'], 'Jane Austen')
+
+        response = self.client.get(response.data['next'])
+
+        self.assertEqual([entry['order'] for entry in response.data['results']], [20, 21, 22, 23, 24])
+        self.assertIsNone(response.data['next'])
+
+        response = self.client.get(get_history_url(self.reusableItem), {'limit': 2, 'offset': 10})
+
+        self.assertEqual([entry['entry']['change_request']['name'] for entry in response.data['results']], ['Name 10', 'Name 11'])
+
+    def test_private(self):
+        """
+        Only the owner can see the history of a private reusableItem
+        """
+        ReusableItem.objects.filter(pk=self.reusableItem.pk).update(is_public=False)
+
+        response = self.client.get(get_history_url(self.reusableItem))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        self.client.force_authenticate(user=self.user_2)
+        response = self.client.get(get_history_url(self.reusableItem))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        self.client.force_authenticate(user=self.user_1)
+        response = self.client.get(get_history_url(self.reusableItem))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
@@ -0,0 +1,131 @@
+"""
+Test the request metrics middleware, see metrics.py
+"""
+
+import json
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from users.models import CustomUser
+from allauth.account.models import EmailAddress
+from toptenlists.metrics import EndpointMetrics, RequestMetrics, registry
+from toptenlists.models import TopTenList, TopTenItem
+
+# disable throttling for testing
+from toptenlists.api import TopTenListViewSet, TopTenListDetailViewSet
+
+TopTenListViewSet.throttle_classes = ()
+TopTenListDetailViewSet.throttle_classes = ()
+
+toptenlist_list_url = reverse('topTenLists:TopTenLists-list')
+metrics_url = reverse('topTenLists:metrics')
+
+def create_topTenLists(user, number):
+    for index in range(number):
+        topTenList = TopTenList.objects.create(name='List ' + str(index), description='', is_public=True, created_by=user, created_by_username=user.username)
+        TopTenItem.objects.bulk_create([TopTenItem(topTenList=topTenList, name='Item ' + str(order), order=order) for order in range(1, 11)])
+
+@override_settings(TOPTENLISTS_METRICS=True)
+class RequestMetricsTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user('Test user', 'person@example.com', '12345abcde')
+        EmailAddress.objects.create(user=cls.user, email='person@example.com', primary=True, verified=True)
+        create_topTenLists(cls.user, 3)
+
+    def setUp(self):
+        registry.reset()
+        self.client.force_authenticate(user=self.user)
+
+    def test_list(self):
+        for index in range(2):
+            response = self.client.get(toptenlist_list_url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        endpoint = registry.as_dict()['TopTenListViewSet.list']
+        self.assertEqual(endpoint['requests'], 2)
+        self.assertEqual(endpoint['errors'], 0)
+        self.assertGreater(endpoint['mean_queries'], 0)
+        self.assertGreater(endpoint['mean_serializer_ms'], 0)
+        self.assertEqual(endpoint['mean_bytes'], len(response.content))
+        self.assertEqual(sum(endpoint['histogram'].values()), 2)
+
+    def test_detail(self):
+        topTenList = TopTenList.objects.first()
+        response = self.client.get(reverse('topTenLists:TopTenListDetail-list'), {'id': topTenList.pk})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(list(registry.as_dict()), ['TopTenListDetailViewSet.list'])
+
+    @override_settings(TOPTENLISTS_METRICS_PATHS=('/api/v1/users/',))
+    def test_paths(self):
+        self.client.get(toptenlist_list_url)
+
+        self.assertEqual(registry.as_dict(), {})
+
+    @override_settings(TOPTENLISTS_METRICS_SLOW_REQUEST=0)
+    def test_slow_request(self):
+        with self.assertLogs('toptenlists.metrics', 'WARNING') as logs:
+            self.client.get(toptenlist_list_url)
+
+        self.assertIn('TopTenListViewSet.list', logs.output[0])
+        self.assertIn('SELECT', logs.output[0])
+
+    def test_staff_only(self):
+        self.client.get(toptenlist_list_url)
+
+        response = self.client.get(metrics_url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.user.is_staff = True
+        self.user.save()
+
+        response = self.client.get(metrics_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('TopTenListViewSet.list', response.data)
+
+        response = self.client.delete(metrics_url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(list(registry.as_dict()), ['RequestMetricsView.delete'])
+
+class RequestMetricsOffTest(APITestCase):
+    def test_off(self):
+        registry.reset()
+        self.client.get(toptenlist_list_url)
+
+        self.assertEqual(registry.as_dict(), {})
+
+class RequestMetricsCommandTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user('Test user', 'person@example.com', '12345abcde')
+        create_topTenLists(cls.user, 2)
+
+    def test_command(self):
+        out = StringIO()
+        call_command('requestmetrics', '--repeat', '2', '--username', 'Test user', '--json', stdout=out)
+        report = json.loads(out.getvalue())
+
+        self.assertEqual(report['TopTenListViewSet.list']['requests'], 2)
+        self.assertEqual(report['TopTenListDetailViewSet.list']['requests'], 2)
+        self.assertIn('NotificationViewSet.list', report)
+
+        out = StringIO()
+        call_command('requestmetrics', toptenlist_list_url, '--repeat', '1', stdout=out)
+        self.assertIn('TopTenListViewSet.list', out.getvalue())
+
+class EndpointMetricsTest(SimpleTestCase):
+    def test_percentiles(self):
+        endpoint = EndpointMetrics()
+
+        for milliseconds in [0.5] * 90 + [30] * 9 + [20000]:
+            endpoint.add(RequestMetrics(), milliseconds / 1000, 200, 100)
+
+        self.assertEqual(endpoint.get_percentile(50), 1)
+        self.assertEqual(endpoint.get_percentile(95), 50)
+        self.assertEqual(endpoint.get_percentile(99), 50)
+        self.assertIsNone(endpoint.get_percentile(100))
@@ -3,13 +3,19 @@ Tests for ReusableItems api
 """
 
 import json
+from unittest import mock
 
+from django.db import connection
+from django.db.models.query import QuerySet
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 from users.models import CustomUser
 from allauth.account.models import EmailAddress 
-from toptenlists.models import TopTenList, TopTenItem, ReusableItem, Notification
+from toptenlists.models import TopTenList, TopTenItem, ReusableItem, ReusableItemUser, Notification
+from toptenlists.cache import get_cache
+from toptenlists.fanout import enqueue_notification, process_jobs
 
 # disable throttling for testing
 from toptenlists.api import TopTenListViewSet, TopTenItemViewSet, TopTenListDetailViewSet, ReusableItemViewSet, NotificationViewSet
@@ -47,6 +53,10 @@ notification_list_url = reverse('topTenLists:Notifications-list')
 
 notification_deleteall_url = reverse('topTenLists:Notifications-deleteall')
 
+notification_bulkupdate_url = reverse('topTenLists:Notifications-bulkupdate')
+
+notification_counts_url = reverse('topTenLists:Notifications-counts')
+
 def create_user(self, index):
     user_ref = 'user_' + str(index) # refer to user by self.user_1 etc
     username = 'Test user ' + str(index)
@@ -246,6 +256,49 @@ class DeleteAllNotificationAPITest(APITestCase):
         self.assertEqual(Notification.objects.filter(pk=user_1_id).count(), 0)
         self.assertEqual(Notification.objects.count(), 2)
 
+        # the deleted ids are returned
+        self.assertEqual(len(response.data), 3)
+
+    def test_delete_all_notifications_queries(self):
+        """
+        Deleting all notifications reads their ids and deletes them without loading the rows
+        """
+        for index in range(20):
+            create_notification(self, 'user_1')
+
+        self.client.force_authenticate(user=self.user_1)
+
+        with CaptureQueriesContext(connection) as context:
+            self.client.delete(notification_deleteall_url)
+
+        notification_queries = [query['sql'] for query in context.captured_queries if 'toptenlists_notification' in query['sql']]
+
+        self.assertEqual(len(notification_queries), 2)
+        self.assertFalse(any('"toptenlists_notification"."event"' in sql for sql in notification_queries))
+        self.assertEqual(Notification.objects.filter(created_by=self.user_1).count(), 0)
+
+    def test_delete_all_keeps_new_notification(self):
+        """
+        A notification created after the ids are read is neither returned nor deleted
+        """
+        self.client.force_authenticate(user=self.user_1)
+        original_values_list = QuerySet.values_list
+        created = []
+
+        def values_list_then_create(queryset, *args, **kwargs):
+            ids = list(original_values_list(queryset, *args, **kwargs))
+
+            if queryset.model is Notification and len(created) == 0:
+                created.append(create_notification(self, 'user_1'))
+
+            return ids
+
+        with mock.patch.object(QuerySet, 'values_list', autospec=True, side_effect=values_list_then_create):
+            response = self.client.delete(notification_deleteall_url)
+
+        self.assertEqual(len(response.data), 3)
+        self.assertEqual(list(Notification.objects.filter(created_by=self.user_1)), created)
+
     def test_delete_all_notifications_not_logged_in(self):
         """
         Delete notification should fail if user isn't logged in
@@ -334,3 +387,167 @@ class EditNotificationAPITest(APITestCase):
         # the request should succeed
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
         self.assertEqual(Notification.objects.first().unread, True)
+
+class BulkUpdateNotificationAPITest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for index in range(1, 3): # user_1 and user_2
+            create_user(cls, index)
+
+    def setUp(self):
+        self.notifications = [create_notification(self, 'user_1') for index in range(5)]
+        self.other_notification = create_notification(self, 'user_2')
+
+    def test_update_all(self):
+        """
+        All the user's notifications are updated with one query for each flag
+        """
+        self.client.force_authenticate(user=self.user_1)
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.patch(notification_bulkupdate_url, {'new': False, 'unread': False}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['updated'], {'new': 5, 'unread': 5})
+        self.assertEqual(len([query for query in context.captured_queries if 'toptenlists_notification' in query['sql']]), 2)
+
+        self.assertEqual(Notification.objects.filter(created_by=self.user_1, new=True).count(), 0)
+        self.assertEqual(Notification.objects.filter(created_by=self.user_1, unread=True).count(), 0)
+
+        # another user's notifications are not changed
+        self.other_notification.refresh_from_db()
+        self.assertEqual(self.other_notification.new, True)
+        self.assertEqual(self.other_notification.unread, True)
+
+    def test_update_ids(self):
+        self.client.force_authenticate(user=self.user_1)
+
+        ids = [str(self.notifications[0].id), str(self.notifications[1].id), str(self.other_notification.id)]
+        response = self.client.patch(notification_bulkupdate_url, {'ids': ids, 'new': False}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['updated'], {'new': 2})
+
+        self.assertEqual(Notification.objects.filter(created_by=self.user_1, new=False).count(), 2)
+        self.assertEqual(Notification.objects.filter(created_by=self.user_1, unread=False).count(), 0)
+        self.assertEqual(Notification.objects.get(pk=self.other_notification.id).new, True)
+
+    def test_update_invalid(self):
+        self.client.force_authenticate(user=self.user_1)
+
+        self.assertEqual(self.client.patch(notification_bulkupdate_url, {}, format='json').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.patch(notification_bulkupdate_url, {'new': 'no'}, format='json').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.patch(notification_bulkupdate_url, {'new': False, 'ids': ['not an id']}, format='json').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Notification.objects.filter(new=False).count(), 0)
+
+    def test_update_not_logged_in(self):
+        response = self.client.patch(notification_bulkupdate_url, {'new': False}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(Notification.objects.filter(new=False).count(), 0)
+
+class NotificationCountsAPITest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for index in range(1, 3): # user_1 and user_2
+            create_user(cls, index)
+
+    def setUp(self):
+        get_cache().clear()
+
+        # the counts are only cached in a shared cache, and the tests run in one process
+        patcher = mock.patch('toptenlists.counters.use_cached_counts', return_value=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.notifications = [create_notification(self, 'user_1') for index in range(4)]
+        create_notification(self, 'user_2')
+
+        self.client.force_authenticate(user=self.user_1)
+
+    def get_counts(self):
+        response = self.client.get(notification_counts_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        return response.data
+
+    def assertCountsCorrect(self):
+        """
+        The cached counts match the notifications
+        """
+        myNotifications = Notification.objects.filter(created_by=self.user_1)
+        expected = {'unread': myNotifications.filter(unread=True).count(), 'new': myNotifications.filter(new=True).count()}
+
+        with CaptureQueriesContext(connection) as context:
+            counts = self.get_counts()
+
+        self.assertEqual(counts, expected)
+        self.assertFalse(any('toptenlists_notification' in query['sql'] for query in context.captured_queries))
+
+    def test_counts_cached(self):
+        self.assertEqual(self.get_counts(), {'unread': 4, 'new': 4})
+        self.assertCountsCorrect()
+
+    def test_counts_not_logged_in(self):
+        self.client.force_authenticate(user=None)
+
+        response = self.client.get(notification_counts_url)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_counts_follow_changes(self):
+        self.get_counts()
+
+        # edit one notification
+        url = reverse('topTenLists:Notifications-detail', kwargs={'pk': self.notifications[0].id})
+        self.client.patch(url, {'unread': False}, format='json')
+        self.assertCountsCorrect()
+
+        # set the same value again
+        self.client.patch(url, {'unread': False}, format='json')
+        self.assertCountsCorrect()
+
+        # bulk update, including a notification that has already changed
+        self.client.patch(notification_bulkupdate_url, {'ids': [str(self.notifications[0].id), str(self.notifications[1].id)], 'unread': False, 'new': False}, format='json')
+        self.assertCountsCorrect()
+
+        self.client.patch(notification_bulkupdate_url, {'new': True}, format='json')
+        self.assertCountsCorrect()
+
+        # delete one
+        url = reverse('topTenLists:Notifications-detail', kwargs={'pk': self.notifications[3].id})
+        self.client.delete(url)
+        self.assertCountsCorrect()
+
+        # created by the server
+        create_notification(self, 'user_1')
+        self.assertCountsCorrect()
+
+        # a notification may have been created since the ids were read, so the counts are counted again once
+        self.client.delete(notification_deleteall_url)
+        self.assertEqual(self.get_counts(), {'unread': 0, 'new': 0})
+        self.assertCountsCorrect()
+
+    def test_counts_follow_fanout(self):
+        self.get_counts()
+
+        reusableItem = ReusableItem.objects.create(name='Jane Austen', is_public=True, created_by=self.user_2, created_by_username=self.user_2.username)
+        ReusableItemUser.objects.create(reusableItem=reusableItem, user=self.user_1)
+        ReusableItemUser.objects.create(reusableItem=reusableItem, user=self.user_2)
+
+        enqueue_notification(reusableItem, {'context': 'reusableItem', 'event': 'changeRequestCreated'}, self.user_2)
+        process_jobs()
+
+        self.assertEqual(self.get_counts(), {'unread': 5, 'new': 5})
+        self.assertCountsCorrect()
+
+    def test_counts_not_cached_in_local_memory(self):
+        """
+        Local memory is not shared with the processes that create notifications, so the counts are read every time
+        """
+        with mock.patch('toptenlists.counters.use_cached_counts', return_value=False):
+            self.assertEqual(self.get_counts(), {'unread': 4, 'new': 4})
+
+            Notification.objects.filter(pk=self.notifications[0].pk).update(unread=False)
+
+            self.assertEqual(self.get_counts(), {'unread': 3, 'new': 4})
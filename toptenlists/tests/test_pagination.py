@@ -0,0 +1,91 @@
+"""
+Tests for keyset pagination of topTenLists
+"""
+
+import json
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from users.models import CustomUser
+from allauth.account.models import EmailAddress
+from toptenlists.models import TopTenList
+
+# disable throttling for testing
+from toptenlists.api import TopTenListViewSet
+
+TopTenListViewSet.throttle_classes = ()
+
+toptenlist_list_url = reverse('topTenLists:TopTenLists-list')
+
+class KeysetPaginationTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        email_address = 'person_1@example.com'
+        cls.user = CustomUser.objects.create_user('Test user 1', email_address, email_address)
+        EmailAddress.objects.create(user=cls.user, email=email_address, primary=True, verified=True)
+
+        # several topTenLists share each name, so pages must also be ordered by id
+        for index in range(25):
+            TopTenList.objects.create(name='List ' + str(index % 7), created_by=cls.user, created_by_username=cls.user.username, is_public=index % 5 != 0)
+
+    def get(self, url, params=None):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        return json.loads(response.content)
+
+    def get_expected_ids(self):
+        return [str(pk) for pk in TopTenList.objects.filter(is_public=True).order_by('name', 'id').values_list('id', flat=True)]
+
+    def test_pages(self):
+        """
+        Following next links returns every public topTenList once, in order
+        """
+        ids = []
+        data = self.get(toptenlist_list_url, {'pagination': 'cursor', 'limit': 6, 'fields': 'id,name'})
+        self.assertIsNone(data['previous'])
+
+        while True:
+            ids.extend(topTenList['id'] for topTenList in data['results'])
+
+            if data['next'] is None:
+                break
+
+            data = self.get(data['next'])
+
+        self.assertEqual(ids, self.get_expected_ids())
+
+    def test_previous(self):
+        first = self.get(toptenlist_list_url, {'pagination': 'cursor', 'limit': 6})
+        second = self.get(first['next'])
+        third = self.get(second['next'])
+
+        self.assertEqual(self.get(third['previous'])['results'], second['results'])
+
+        back_to_first = self.get(second['previous'])
+
+        self.assertEqual(back_to_first['results'], first['results'])
+        self.assertIsNone(back_to_first['previous'])
+        self.assertEqual(self.get(back_to_first['next'])['results'], second['results'])
+
+    def test_no_count(self):
+        first = self.get(toptenlist_list_url, {'pagination': 'cursor', 'limit': 6})
+
+        with CaptureQueriesContext(connection) as context:
+            self.get(first['next'])
+
+        self.assertFalse(any('COUNT' in query['sql'] for query in context.captured_queries))
+
+    def test_invalid_cursor(self):
+        response = self.client.get(toptenlist_list_url, {'cursor': 'not a cursor'})
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_limit_offset_unchanged(self):
+        data = self.get(toptenlist_list_url, {'limit': 6, 'offset': 6})
+
+        self.assertEqual(data['count'], 20)
+        self.assertEqual(len(data['results']), 6)
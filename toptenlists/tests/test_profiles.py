@@ -0,0 +1,139 @@
+"""
+Tests for list profiles
+"""
+
+import json
+from io import StringIO
+
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from users.models import CustomUser
+from allauth.account.models import EmailAddress
+from toptenlists.models import TopTenList, TopTenItem, ReusableItem
+
+# disable throttling for testing
+from toptenlists.api import TopTenListViewSet, TopTenItemViewSet, ReusableItemViewSet
+
+TopTenListViewSet.throttle_classes = ()
+TopTenItemViewSet.throttle_classes = ()
+ReusableItemViewSet.throttle_classes = ()
+
+toptenlist_list_url = reverse('topTenLists:TopTenLists-list')
+toptenitem_list_url = reverse('topTenLists:TopTenItems-list')
+reusableitem_list_url = reverse('topTenLists:ReusableItems-list')
+
+class ProfileTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        email_address = 'person_1@example.com'
+        cls.user = CustomUser.objects.create_user('Test user 1', email_address, email_address)
+        EmailAddress.objects.create(user=cls.user, email=email_address, primary=True, verified=True)
+
+        cls.reusableItem = ReusableItem.objects.create(name='Jane Austen', is_public=True, created_by=cls.user, created_by_username=cls.user.username)
+
+        for index in range(6):
+            topTenList = TopTenList.objects.create(name='List ' + str(index), description='Description ' + str(index), is_public=index != 0, created_by=cls.user, created_by_username=cls.user.username)
+
+            for order in range(1, 11):
+                TopTenItem.objects.create(topTenList=topTenList, name='Item ' + str(order), order=order, reusableItem=cls.reusableItem if order == 1 else None)
+
+    def get(self, url, params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        return json.loads(response.content)
+
+    def assertSameValues(self, flat, full):
+        """
+        Every field of the flat data has the value the full serializer gives it
+        """
+        self.assertEqual(len(flat), len(full))
+
+        for flat_item, full_item in zip(flat, full):
+            for key, value in flat_item.items():
+                if isinstance(value, list):
+                    self.assertSameValues(value, full_item[key])
+                else:
+                    self.assertEqual(value, full_item[key], key)
+
+    def test_summary(self):
+        data = self.get(toptenlist_list_url, {'profile': 'summary', 'limit': 10})
+        full = self.get(toptenlist_list_url, {'limit': 10})
+
+        self.assertEqual(data['count'], 5)
+        self.assertEqual(list(data['results'][0]), ['id', 'name', 'created_by_username'])
+        self.assertSameValues(data['results'], full['results'])
+
+    def test_card(self):
+        data = self.get(toptenlist_list_url, {'profile': 'card', 'limit': 10})
+        full = self.get(toptenlist_list_url, {'limit': 10})
+
+        self.assertEqual(len(data['results'][0]['topTenItem']), 10)
+        self.assertEqual([topTenItem['order'] for topTenItem in data['results'][0]['topTenItem']], list(range(1, 11)))
+        self.assertEqual(data['results'][0]['topTenItem'][0]['reusableItem_id'], str(self.reusableItem.id))
+        self.assertNotIn('history', data['results'][0])
+        self.assertSameValues(data['results'], full['results'])
+
+    def test_own_lists(self):
+        self.client.force_authenticate(user=self.user)
+
+        data = self.get(toptenlist_list_url, {'profile': 'summary', 'listset': 'my-topTenLists'})
+
+        self.assertEqual(len(data), 6)
+
+    def test_query_counts(self):
+        # count, then the topTenLists
+        with self.assertNumQueries(2):
+            self.get(toptenlist_list_url, {'profile': 'summary', 'limit': 10})
+
+        # and the topTenItems of the page
+        with self.assertNumQueries(3):
+            self.get(toptenlist_list_url, {'profile': 'card', 'limit': 10})
+
+    def test_keyset_pages(self):
+        ids = []
+        data = self.get(toptenlist_list_url, {'profile': 'summary', 'pagination': 'cursor', 'limit': 2})
+
+        while True:
+            ids.extend(topTenList['id'] for topTenList in data['results'])
+
+            if data['next'] is None:
+                break
+
+            data = self.get(data['next'], {})
+
+        self.assertEqual(ids, [str(pk) for pk in TopTenList.objects.filter(is_public=True).order_by('name', 'id').values_list('id', flat=True)])
+
+    def test_topTenItems_and_reusableItems(self):
+        data = self.get(toptenitem_list_url, {'profile': 'card'})
+        full = self.get(toptenitem_list_url, {})
+
+        self.assertEqual(len(data), 50)
+        self.assertSameValues(sorted(data, key=lambda item: item['id']), sorted(full, key=lambda item: item['id']))
+
+        data = self.get(reusableitem_list_url, {'profile': 'card'})
+        full = self.get(reusableitem_list_url, {})
+
+        self.assertSameValues(data, full)
+
+    def test_invalid_profile(self):
+        response = self.client.get(toptenlist_list_url, {'profile': 'everything'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_retrieve_is_full(self):
+        topTenList = TopTenList.objects.filter(is_public=True).first()
+
+        data = self.get(reverse('topTenLists:TopTenLists-detail', kwargs={'pk': topTenList.id}), {'profile': 'summary'})
+
+        self.assertIn('topTenItem', data)
+        self.assertIn('modified_by', data)
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command('benchmarkprofiles', count=20, repeat=1, stdout=out)
+
+        for profile in ('full', 'card', 'summary'):
+            self.assertIn(profile, out.getvalue())
@@ -0,0 +1,108 @@
+"""
+The number of queries needed to read topTenLists, search results and notifications
+must not depend on the number of results
+"""
+
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from users.models import CustomUser
+from allauth.account.models import EmailAddress
+from toptenlists.models import TopTenList, TopTenItem, ReusableItem, Notification
+
+# disable throttling for testing
+from toptenlists.api import TopTenListViewSet, TopTenListDetailViewSet, SearchListsItemsView, NotificationViewSet
+
+TopTenListViewSet.throttle_classes = ()
+TopTenListDetailViewSet.throttle_classes = ()
+SearchListsItemsView.throttle_classes = ()
+NotificationViewSet.throttle_classes = ()
+
+toptenlist_list_url = reverse('topTenLists:TopTenLists-list')
+search_lists_items_url = reverse('topTenLists:searchlistsitems-list')
+notification_list_url = reverse('topTenLists:Notifications-list')
+
+def get_list_data(name):
+    return {'name': name, 'description':'', 'is_public': True,
+    'topTenItem': [{'name': name + ' item ' + str(order), 'description': '', 'order': order} for order in range(1, 11)]}
+
+class QueryCountTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        users = []
+
+        for index in range(1, 3):
+            email_address = 'person_' + str(index) + '@example.com'
+            user = CustomUser.objects.create_user('Test user ' + str(index), email_address, email_address)
+            EmailAddress.objects.create(user=user, email=email_address, primary=True, verified=True)
+            users.append(user)
+
+        cls.user_1, cls.user_2 = users
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.user_1)
+        self.number_of_lists = 0
+
+    def add_lists(self, number):
+        """
+        Create topTenLists whose topTenItems reference reusableItems with votes, and a notification for each topTenItem
+        """
+        for index in range(self.number_of_lists, self.number_of_lists + number):
+            response = self.client.post(toptenlist_list_url, get_list_data('List ' + str(index)), format='json')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+            for topTenItem in TopTenItem.objects.filter(topTenList__name='List ' + str(index), order__lte=3):
+                reusableItem = ReusableItem.objects.create(name=topTenItem.name, is_public=True, created_by=self.user_1, created_by_username=self.user_1.username, change_request={'name': 'New name'}, change_request_by=self.user_1)
+                reusableItem.change_request_votes_yes.add(self.user_1)
+                reusableItem.change_request_votes_no.add(self.user_2)
+
+                topTenItem.reusableItem = reusableItem
+                topTenItem.save()
+
+                Notification.objects.create(context='reusableItem', event='changeRequestCreated', created_by=self.user_1, topTenItem=topTenItem, reusableItem=reusableItem)
+
+        self.number_of_lists = self.number_of_lists + number
+
+    def assertConstantQueries(self, number, url, params=None):
+        """
+        The same number of queries is made for 2 and for 6 topTenLists
+        """
+        for number_of_lists in (2, 6):
+            self.add_lists(number_of_lists - self.number_of_lists)
+
+            with self.assertNumQueries(number):
+                response = self.client.get(url, params or {})
+
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_topTenLists(self):
+        # count, topTenLists, topTenItems, reusableItems
+        self.assertConstantQueries(4, toptenlist_list_url)
+
+    def test_topTenLists_expand_topTenItem(self):
+        # the expanded topTenItems do not include reusableItems
+        self.assertConstantQueries(3, toptenlist_list_url, {'expand': 'topTenItem'})
+
+    def test_topTenLists_fields(self):
+        # topTenItems are not needed
+        self.assertConstantQueries(2, toptenlist_list_url, {'fields': 'id,name'})
+
+    def test_topTenList_detail(self):
+        self.add_lists(1)
+        topTenList = TopTenList.objects.get(name='List 0')
+
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('topTenLists:TopTenLists-detail', kwargs={'pk': topTenList.id}))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_search_lists_items(self):
+        # the in-memory search index is built on the first search
+        self.client.get(search_lists_items_url, {'search': 'list'})
+
+        # for each of topTenLists and topTenItems: count, results and reusableItems, plus topTenItems for topTenLists
+        self.assertConstantQueries(7, search_lists_items_url, {'search': 'list'})
+
+    def test_notifications(self):
+        # notifications with topTenItems and their topTenLists, and the reusableItems of both
+        self.assertConstantQueries(3, notification_list_url)
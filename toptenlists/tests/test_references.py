@@ -0,0 +1,111 @@
+"""
+Tests for recording the users who reference each reusableItem
+"""
+
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from users.models import CustomUser
+from toptenlists.models import TopTenList, TopTenItem, ReusableItem, ReusableItemUser
+from toptenlists.serializers import ReusableItemSerializer
+
+def create_toptenlist(user):
+    topTenList = TopTenList.objects.create(name='Test topTenList', description='A description', created_by=user, created_by_username=user.username)
+    TopTenItem.objects.bulk_create([TopTenItem(name='', order=order, topTenList=topTenList) for order in range(1, 11)])
+
+    return topTenList
+
+def reference(topTenList, index, reusableItem):
+    topTenItem = topTenList.topTenItem.all()[index]
+    topTenItem.reusableItem = reusableItem
+    topTenItem.save()
+
+    return topTenItem
+
+def get_users_count(reusableItem):
+    return ReusableItem.objects.get(pk=reusableItem.id).users_count
+
+class ReusableItemUserTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user_1 = CustomUser.objects.create_user('Test user 1', 'person_1@example.com', '12345')
+        cls.user_2 = CustomUser.objects.create_user('Test user 2', 'person_2@example.com', '12345')
+
+    def setUp(self):
+        self.toptenlist_1 = create_toptenlist(self.user_1)
+        self.toptenlist_2 = create_toptenlist(self.user_2)
+
+        self.reusableItem = ReusableItem.objects.create(name='Jane Austen', created_by=self.user_1, created_by_username=self.user_1.username)
+        reference(self.toptenlist_1, 0, self.reusableItem)
+
+    def test_reference_counts_users_once(self):
+        """
+        A user is counted once however many of their topTenItems reference the reusableItem
+        """
+        self.assertEqual(get_users_count(self.reusableItem), 1)
+
+        reference(self.toptenlist_1, 1, self.reusableItem)
+
+        self.assertEqual(get_users_count(self.reusableItem), 1)
+
+        reference(self.toptenlist_2, 0, self.reusableItem)
+
+        self.assertEqual(get_users_count(self.reusableItem), 2)
+        self.assertEqual(set(ReusableItemSerializer.find_users(self.reusableItem)), {self.user_1, self.user_2})
+        self.assertEqual(ReusableItemSerializer.count_users(self.reusableItem), 2)
+
+    def test_dereference(self):
+        """
+        A user is no longer counted when none of their topTenItems reference the reusableItem
+        """
+        reference(self.toptenlist_1, 1, self.reusableItem)
+        reference(self.toptenlist_2, 0, self.reusableItem)
+
+        reference(self.toptenlist_2, 0, None)
+
+        self.assertEqual(get_users_count(self.reusableItem), 1)
+
+        reference(self.toptenlist_1, 0, None)
+
+        self.assertEqual(get_users_count(self.reusableItem), 1)
+        self.assertEqual(list(ReusableItemSerializer.find_users(self.reusableItem)), [self.user_1])
+
+    def test_delete_topTenList(self):
+        """
+        Deleting a topTenList removes its user if no other topTenList of theirs references the reusableItem
+        """
+        reference(self.toptenlist_2, 0, self.reusableItem)
+
+        self.toptenlist_2.delete()
+
+        self.assertEqual(get_users_count(self.reusableItem), 1)
+
+    def test_stale_instance_does_not_overwrite_users_count(self):
+        """
+        Saving a reusableItem loaded before its users changed keeps the recorded count
+        """
+        reusableItem = ReusableItem.objects.get(pk=self.reusableItem.id)
+
+        reference(self.toptenlist_2, 0, self.reusableItem)
+
+        reusableItem.definition = 'A writer'
+        reusableItem.save()
+
+        self.assertEqual(get_users_count(self.reusableItem), 2)
+
+    def test_rebuild(self):
+        """
+        The rebuild command repairs missing users and wrong counts
+        """
+        reference(self.toptenlist_2, 0, self.reusableItem)
+
+        ReusableItemUser.objects.filter(user=self.user_2).delete()
+        ReusableItem.objects.filter(pk=self.reusableItem.id).update(users_count=5)
+
+        out = StringIO()
+        call_command('rebuildreusableitemusers', stdout=out)
+
+        self.assertEqual(get_users_count(self.reusableItem), 2)
+        self.assertEqual(ReusableItemUser.objects.filter(reusableItem=self.reusableItem).count(), 2)
+        self.assertIn('Added 1 and removed 0 reusableItem users, corrected users_count for 1 reusableItems', out.getvalue())
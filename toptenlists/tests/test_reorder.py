@@ -0,0 +1,88 @@
+"""
+Tests for changing the order of topTenItems
+"""
+
+import json
+
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from users.models import CustomUser
+from allauth.account.models import EmailAddress
+from toptenlists.models import TopTenList, TopTenItem
+
+# disable throttling for testing
+from toptenlists.api import TopTenListViewSet, TopTenItemViewSet
+
+TopTenListViewSet.throttle_classes = ()
+TopTenItemViewSet.throttle_classes = ()
+
+toptenlist_data_1 = {'name': 'Favourite writers', 'description':'', 'is_public': True,
+'topTenItem': [{'name': 'Writer ' + str(order), 'description': '', 'order': order} for order in range(1, 11)]}
+
+create_list_url = reverse('topTenLists:TopTenLists-list')
+
+def create_user(self, index):
+    email_address = 'person_' + str(index) + '@example.com'
+
+    user = CustomUser.objects.create_user('Test user ' + str(index), email_address, email_address)
+    EmailAddress.objects.create(user=user, email=email_address, primary=True, verified=True)
+
+    setattr(self, 'user_' + str(index), user)
+
+class ReorderTopTenItemsAPITest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for index in range(1, 3):
+            create_user(cls, index)
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.user_1)
+        response = self.client.post(create_list_url, toptenlist_data_1, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        self.topTenList = TopTenList.objects.get(created_by=self.user_1)
+        self.topTenItem_ids = list(TopTenItem.objects.filter(topTenList=self.topTenList).values_list('id', flat=True))
+        self.reorder_url = reverse('topTenLists:TopTenLists-reorder', kwargs={'pk': self.topTenList.id})
+
+    def get_names(self):
+        return list(TopTenItem.objects.filter(topTenList=self.topTenList).values_list('name', flat=True))
+
+    def test_reorder(self):
+        new_ids = list(reversed(self.topTenItem_ids))
+
+        # permissions and the topTenList, then a savepoint around locking the orders and one update
+        with self.assertNumQueries(7):
+            response = self.client.patch(self.reorder_url, {'topTenItem_ids': [str(pk) for pk in new_ids]}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(json.loads(response.content)), 10)
+        self.assertEqual(self.get_names(), ['Writer ' + str(order) for order in range(10, 0, -1)])
+        self.assertEqual(sorted(TopTenItem.objects.filter(topTenList=self.topTenList).values_list('order', flat=True)), list(range(1, 11)))
+
+    def test_reorder_must_include_every_topTenItem(self):
+        response = self.client.patch(self.reorder_url, {'topTenItem_ids': [str(pk) for pk in self.topTenItem_ids[1:]]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        duplicated = self.topTenItem_ids[:9] + self.topTenItem_ids[:1]
+        response = self.client.patch(self.reorder_url, {'topTenItem_ids': [str(pk) for pk in duplicated]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.patch(self.reorder_url, {'topTenItem_ids': ['not a uuid']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.assertEqual(self.get_names(), ['Writer ' + str(order) for order in range(1, 11)])
+
+    def test_reorder_other_users_topTenList(self):
+        self.client.force_authenticate(user=self.user_2)
+        response = self.client.patch(self.reorder_url, {'topTenItem_ids': [str(pk) for pk in reversed(self.topTenItem_ids)]}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.get_names(), ['Writer ' + str(order) for order in range(1, 11)])
+
+    def test_moveup_other_users_topTenItem(self):
+        self.client.force_authenticate(user=self.user_2)
+        response = self.client.patch(reverse('topTenLists:TopTenItems-moveup', kwargs={'pk': self.topTenItem_ids[1]}))
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.get_names(), ['Writer ' + str(order) for order in range(1, 11)])
@@ -10,6 +10,8 @@ from rest_framework.test import APITestCase
 from users.models import CustomUser
 from allauth.account.models import EmailAddress 
 from toptenlists.models import TopTenList, TopTenItem, ReusableItem, Notification
+from toptenlists.history import get_history
+from toptenlists.fanout import process_jobs # notifications are created in the background by process_jobs
 
 # disable throttling for testing
 from toptenlists.api import TopTenListViewSet, TopTenItemViewSet, TopTenListDetailViewSet, ReusableItemViewSet
@@ -614,6 +616,7 @@ class ModifyReusableItemAPITest(APITestCase):
         self.assertEqual(updated_object.link, data['link'])
 
         # there should not be a notification
+        process_jobs()
         self.assertEqual(Notification.objects.count(), 0)
 
         # Note: there should never be an existing change request for a reusable item referenced by only one user
@@ -666,7 +669,7 @@ class ModifyReusableItemAPITest(APITestCase):
         self.assertEqual(updated_user1_toptenitem2.name, data1['name'])
 
         # history has been updated
-        history_entry = updated_reusableitem.history[1]
+        history_entry = get_history(updated_reusableitem)[1]
         self.assertNotEqual(history_entry, None)
         self.assertEqual(history_entry['change_request_resolution'], 'accepted')
         self.assertNotEqual(history_entry['changed_request_resolved_at'], None)
@@ -680,6 +683,7 @@ class ModifyReusableItemAPITest(APITestCase):
         self.assertEqual(history_entry['change_request']['link'], data1['link'])
 
         # there should not be a notification
+        process_jobs()
         self.assertEqual(Notification.objects.count(), 0)
 
         # add a second reference to this reusable item, by a different user
@@ -712,6 +716,7 @@ class ModifyReusableItemAPITest(APITestCase):
         self.assertEqual(updated_reusableitem.change_request_votes_yes.first(), self.user_1)
 
         # User 2 should get a notification of the change request
+        process_jobs()
         self.assertEqual(Notification.objects.count(), 1)
 
         notification = Notification.objects.first()
@@ -721,6 +726,7 @@ class ModifyReusableItemAPITest(APITestCase):
         self.assertEqual(notification.reusableItem, updated_reusableitem)
 
         # delete any notifications prior to the next step
+        process_jobs()
         Notification.objects.all().delete()
         self.assertEqual(Notification.objects.count(), 0)
 
@@ -760,7 +766,7 @@ class ModifyReusableItemAPITest(APITestCase):
         self.assertEqual(updated_user2_toptenitem1.name, data2['name'])
 
         # history has been updated
-        history_entry = updated_reusableitem.history[2]
+        history_entry = get_history(updated_reusableitem)[2]
         self.assertNotEqual(history_entry, None)
         self.assertEqual(history_entry['change_request_resolution'], 'accepted')
         self.assertNotEqual(history_entry['changed_request_resolved_at'], None)
@@ -774,6 +780,7 @@ class ModifyReusableItemAPITest(APITestCase):
         self.assertEqual(history_entry['change_request']['link'], data2['link'])
 
         # User 1 and user 2 should each get a notification of the change request acceptance
+        process_jobs()
         self.assertEqual(Notification.objects.count(), 2)
 
         notification1 = Notification.objects.get(created_by=self.user_1)
@@ -848,7 +855,7 @@ class ModifyReusableItemAPITest(APITestCase):
         self.assertEqual(updated_user1_toptenitem2.name, data['name'])
 
         # history has been updated
-        history_entry = updated_reusableitem.history[1]
+        history_entry = get_history(updated_reusableitem)[1]
         self.assertNotEqual(history_entry, None)
         self.assertEqual(history_entry['change_request_resolution'], 'accepted')
         self.assertNotEqual(history_entry['changed_request_resolved_at'], None)
@@ -869,6 +876,7 @@ class ModifyReusableItemAPITest(APITestCase):
         data1 = submit_change_request_1(self, self.user_1)
 
         # user 2 now votes against the change request
+        process_jobs()
         Notification.objects.all().delete() # make sure no other notifications exist
         self.assertEqual(Notification.objects.count(), 0)
 
@@ -892,7 +900,7 @@ class ModifyReusableItemAPITest(APITestCase):
         self.assertEqual(updated_reusableitem.link, original_reusableitem.link)
 
         # history has been updated
-        history_entry = updated_reusableitem.history[1]
+        history_entry = get_history(updated_reusableitem)[1]
 
         self.assertNotEqual(history_entry, None)
         self.assertEqual(history_entry['change_request_resolution'], 'rejected')
@@ -907,6 +915,7 @@ class ModifyReusableItemAPITest(APITestCase):
         self.assertEqual(history_entry['change_request']['link'], data1['link'])
 
         # User 1 and user 2 should each get a notification of the change request acceptance
+        process_jobs()
         self.assertEqual(Notification.objects.count(), 2)
 
         notification1 = Notification.objects.get(created_by=self.user_1)
@@ -942,6 +951,7 @@ class ModifyReusableItemAPITest(APITestCase):
         data1 = submit_change_request_1(self, self.user_1)
 
         # delete any notifications prior to the next step
+        process_jobs()
         Notification.objects.all().delete()
         self.assertEqual(Notification.objects.count(), 0)
 
@@ -960,7 +970,7 @@ class ModifyReusableItemAPITest(APITestCase):
         self.assertEqual(updated_reusableitem.change_request_votes_yes.count(), 0)
 
         # history has been updated
-        history_entry = updated_reusableitem.history[1]
+        history_entry = get_history(updated_reusableitem)[1]
 
         self.assertNotEqual(history_entry, None)
         self.assertEqual(history_entry['change_request_resolution'], 'cancelled')
@@ -975,6 +985,7 @@ class ModifyReusableItemAPITest(APITestCase):
         self.assertEqual(history_entry['change_request']['link'], data1['link'])
 
         # user 2 should get a notification of the change request cancellation
+        process_jobs()
         self.assertEqual(Notification.objects.count(), 1)
 
         notification2 = Notification.objects.get(created_by=self.user_2)
@@ -1057,6 +1068,46 @@ class ModifyReusableItemAPITest(APITestCase):
 
         self.assertEqual(updated_reusableitem2.change_request_votes_yes.count(), 0)
 
+    def test_get_reusableitem_votes(self):
+        """
+        The vote counts and the user's own vote are returned for the reusable item
+        and for the reusable item nested in a top ten list
+        """
+
+        original_reusableitem = setup_public_reusable_item_1(self)
+        create_toptenlist(self, 'user_3', 3)
+        reference_reusable_item(self, 'user_3', self.reusableitem_1.id, 'toptenlist_3', 0)
+
+        # submit the change request
+        data1 = submit_change_request_1(self, self.user_1)
+
+        # User 2 votes against, which does not resolve the change request
+        self.client.force_authenticate(user=self.user_2)
+        response = self.client.patch(get_reusable_item_1_url(self), {'vote': 'no'}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        toptenlist_url = reverse('topTenLists:TopTenLists-detail', kwargs={'pk': self.toptenlist_2.id})
+
+        for user, my_vote in [(self.user_1, 'yes'), (self.user_2, 'no'), (None, '')]:
+            self.client.force_authenticate(user=user)
+
+            response = self.client.get(get_reusable_item_1_url(self))
+
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data['change_request_votes_yes_count'], 1)
+            self.assertEqual(response.data['change_request_votes_no_count'], 1)
+            self.assertEqual(response.data['change_request_my_vote'], my_vote)
+
+            # toptenlist_2 belongs to user 2 and is not public
+            if user == self.user_2:
+                response = self.client.get(toptenlist_url)
+                reusableitem_data = response.data['topTenItem'][0]['reusableItem']
+
+                self.assertEqual(reusableitem_data['change_request_votes_yes_count'], 1)
+                self.assertEqual(reusableitem_data['change_request_votes_no_count'], 1)
+                self.assertEqual(reusableitem_data['change_request_my_vote'], my_vote)
+
     def test_reusableitem_vote_user_count_3_accept(self):
         """
         Test voting when 3 users reference a top ten item
@@ -1075,6 +1126,7 @@ class ModifyReusableItemAPITest(APITestCase):
         self.assertEqual(updated_reusableitem1.change_request_votes_yes.count(), 1)
 
         # delete any notifications prior to the next step
+        process_jobs()
         Notification.objects.all().delete()
         self.assertEqual(Notification.objects.count(), 0)
 
@@ -1115,6 +1167,7 @@ class ModifyReusableItemAPITest(APITestCase):
         self.assertEqual(updated_reusableitem3.link, data1['link'])
 
         # all 3 users should get notifications
+        process_jobs()
         self.assertEqual(Notification.objects.count(), 3)
 
     def test_reusableitem_vote_user_count_3_reject(self):
@@ -1135,6 +1188,7 @@ class ModifyReusableItemAPITest(APITestCase):
         self.assertEqual(updated_reusableitem1.change_request_votes_yes.count(), 1)
 
         # delete any notifications prior to the next step
+        process_jobs()
         Notification.objects.all().delete()
         self.assertEqual(Notification.objects.count(), 0)
 
@@ -1161,10 +1215,11 @@ class ModifyReusableItemAPITest(APITestCase):
 
         # it should be rejected
         self.assertEqual(updated_reusableitem3.change_request, None)
-        history_entry = updated_reusableitem3.history[1]
+        history_entry = get_history(updated_reusableitem3)[1]
         self.assertEqual(history_entry['change_request_resolution'], 'rejected')
 
          # all 3 users should get notifications
+        process_jobs()
         self.assertEqual(Notification.objects.count(), 3)
 
     def test_reusableitem_vote_user_count_4_reject(self):
@@ -1207,7 +1262,7 @@ class ModifyReusableItemAPITest(APITestCase):
         self.assertEqual(updated_reusableitem3.change_request, None)
 
         # it should be rejected
-        history_entry = updated_reusableitem3.history[-1]
+        history_entry = get_history(updated_reusableitem3)[-1]
         self.assertEqual(history_entry['change_request_resolution'], 'rejected')
 
     def test_reusableitem_vote_user_count_4_accept(self):
@@ -1250,7 +1305,7 @@ class ModifyReusableItemAPITest(APITestCase):
         self.assertEqual(updated_reusableitem3.change_request, None)
 
         # it should be accepted
-        history_entry = updated_reusableitem3.history[-1]
+        history_entry = get_history(updated_reusableitem3)[-1]
         self.assertEqual(history_entry['change_request_resolution'], 'accepted')
 
     def test_reusableitem_vote_user_count_5_accept(self):
@@ -1293,7 +1348,7 @@ class ModifyReusableItemAPITest(APITestCase):
         self.assertEqual(updated_reusableitem3.change_request, None)
 
         # it should be accepted
-        history_entry = updated_reusableitem3.history[-1]
+        history_entry = get_history(updated_reusableitem3)[-1]
         self.assertEqual(history_entry['change_request_resolution'], 'accepted')
     
     def test_reusableitem_vote_user_count_5_reject(self):
@@ -1334,7 +1389,7 @@ class ModifyReusableItemAPITest(APITestCase):
         self.assertEqual(updated_reusableitem3.change_request, None)
 
         # it should be rejected
-        history_entry = updated_reusableitem3.history[-1]
+        history_entry = get_history(updated_reusableitem3)[-1]
         self.assertEqual(history_entry['change_request_resolution'], 'rejected')
 
     def test_reusableitem_vote_user_count_7_accept(self):
@@ -1389,7 +1444,7 @@ class ModifyReusableItemAPITest(APITestCase):
         self.assertEqual(updated_reusableitem4.change_request, None)
 
         # it should be accepted
-        history_entry = updated_reusableitem4.history[-1]
+        history_entry = get_history(updated_reusableitem4)[-1]
         self.assertEqual(history_entry['change_request_resolution'], 'accepted')
     
     def test_reusableitem_vote_user_count_7_rejecta(self):
@@ -1432,7 +1487,7 @@ class ModifyReusableItemAPITest(APITestCase):
         # the change request should be resolved
         self.assertEqual(updated_reusableitem3.change_request, None)
 
-        history_entry = updated_reusableitem3.history[-1]
+        history_entry = get_history(updated_reusableitem3)[-1]
         self.assertEqual(history_entry['change_request_resolution'], 'rejected')
 
     def test_reusableitem_vote_user_count_7_reject_b(self):
@@ -1488,7 +1543,7 @@ class ModifyReusableItemAPITest(APITestCase):
         self.assertEqual(updated_reusableitem4.change_request, None)
 
         # it should be accepted
-        history_entry = updated_reusableitem4.history[-1]
+        history_entry = get_history(updated_reusableitem4)[-1]
         self.assertEqual(history_entry['change_request_resolution'], 'rejected')
 
     def test_reusableitem_vote_user_count_20_accept(self):
@@ -1527,7 +1582,7 @@ class ModifyReusableItemAPITest(APITestCase):
         self.assertEqual(updated_reusableitem2.change_request, None)
 
         # it should be accepted
-        history_entry = updated_reusableitem2.history[-1]
+        history_entry = get_history(updated_reusableitem2)[-1]
         self.assertEqual(history_entry['change_request_resolution'], 'accepted')
 
 
@@ -1566,7 +1621,7 @@ class ModifyReusableItemAPITest(APITestCase):
         self.assertEqual(updated_reusableitem2.change_request, None)
 
         # it should be accepted
-        history_entry = updated_reusableitem2.history[-1]
+        history_entry = get_history(updated_reusableitem2)[-1]
         self.assertEqual(history_entry['change_request_resolution'], 'rejected')
 
     def test_reusableitem_vote_user_count_80_accept(self):
@@ -1604,7 +1659,7 @@ class ModifyReusableItemAPITest(APITestCase):
         self.assertEqual(updated_reusableitem2.change_request, None)
 
         # it should be accepted
-        history_entry = updated_reusableitem2.history[-1]
+        history_entry = get_history(updated_reusableitem2)[-1]
         self.assertEqual(history_entry['change_request_resolution'], 'accepted')
 
     def test_reusableitem_vote_user_count_80_reject(self):
@@ -1634,7 +1689,7 @@ class ModifyReusableItemAPITest(APITestCase):
         self.assertEqual(updated_reusableitem1.change_request, None)
 
         # it should be rejected
-        history_entry = updated_reusableitem1.history[-1]
+        history_entry = get_history(updated_reusableitem1)[-1]
         self.assertEqual(history_entry['change_request_resolution'], 'rejected')
 
     def test_reusableitem_vote_user_count_120_accept(self):
@@ -1671,7 +1726,7 @@ class ModifyReusableItemAPITest(APITestCase):
         self.assertEqual(updated_reusableitem2.change_request, None)
 
         # it should be accepted
-        history_entry = updated_reusableitem2.history[-1]
+        history_entry = get_history(updated_reusableitem2)[-1]
         self.assertEqual(history_entry['change_request_resolution'], 'accepted')
 
     def test_reusableitem_vote_user_count_120_reject(self):
@@ -1709,5 +1764,5 @@ class ModifyReusableItemAPITest(APITestCase):
         self.assertEqual(updated_reusableitem2.change_request, None)
 
         # it should be rejected
-        history_entry = updated_reusableitem2.history[-1]
+        history_entry = get_history(updated_reusableitem2)[-1]
         self.assertEqual(history_entry['change_request_resolution'], 'rejected')
\ No newline at end of file
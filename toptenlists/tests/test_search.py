@@ -0,0 +1,273 @@
+"""
+Tests for searching topTenLists, topTenItems and reusableItems
+"""
+
+import json
+import uuid
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import SimpleTestCase, TransactionTestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from users.models import CustomUser
+from allauth.account.models import EmailAddress
+from toptenlists.models import TopTenItem, ReusableItem
+from toptenlists.search import InvertedIndex, InvertedIndexSearchBackend, MySQLFullTextSearchBackend
+
+# disable throttling for testing
+from toptenlists.api import TopTenListViewSet, SearchListsItemsView, SearchReusableItemsView
+
+TopTenListViewSet.throttle_classes = ()
+SearchListsItemsView.throttle_classes = ()
+SearchReusableItemsView.throttle_classes = ()
+
+toptenlist_data_1 = {'name': 'Favourite writers', 'description':'', 'is_public': True,
+'topTenItem': [
+    {'name': 'Jane Austen', 'description': '', 'order': 1},
+    {'name': 'Agatha Christie', 'description': '', 'order': 2},
+    {'name': 'Austen Chamberlain', 'description': '', 'order': 3},
+    ] + [{'name': '', 'description': '', 'order': order} for order in range(4, 11)]}
+
+create_list_url = reverse('topTenLists:TopTenLists-list')
+search_lists_items_url = reverse('topTenLists:searchlistsitems-list')
+search_reusable_items_url = reverse('topTenLists:searchreusableitems-list')
+
+def create_user(self, index):
+    email_address = 'person_' + str(index) + '@example.com'
+
+    user = CustomUser.objects.create_user('Test user ' + str(index), email_address, email_address)
+    EmailAddress.objects.create(user=user, email=email_address, primary=True, verified=True)
+
+    setattr(self, 'user_' + str(index), user)
+
+def get_names(response):
+    return [result['name'] for result in json.loads(response.content)['results']]
+
+class InvertedIndexTest(SimpleTestCase):
+    def setUp(self):
+        self.index = InvertedIndex()
+        self.index.add(1, 'Jane Austen')
+        self.index.add(2, 'Austen Chamberlain')
+        self.index.add(3, 'Janet Frame')
+
+    def test_prefix(self):
+        """
+        Every search word must match the start of a word
+        """
+        self.assertEqual(set(self.index.search(['jan'])), {1, 3})
+        self.assertEqual(set(self.index.search(['jan', 'aus'])), {1})
+        self.assertEqual(set(self.index.search(['sten'])), set())
+
+    def test_rank(self):
+        """
+        A whole word match ranks above a prefix match
+        """
+        ranks = self.index.search(['jane'])
+
+        self.assertGreater(ranks[1], ranks[3])
+
+    def test_update_and_remove(self):
+        self.index.add(1, 'Emily Bronte')
+
+        self.assertEqual(set(self.index.search(['austen'])), {2})
+        self.assertEqual(set(self.index.search(['emily'])), {1})
+
+        self.index.remove(2)
+
+        self.assertEqual(set(self.index.search(['austen'])), set())
+        self.assertNotIn('chamberlain', self.index.vocabulary)
+
+class SearchAPITest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for index in range(1, 3):
+            create_user(cls, index)
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.user_1)
+        response = self.client.post(create_list_url, toptenlist_data_1, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.client.logout()
+
+        self.public_reusableItem = ReusableItem.objects.create(name='Jane Austen', is_public=True, created_by=self.user_1, created_by_username=self.user_1.username)
+        self.private_reusableItem = ReusableItem.objects.create(name='Jane Eyre', is_public=False, created_by=self.user_1, created_by_username=self.user_1.username)
+
+        # reusableItems must be referenced or they will be deleted
+        topTenItems = TopTenItem.objects.filter(topTenList__created_by=self.user_1).order_by('order')
+        for topTenItem, reusableItem in zip(topTenItems[3:5], [self.public_reusableItem, self.private_reusableItem]):
+            topTenItem.reusableItem = reusableItem
+            topTenItem.save()
+
+    def test_search_topTenItems_by_prefix(self):
+        """
+        topTenItems created with their topTenList can be found by the start of any word
+        """
+        response = self.client.get(search_lists_items_url, {'search': 'aust', 'includetoptenlists': 'false'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(sorted(get_names(response)), ['Austen Chamberlain', 'Jane Austen'])
+
+        response = self.client.get(search_lists_items_url, {'search': 'jane aus', 'includetoptenlists': 'false'})
+
+        self.assertEqual(get_names(response), ['Jane Austen'])
+
+    def test_search_reusableItems_permissions(self):
+        """
+        Private reusableItems are only found by their owner
+        """
+        response = self.client.get(search_reusable_items_url, {'search': 'jane'})
+
+        self.assertEqual(get_names(response), ['Jane Austen'])
+
+        self.client.force_authenticate(user=self.user_2)
+        response = self.client.get(search_reusable_items_url, {'search': 'jane'})
+
+        self.assertEqual(get_names(response), ['Jane Austen'])
+
+        self.client.force_authenticate(user=self.user_1)
+        response = self.client.get(search_reusable_items_url, {'search': 'jane'})
+
+        self.assertEqual(sorted(get_names(response)), ['Jane Austen', 'Jane Eyre'])
+
+    def test_search_reusableItems_ranked(self):
+        """
+        A whole word match is returned before a prefix match
+        """
+        self.client.force_authenticate(user=self.user_1)
+        self.private_reusableItem.name = 'Janet Frame'
+        self.private_reusableItem.save()
+
+        response = self.client.get(search_reusable_items_url, {'search': 'jane'})
+
+        self.assertEqual(get_names(response), ['Jane Austen', 'Janet Frame'])
+
+    def test_search_renamed(self):
+        """
+        Renamed items are found by their new name and not their old name
+        """
+        reusableItem = ReusableItem.objects.get(pk=self.public_reusableItem.id)
+        reusableItem.name = 'Emily Bronte'
+        reusableItem.save()
+
+        response = self.client.get(search_reusable_items_url, {'search': 'emily'})
+        self.assertEqual(get_names(response), ['Emily Bronte'])
+
+        response = self.client.get(search_reusable_items_url, {'search': 'austen'})
+        self.assertEqual(get_names(response), [])
+
+    def test_stale_entries_skipped(self):
+        """
+        Rows that are in the index but not in the database do not take the place of real matches
+        """
+        backend = InvertedIndexSearchBackend()
+        index = backend.get_index(ReusableItem, 'name')
+
+        for stale_index in range(3):
+            index.add(uuid.uuid4(), 'Jane')
+
+        with self.settings(TOPTENLISTS_SEARCH_MAX_RESULTS=2):
+            results = backend.search(ReusableItem.objects.all(), ['name'], 'jane')
+
+            self.assertEqual(sorted(reusableItem.name for reusableItem in results), ['Jane Austen', 'Jane Eyre'])
+
+    def test_private_entries_skipped(self):
+        """
+        Matches the user may not see do not take the place of matches they may see
+        """
+        for private_index in range(3):
+            ReusableItem.objects.create(name='Jane', is_public=False, created_by=self.user_2, created_by_username=self.user_2.username)
+
+        backend = InvertedIndexSearchBackend()
+
+        with self.settings(TOPTENLISTS_SEARCH_MAX_RESULTS=2):
+            results = backend.search(ReusableItem.objects.filter(created_by=self.user_1), ['name'], 'jane')
+
+            self.assertEqual(sorted(reusableItem.name for reusableItem in results), ['Jane Austen', 'Jane Eyre'])
+
+    def test_filter_keeps_order(self):
+        """
+        filter does not rank, and with more candidates than max_results the words are matched by the database
+        """
+        backend = InvertedIndexSearchBackend()
+        queryset = ReusableItem.objects.order_by('-name')
+
+        self.assertEqual([reusableItem.name for reusableItem in backend.filter(queryset, ['name'], 'jane')], ['Jane Eyre', 'Jane Austen'])
+
+        with self.settings(TOPTENLISTS_SEARCH_MAX_RESULTS=1):
+            self.assertEqual([reusableItem.name for reusableItem in backend.filter(queryset, ['name'], 'jane')], ['Jane Eyre', 'Jane Austen'])
+            self.assertEqual([reusableItem.name for reusableItem in backend.filter(queryset, ['name'], 'ane')], [])
+
+    def test_filter_topTenLists_by_name(self):
+        """
+        topTenLists can be filtered by the start of words in their name or their creator's username
+        """
+        response = self.client.get(create_list_url, {'name': 'writ'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([result['name'] for result in response.data], ['Favourite writers'])
+
+        response = self.client.get(create_list_url, {'name': 'fav WRIT'})
+
+        self.assertEqual([result['name'] for result in response.data], ['Favourite writers'])
+
+        response = self.client.get(create_list_url, {'name': 'urite'})
+
+        self.assertEqual(response.data, [])
+
+        response = self.client.get(create_list_url, {'name': 'painters'})
+
+        self.assertEqual(response.data, [])
+
+        response = self.client.get(create_list_url, {'created_by_username': 'test'})
+
+        self.assertEqual([result['name'] for result in response.data], ['Favourite writers'])
+
+@skipUnless(connection.vendor == 'mysql', 'MySQL full text search')
+class MySQLFullTextSearchTest(TransactionTestCase):
+    """
+    InnoDB only adds committed rows to a FULLTEXT index, so these tests commit
+    """
+    def setUp(self):
+        create_user(self, 1)
+
+        for name in ['Jane Austen', 'Janet Frame', 'Austen Chamberlain', 'Austen Austen Austen', 'The Famous Five', 'Jo March', 'Agatha Christie']:
+            ReusableItem.objects.create(name=name, is_public=True, created_by=self.user_1, created_by_username=self.user_1.username)
+
+        self.backend = MySQLFullTextSearchBackend()
+
+    def search(self, term):
+        return [reusableItem.name for reusableItem in self.backend.search(ReusableItem.objects.all(), ['name'], term)]
+
+    def filter(self, term):
+        return [reusableItem.name for reusableItem in self.backend.filter(ReusableItem.objects.order_by('name'), ['name'], term)]
+
+    def test_prefix(self):
+        """
+        Every search word must match the start of a word, as with the in-memory index
+        """
+        self.assertEqual(sorted(self.search('jan')), ['Jane Austen', 'Janet Frame'])
+        self.assertEqual(self.search('jan aus'), ['Jane Austen'])
+        self.assertEqual(self.search('sten'), [])
+        self.assertEqual(self.search('ne'), [])
+
+    def test_stopwords_and_short_words(self):
+        """
+        Stopwords are indexed, and words shorter than innodb_ft_min_token_size are matched without the index
+        """
+        self.assertEqual(self.search('the famous'), ['The Famous Five'])
+        self.assertEqual(self.search('a'), ['Agatha Christie', 'Austen Austen Austen', 'Austen Chamberlain', 'Jane Austen'])
+        self.assertEqual(self.search('jo mar'), ['Jo March'])
+        self.assertEqual(self.search('o'), [])
+
+    def test_rank(self):
+        """
+        A whole word ranks above the start of a word, and more matches rank higher
+        """
+        self.assertEqual(self.search('jane'), ['Jane Austen', 'Janet Frame'])
+        self.assertEqual(self.search('austen')[0], 'Austen Austen Austen')
+
+    def test_filter_keeps_order(self):
+        self.assertEqual(self.filter('austen'), ['Austen Austen Austen', 'Austen Chamberlain', 'Jane Austen'])
+        self.assertEqual(self.filter('JANE'), ['Jane Austen', 'Janet Frame'])
@@ -0,0 +1,224 @@
+"""
+Tests for pushing new notifications to users
+"""
+
+import json
+import threading
+import time
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from users.models import CustomUser
+from toptenlists.models import ReusableItem, ReusableItemUser, Notification
+from toptenlists.cache import get_cache
+from toptenlists.fanout import enqueue_notification, process_jobs
+from toptenlists.pubsub import InMemoryPubSub, CachePubSub, MAX_MESSAGES, get_pubsub, get_notification_channel
+
+# disable throttling for testing
+from toptenlists.api import NotificationViewSet, NotificationStreamView
+
+NotificationViewSet.throttle_classes = ()
+NotificationStreamView.throttle_classes = ()
+
+notification_wait_url = reverse('topTenLists:Notifications-wait')
+notification_stream_url = reverse('topTenLists:notificationstream')
+
+def create_user(index):
+    email_address = 'person_' + str(index) + '@example.com'
+
+    return CustomUser.objects.create_user('Test user ' + str(index), email_address, email_address)
+
+class PubSubTestMixin(object):
+    def test_wait(self):
+        messages, last, missed = self.pubsub.wait('channel', None, 0)
+        self.assertEqual((messages, missed), ([], False))
+
+        self.pubsub.publish('channel', 'one')
+        self.pubsub.publish('channel', 'two')
+        self.pubsub.publish('other channel', 'three')
+
+        self.assertEqual(self.pubsub.wait('channel', last, 0), (['one', 'two'], last + 2, False))
+        self.assertEqual(self.pubsub.wait('channel', last + 1, 0), (['two'], last + 2, False))
+
+    def test_wait_times_out(self):
+        messages, last, missed = self.pubsub.wait('channel', None, 0)
+
+        start = time.time()
+        self.assertEqual(self.pubsub.wait('channel', last, 0.2), ([], last, False))
+        self.assertGreaterEqual(time.time() - start, 0.15)
+
+    def test_wakes_when_published(self):
+        messages, last, missed = self.pubsub.wait('channel', None, 0)
+
+        timer = threading.Timer(0.1, self.pubsub.publish, ['channel', 'one'])
+        timer.start()
+
+        start = time.time()
+        self.assertEqual(self.pubsub.wait('channel', last, 5)[0], ['one'])
+        self.assertLess(time.time() - start, 2)
+
+        timer.join()
+
+    def test_missed(self):
+        messages, last, missed = self.pubsub.wait('channel', None, 0)
+
+        for index in range(MAX_MESSAGES + 5):
+            self.pubsub.publish('channel', index)
+
+        messages, new_last, missed = self.pubsub.wait('channel', last, 0)
+
+        self.assertTrue(missed)
+        self.assertEqual(messages, list(range(5, MAX_MESSAGES + 5)))
+
+        # a client that is ahead, e.g. because the messages were lost, has also missed messages
+        self.assertTrue(self.pubsub.wait('channel', new_last + 10, 0)[2])
+
+class InMemoryPubSubTest(PubSubTestMixin, TestCase):
+    def setUp(self):
+        self.pubsub = InMemoryPubSub()
+
+class CachePubSubTest(PubSubTestMixin, TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.pubsub = CachePubSub(interval=0.02)
+
+class NotificationWaitTestMixin(object):
+    def setUp(self):
+        get_cache().clear()
+
+        self.user_1 = create_user(1)
+        self.user_2 = create_user(2)
+
+        self.reusableItem = ReusableItem.objects.create(name='Jane Austen', is_public=True, created_by=self.user_2, created_by_username=self.user_2.username)
+        ReusableItemUser.objects.create(reusableItem=self.reusableItem, user=self.user_1)
+        ReusableItemUser.objects.create(reusableItem=self.reusableItem, user=self.user_2)
+
+    def notify_user_1(self):
+        enqueue_notification(self.reusableItem, {'context': 'reusableItem', 'event': 'changeRequestCreated'}, self.user_2)
+        process_jobs()
+
+@override_settings(TOPTENLISTS_NOTIFICATION_PUSH=True)
+class NotificationWaitAPITest(NotificationWaitTestMixin, APITestCase):
+    def wait(self, params):
+        response = self.client.get(notification_wait_url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        return response.data
+
+    def test_long_poll(self):
+        self.client.force_authenticate(user=self.user_1)
+
+        data = self.wait({'timeout': 0})
+        self.assertEqual(data['notifications'], [])
+        last = data['last']
+
+        self.notify_user_1()
+
+        data = self.wait({'after': last, 'timeout': 5})
+
+        self.assertEqual(len(data['notifications']), 1)
+        self.assertEqual(data['notifications'][0]['event'], 'changeRequestCreated')
+        self.assertEqual(data['notifications'][0]['id'], str(Notification.objects.get(created_by=self.user_1).id))
+        self.assertEqual(data['last'], last + 1)
+        self.assertEqual(data['missed'], False)
+        self.assertEqual(data['counts'], {'unread': 1, 'new': 1})
+
+        # the other user was not notified
+        self.client.force_authenticate(user=self.user_2)
+        self.assertEqual(self.wait({'after': 0, 'timeout': 0})['notifications'], [])
+
+    def test_long_poll_does_not_read_notifications(self):
+        """
+        While there is nothing new, waiting does not read the notifications
+        """
+        self.client.force_authenticate(user=self.user_1)
+
+        # the counts are only cached in a shared cache, and the tests run in one process
+        with mock.patch('toptenlists.counters.use_cached_counts', return_value=True):
+            last = self.wait({'timeout': 0})['last']
+
+            with CaptureQueriesContext(connection) as context:
+                self.wait({'after': last, 'timeout': 0.1})
+
+        self.assertFalse(any('toptenlists_notification' in query['sql'] for query in context.captured_queries))
+
+    def test_long_poll_not_logged_in(self):
+        response = self.client.get(notification_wait_url, {'timeout': 0})
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(TOPTENLISTS_NOTIFICATION_STREAM_MAX=0.3, TOPTENLISTS_NOTIFICATION_STREAM_KEEPALIVE=0.1)
+    def test_stream(self):
+        self.client.force_authenticate(user=self.user_1)
+        last = self.wait({'timeout': 0})['last']
+
+        self.notify_user_1()
+
+        response = self.client.get(notification_stream_url, HTTP_LAST_EVENT_ID=str(last))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+
+        events = b''.join(response.streaming_content).decode('utf-8').split('\n\n')
+
+        self.assertEqual(events[0], 'retry: 2000')
+        self.assertTrue(events[1].startswith('event: counts'))
+
+        notification_event = events[2].split('\n')
+        self.assertEqual(notification_event[0], 'id: %d' % (last + 1))
+        self.assertEqual(notification_event[1], 'event: notifications')
+        self.assertEqual(json.loads(notification_event[2][len('data: '):])[0]['event'], 'changeRequestCreated')
+
+        # nothing more happens, so the stream is kept alive until it ends
+        self.assertIn(': keepalive', events)
+
+    def test_stream_not_logged_in(self):
+        response = self.client.get(notification_stream_url)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+class NotificationPushDisabledAPITest(NotificationWaitTestMixin, APITestCase):
+    """
+    Push is off by default: waiting returns at once and there is no stream
+    """
+    def test_wait_returns_at_once(self):
+        self.client.force_authenticate(user=self.user_1)
+        response = self.client.get(notification_wait_url, {'timeout': 0})
+        last = response.data['last']
+
+        started = time.time()
+        response = self.client.get(notification_wait_url, {'after': last, 'timeout': 5})
+
+        self.assertLess(time.time() - started, 1)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['push'], False)
+        self.assertEqual(response.data['notifications'], [])
+
+        # new notifications are still found by the next request
+        self.notify_user_1()
+
+        response = self.client.get(notification_wait_url, {'after': last, 'timeout': 5})
+        self.assertEqual(len(response.data['notifications']), 1)
+
+    def test_no_stream(self):
+        self.client.force_authenticate(user=self.user_1)
+        response = self.client.get(notification_stream_url)
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+class NotificationSignalPublishTest(NotificationWaitTestMixin, TransactionTestCase):
+    def test_saved_notification_published(self):
+        """
+        A notification created singly is published when it is committed
+        """
+        channel = get_notification_channel(self.user_1.id)
+        last = get_pubsub().wait(channel, None, 0)[1]
+
+        notification = Notification.objects.create(context='reusableItem', event='changeRequestCreated', created_by=self.user_1)
+
+        self.assertEqual(get_pubsub().wait(channel, last, 0)[0], [str(notification.id)])
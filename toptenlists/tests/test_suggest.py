@@ -0,0 +1,172 @@
+"""
+Tests for type-ahead suggestions of reusableItem names
+"""
+
+import time
+import uuid
+from unittest import mock
+
+from django.db import transaction
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITransactionTestCase
+from users.models import CustomUser
+from toptenlists.models import ReusableItem
+from toptenlists.suggest import SuggestIndex, suggest_index, get_keys
+
+# disable throttling for testing
+from toptenlists.api import SuggestReusableItemsView
+
+SuggestReusableItemsView.throttle_classes = ()
+
+suggest_url = reverse('topTenLists:suggestreusableitems-list')
+
+def get_names(response):
+    return [result['name'] for result in response.data]
+
+class SuggestAPITest(APITransactionTestCase):
+    """
+    The index is changed when a transaction commits, so these tests commit
+    """
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('Test user', 'person@example.com', '12345')
+
+        # the index is shared by all tests, so reload it from this test's data
+        suggest_index.loaded_at = None
+
+        for name, is_public in [('Jane Austen', True), ('Austen Chamberlain', True), ('Jane Eyre', False)]:
+            ReusableItem.objects.create(name=name, definition='A definition', is_public=is_public, created_by=self.user, created_by_username=self.user.username)
+
+    def test_suggest(self):
+        """
+        Public reusableItems with a word starting with the search are returned, with only id, name and definition
+        """
+        response = self.client.get(suggest_url, {'search': 'jane'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(get_names(response), ['Jane Austen'])
+        self.assertEqual(set(response.data[0].keys()), {'id', 'name', 'definition'})
+
+        # ordered by the matching words, 'austen' then 'austen chamberlain'
+        response = self.client.get(suggest_url, {'search': 'AUS'})
+
+        self.assertEqual(get_names(response), ['Jane Austen', 'Austen Chamberlain'])
+
+        response = self.client.get(suggest_url, {'search': 'aus', 'limit': 1})
+
+        self.assertEqual(get_names(response), ['Jane Austen'])
+
+        response = self.client.get(suggest_url, {'search': ''})
+
+        self.assertEqual(response.data, [])
+
+    def test_suggest_updated_from_signals(self):
+        """
+        Saved and deleted reusableItems are updated in the loaded index
+        """
+        self.client.get(suggest_url, {'search': 'jane'})
+
+        reusableItem = ReusableItem.objects.get(name='Jane Eyre')
+        reusableItem.is_public = True
+        reusableItem.save()
+
+        response = self.client.get(suggest_url, {'search': 'jane'})
+
+        self.assertEqual(get_names(response), ['Jane Austen', 'Jane Eyre'])
+
+        reusableItem.name = 'Charlotte Bronte'
+        reusableItem.save()
+
+        response = self.client.get(suggest_url, {'search': 'jane'})
+
+        self.assertEqual(get_names(response), ['Jane Austen'])
+
+        ReusableItem.objects.get(name='Jane Austen').delete()
+
+        response = self.client.get(suggest_url, {'search': 'jane'})
+
+        self.assertEqual(response.data, [])
+
+    def test_rolled_back_save_not_suggested(self):
+        self.client.get(suggest_url, {'search': 'jane'})
+
+        try:
+            with transaction.atomic():
+                reusableItem = ReusableItem.objects.get(name='Jane Eyre')
+                reusableItem.is_public = True
+                reusableItem.save()
+
+                raise RuntimeError('rolled back')
+
+        except RuntimeError:
+            pass
+
+        response = self.client.get(suggest_url, {'search': 'jane'})
+
+        self.assertEqual(get_names(response), ['Jane Austen'])
+
+    def test_stale_index_served_while_refreshed(self):
+        """
+        A stale index is used while one background thread reloads it
+        """
+        self.client.get(suggest_url, {'search': 'jane'})
+        suggest_index.loaded_at = time.time() - 3600
+
+        with mock.patch('toptenlists.suggest.threading.Thread') as Thread:
+            with self.assertNumQueries(0):
+                response = self.client.get(suggest_url, {'search': 'jane'})
+                self.client.get(suggest_url, {'search': 'aus'})
+
+        self.assertEqual(get_names(response), ['Jane Austen'])
+        self.assertEqual(Thread.call_count, 1)
+
+        # the thread reloads the index
+        with mock.patch('toptenlists.suggest.connection'):
+            suggest_index.refresh()
+
+        self.assertFalse(suggest_index.is_stale())
+        self.assertFalse(suggest_index.refreshing)
+
+    def test_change_during_load_kept(self):
+        """
+        A reusableItem saved while the index is being loaded is in the new index
+        """
+        index = SuggestIndex()
+        original_filter = ReusableItem.objects.filter
+
+        def filter_and_save(*args, **kwargs):
+            queryset = original_filter(*args, **kwargs)
+            index.change(uuid.uuid4(), 'Jane Smith', '', True)
+
+            return queryset
+
+        with mock.patch.object(ReusableItem.objects, 'filter', filter_and_save):
+            index.load()
+
+        self.assertEqual([result['name'] for result in index.suggest('jane')], ['Jane Austen', 'Jane Smith'])
+
+    def test_suggest_speed(self):
+        """
+        Looking up a prefix in a large index takes well under a millisecond
+        """
+        index = SuggestIndex()
+        index.loaded_at = time.time()
+
+        for number in range(100000):
+            pk = uuid.uuid4()
+            name = 'Item %d number %d' % (number, number * 7)
+            item_keys = get_keys(name)
+            index.items[pk] = (name, '', item_keys)
+            index.keys.extend((key, pk) for key in item_keys)
+
+        index.keys.sort()
+
+        start = time.perf_counter()
+
+        for number in range(1000):
+            results = index.suggest('item %d' % number)
+
+        elapsed = (time.perf_counter() - start) / 1000
+
+        self.assertEqual(len(results), 10)
+        self.assertLess(elapsed, 0.001)
@@ -0,0 +1,172 @@
+"""
+Tests for exporting and importing topTenLists as NDJSON
+"""
+
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from users.models import CustomUser
+from allauth.account.models import EmailAddress
+from toptenlists.models import TopTenList, TopTenItem, ReusableItem, ReusableItemUser
+from toptenlists.transfer import export_topTenLists, import_topTenLists
+
+# disable throttling for testing
+from toptenlists.api import TopTenListViewSet
+
+TopTenListViewSet.throttle_classes = ()
+
+export_url = reverse('topTenLists:TopTenLists-export')
+import_url = reverse('topTenLists:TopTenLists-import')
+
+def create_user(self, index):
+    email_address = 'person_' + str(index) + '@example.com'
+
+    user = CustomUser.objects.create_user('Test user ' + str(index), email_address, email_address)
+    EmailAddress.objects.create(user=user, email=email_address, primary=True, verified=True)
+
+    setattr(self, 'user_' + str(index), user)
+
+class TransferTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for index in range(1, 3):
+            create_user(cls, index)
+
+    def setUp(self):
+        self.public_reusableItem = ReusableItem.objects.create(name='Jane Austen', is_public=True, created_by=self.user_1, created_by_username=self.user_1.username)
+        self.private_reusableItem = ReusableItem.objects.create(name='Jane Eyre', is_public=False, created_by=self.user_1, created_by_username=self.user_1.username)
+
+        for index in range(5):
+            topTenList = TopTenList.objects.create(name='List ' + str(index), is_public=index != 0, created_by=self.user_1, created_by_username=self.user_1.username)
+
+            for order in range(1, 11):
+                reusableItem = {1: self.public_reusableItem, 2: self.private_reusableItem}.get(order)
+                TopTenItem.objects.create(topTenList=topTenList, name='Item ' + str(order), order=order, reusableItem=reusableItem)
+
+    def test_round_trip(self):
+        """
+        topTenLists exported by one user can be imported by another
+        References to reusableItems the importing user cannot use are removed
+        """
+        lines = list(export_topTenLists(TopTenList.objects.filter(created_by=self.user_1), chunk_size=2))
+
+        self.assertEqual(len(lines), 5)
+        self.assertEqual(len(json.loads(lines[0])['topTenItem']), 10)
+
+        result = import_topTenLists(lines, self.user_2, chunk_size=2)
+
+        self.assertEqual(result['topTenLists'], 5)
+        self.assertEqual(result['topTenItems'], 50)
+        self.assertEqual(result['skipped_references'], 5)
+
+        imported = TopTenList.objects.filter(created_by=self.user_2).order_by('name')
+
+        self.assertEqual([topTenList.name for topTenList in imported], ['List ' + str(index) for index in range(5)])
+        self.assertEqual(imported[0].is_public, False)
+        self.assertEqual(imported[0].created_by_username, self.user_2.username)
+        self.assertEqual(list(imported[1].topTenItem.values_list('name', flat=True)), ['Item ' + str(order) for order in range(1, 11)])
+        self.assertEqual(TopTenItem.objects.filter(topTenList__created_by=self.user_2, reusableItem=self.public_reusableItem).count(), 5)
+        self.assertEqual(TopTenItem.objects.filter(topTenList__created_by=self.user_2, reusableItem=self.private_reusableItem).count(), 0)
+
+        # the references are recorded, as they are when a topTenList is created through the API
+        self.assertTrue(ReusableItemUser.objects.filter(reusableItem=self.public_reusableItem, user=self.user_2).exists())
+
+    def test_invalid_lines(self):
+        lines = [
+            '{"name": "Good", "topTenItem": [{"name": "A", "order": 1}]}',
+            'not json',
+            '{"name": ""}',
+            '{"name": "Duplicate orders", "topTenItem": [{"order": 1}, {"order": 1}]}',
+            '',
+            '{"name": "Bad reference", "topTenItem": [{"order": 1, "reusableItem_id": "not a uuid"}]}',
+            '{"name": "Not a boolean", "is_public": "maybe"}',
+            '{"name": ["Not a string"]}',
+            '{"name": "Long item", "topTenItem": [{"name": "%s", "order": 1}]}' % ('x' * 1000),
+        ]
+
+        result = import_topTenLists(lines, self.user_2)
+
+        self.assertEqual(result['topTenLists'], 1)
+        self.assertEqual(result['invalid_lines'], 7)
+        self.assertEqual([error['line'] for error in result['errors']], [2, 3, 4, 6, 7, 8, 9])
+        self.assertTrue(result['errors'][4]['message'].startswith('is_public:'))
+        self.assertTrue(result['errors'][6]['message'].startswith('topTenItem 1 name:'))
+
+    def test_import_is_public(self):
+        """
+        is_public is read as the API reads it, so "false" is not public
+        """
+        lines = ['{"name": "List %d", "is_public": %s}' % (index, value) for index, value in enumerate(['"false"', '"0"', 'false', '"true"', '1'])]
+
+        import_topTenLists(lines, self.user_2)
+
+        imported = TopTenList.objects.filter(created_by=self.user_2).order_by('name')
+        self.assertEqual([topTenList.is_public for topTenList in imported], [False, False, False, True, True])
+
+    def test_import_query_count(self):
+        """
+        The queries to import do not depend on the number of topTenLists in each chunk
+        """
+        lines = list(export_topTenLists(TopTenList.objects.filter(created_by=self.user_1)))
+
+        with self.assertNumQueries(11):
+            import_topTenLists(lines[:1], self.user_2)
+
+        # another user, so that the references to the reusableItem are also new
+        create_user(self, 3)
+
+        with self.assertNumQueries(11):
+            import_topTenLists(lines, self.user_3)
+
+    def test_api(self):
+        self.client.force_authenticate(user=self.user_1)
+        response = self.client.get(export_url, {'listset': 'my-topTenLists'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+
+        body = b''.join(response.streaming_content)
+        self.assertEqual(len(body.splitlines()), 5)
+
+        self.client.force_authenticate(user=self.user_2)
+        response = self.client.post(import_url, body, content_type='application/x-ndjson')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(json.loads(response.content)['topTenLists'], 5)
+        self.assertEqual(TopTenList.objects.filter(created_by=self.user_2).count(), 5)
+
+    def test_api_export_permissions(self):
+        """
+        Another user only exports public topTenLists
+        """
+        self.client.force_authenticate(user=self.user_2)
+        response = self.client.get(export_url)
+
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 4)
+
+    def test_api_import_anonymous(self):
+        response = self.client.post(import_url, b'{"name": "Anonymous"}\n', content_type='application/x-ndjson')
+
+        self.assertIn(response.status_code, (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN))
+        self.assertEqual(TopTenList.objects.filter(name='Anonymous').count(), 0)
+
+    def test_commands(self):
+        handle, path = tempfile.mkstemp(suffix='.ndjson')
+        os.close(handle)
+
+        try:
+            call_command('exporttoptenlists', output=path, username=self.user_1.username, public=True, stderr=StringIO())
+
+            out = StringIO()
+            call_command('importtoptenlists', path, '--username=' + self.user_2.username, stdout=out)
+
+        finally:
+            os.remove(path)
+
+        self.assertIn('Imported 4 topTenLists with 40 topTenItems', out.getvalue())
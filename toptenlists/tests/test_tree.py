@@ -0,0 +1,122 @@
+"""
+Tests for finding a topTenList with its parent and child topTenLists
+"""
+
+import json
+
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from users.models import CustomUser
+from allauth.account.models import EmailAddress
+from toptenlists.models import TopTenList, TopTenItem
+from toptenlists import tree
+
+# disable throttling for testing
+from toptenlists.api import TopTenListViewSet, TopTenListDetailViewSet
+
+TopTenListViewSet.throttle_classes = ()
+TopTenListDetailViewSet.throttle_classes = ()
+
+create_list_url = reverse('topTenLists:TopTenLists-list')
+detail_url = reverse('topTenLists:TopTenListDetail-list')
+
+def get_list_data(name):
+    return {'name': name, 'description':'', 'is_public': True,
+    'topTenItem': [{'name': name + ' ' + str(order), 'description': '', 'order': order} for order in range(1, 11)]}
+
+def get_names(response):
+    return sorted(result['name'] for result in json.loads(response.content))
+
+class TopTenListTreeTest(APITestCase):
+    """
+    A chain of topTenLists, each the child of the first topTenItem of the one before
+    List 0 also has a second child, List 5
+    """
+    @classmethod
+    def setUpTestData(cls):
+        email_address = 'person_1@example.com'
+        cls.user = CustomUser.objects.create_user('Test user 1', email_address, email_address)
+        EmailAddress.objects.create(user=cls.user, email=email_address, primary=True, verified=True)
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.user)
+        self.topTenLists = []
+
+        for index in range(6):
+            response = self.client.post(create_list_url, get_list_data('List ' + str(index)), format='json')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.topTenLists.append(TopTenList.objects.get(name='List ' + str(index)))
+
+        for index in range(1, 5):
+            self.set_parent(self.topTenLists[index], self.topTenLists[index - 1], 1)
+
+        self.set_parent(self.topTenLists[5], self.topTenLists[0], 2)
+
+    def set_parent(self, topTenList, parent_topTenList, order):
+        topTenList.parent_topTenItem = TopTenItem.objects.get(topTenList=parent_topTenList, order=order)
+        topTenList.save()
+
+    def get_detail(self, index, depth=None):
+        params = {'id': self.topTenLists[index].id}
+
+        if depth is not None:
+            params['depth'] = depth
+
+        response = self.client.get(detail_url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        return response
+
+    def test_parent_and_children(self):
+        self.assertEqual(get_names(self.get_detail(1)), ['List 0', 'List 1', 'List 2'])
+        self.assertEqual(get_names(self.get_detail(0)), ['List 0', 'List 1', 'List 5'])
+
+    def test_depth(self):
+        self.assertEqual(get_names(self.get_detail(2, 0)), ['List 2'])
+        self.assertEqual(get_names(self.get_detail(2, 2)), ['List 0', 'List 1', 'List 2', 'List 3', 'List 4'])
+        self.assertEqual(get_names(self.get_detail(4, 10)), ['List 0', 'List 1', 'List 2', 'List 3', 'List 4'])
+
+    def test_depth_without_recursive_cte(self):
+        supports_recursive_cte = tree.supports_recursive_cte
+        tree.supports_recursive_cte = lambda: False
+
+        try:
+            self.assertEqual(get_names(self.get_detail(2, 2)), ['List 0', 'List 1', 'List 2', 'List 3', 'List 4'])
+            self.assertEqual(get_names(self.get_detail(0, 10)), ['List 0', 'List 1', 'List 2', 'List 3', 'List 4', 'List 5'])
+
+        finally:
+            tree.supports_recursive_cte = supports_recursive_cte
+
+    def test_cycle(self):
+        """
+        A topTenList that is its own ancestor is only returned once
+        """
+        self.set_parent(self.topTenLists[0], self.topTenLists[4], 1)
+
+        self.assertEqual(get_names(self.get_detail(0, 10)), ['List 0', 'List 1', 'List 2', 'List 3', 'List 4', 'List 5'])
+
+    def test_private(self):
+        self.topTenLists[1].is_public = False
+        self.topTenLists[1].save()
+
+        self.client.logout()
+
+        self.assertEqual(get_names(self.get_detail(0)), ['List 0', 'List 5'])
+
+    def test_not_found(self):
+        response = self.client.get(detail_url, {'id': 'not a uuid'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(response.content), [])
+
+    def test_query_count(self):
+        """
+        One query for the topTenLists and one for each prefetch, and one more to find the tree
+        """
+        with self.assertNumQueries(3):
+            self.get_detail(1)
+
+        for depth in (2, 10):
+            with self.assertNumQueries(4):
+                self.get_detail(2, depth)
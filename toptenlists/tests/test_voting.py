@@ -0,0 +1,140 @@
+"""
+Tests for votes on change requests, see toptenlists/voting.py
+"""
+
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from users.models import CustomUser
+from toptenlists.models import ReusableItem, ReusableItemUser
+from toptenlists.voting import StaleChangeRequest, cast_vote, count_votes, get_resolution, recount_votes
+
+def create_users(number):
+    return [CustomUser.objects.create_user('Test user ' + str(index), 'person_' + str(index) + '@example.com', 'password') for index in range(number)]
+
+class ResolutionTest(TestCase):
+    def test_one_user(self):
+        self.assertEqual(get_resolution(1, 0, 1), 'accepted')
+        self.assertEqual(get_resolution(0, 1, 1), 'rejected')
+        self.assertIsNone(get_resolution(0, 0, 1))
+
+    def test_quorum(self):
+        # 6 - 10 users: quorum 4, 70% to accept
+        self.assertIsNone(get_resolution(2, 0, 8))
+        self.assertEqual(get_resolution(3, 0, 8), 'accepted')
+        self.assertIsNone(get_resolution(2, 1, 8))
+        self.assertEqual(get_resolution(2, 2, 8), 'rejected')
+
+        # more votes than the quorum
+        self.assertEqual(get_resolution(7, 3, 8), 'accepted')
+
+    def test_more_users_than_rules(self):
+        self.assertIsNone(get_resolution(23, 0, 10000))
+        self.assertEqual(get_resolution(24, 0, 10000), 'accepted')
+
+class VoteTest(TestCase):
+    def setUp(self):
+        self.users = create_users(8)
+        self.reusableItem = ReusableItem.objects.create(name='Jane Austen', is_public=True, created_by=self.users[0], created_by_username=self.users[0].username, change_request={'name': 'Miss Austen'}, change_request_by=self.users[0])
+
+        ReusableItemUser.objects.bulk_create([ReusableItemUser(reusableItem=self.reusableItem, user=user) for user in self.users])
+        ReusableItem.objects.filter(pk=self.reusableItem.pk).update(users_count=len(self.users))
+        self.resolve = mock.Mock()
+
+    def vote(self, user, vote):
+        return cast_vote(ReusableItem.objects.get(pk=self.reusableItem.pk), user, vote, self.resolve)
+
+    def assertCounts(self, yes, no):
+        reusableItem = ReusableItem.objects.get(pk=self.reusableItem.pk)
+
+        self.assertEqual((reusableItem.change_request_votes_yes_count, reusableItem.change_request_votes_no_count), (yes, no))
+        self.assertEqual((reusableItem.change_request_votes_yes.count(), reusableItem.change_request_votes_no.count()), (yes, no))
+
+    def test_counts(self):
+        self.assertIsNone(self.vote(self.users[0], 'yes'))
+        self.assertIsNone(self.vote(self.users[1], 'yes'))
+        self.assertCounts(2, 0)
+
+        # vote again
+        self.vote(self.users[1], 'yes')
+        self.assertCounts(2, 0)
+
+        # change vote
+        self.vote(self.users[1], 'no')
+        self.assertCounts(1, 1)
+
+        # withdraw vote
+        self.vote(self.users[1], '')
+        self.assertCounts(1, 0)
+
+        self.resolve.assert_not_called()
+
+    def test_resolved_once(self):
+        """
+        The vote that decides the change request resolves it, and a vote read before then is stale
+        """
+        stale = ReusableItem.objects.get(pk=self.reusableItem.pk)
+
+        for user in self.users[:2]:
+            self.vote(user, 'yes')
+
+        self.assertEqual(self.vote(self.users[2], 'yes'), 'accepted')
+        self.resolve.assert_called_once()
+        self.assertEqual(self.resolve.call_args[0][0].change_request_votes_yes_count, 3)
+
+        with self.assertRaises(StaleChangeRequest):
+            cast_vote(stale, self.users[4], 'no', self.resolve)
+
+        with self.assertRaises(StaleChangeRequest):
+            count_votes(stale, self.resolve)
+
+        self.resolve.assert_called_once()
+
+        # resolve, here a mock, would clear the vote tables
+        reusableItem = ReusableItem.objects.get(pk=self.reusableItem.pk)
+        self.assertEqual((reusableItem.change_request_votes_yes_count, reusableItem.change_request_votes_no_count), (0, 0))
+        self.assertEqual(reusableItem.change_request_version, stale.change_request_version + 1)
+
+    def test_count_votes(self):
+        """
+        Fewer users can decide the change request
+        """
+        for user in self.users[:2]:
+            self.vote(user, 'yes')
+
+        ReusableItem.objects.filter(pk=self.reusableItem.pk).update(users_count=2)
+
+        self.assertEqual(count_votes(ReusableItem.objects.get(pk=self.reusableItem.pk), self.resolve), 'accepted')
+        self.resolve.assert_called_once()
+
+    def test_recount(self):
+        """
+        Votes changed through the relation, e.g. by the admin, are counted by signals.py
+        """
+        self.reusableItem.change_request_votes_yes.add(self.users[0], self.users[1])
+        self.reusableItem.change_request_votes_no.add(self.users[2])
+        self.assertCounts(2, 1)
+
+        self.users[0].reusableItem_votes_yes.clear()
+        self.assertCounts(1, 1)
+
+        recount_votes([self.reusableItem.pk])
+        self.assertCounts(1, 1)
+
+class StressVotesTest(TransactionTestCase):
+    @override_settings(TOPTENLISTS_VOTE_ATTEMPTS=50, TOPTENLISTS_NOTIFICATION_RUN_ON_COMMIT=False)
+    def test_stressvotes(self):
+        """
+        Concurrent voters in threads: each change request is resolved once and every vote counted once
+        An in-memory SQLite test database cannot be shared by threads, so there the voters take turns
+        """
+        out = StringIO()
+        threads = 4 if connection.features.test_db_allows_multiple_connections else 1
+        call_command('stressvotes', voters=40, threads=threads, stdout=out)
+
+        self.assertIn('every vote was counted once', out.getvalue())
+        self.assertFalse(ReusableItem.objects.exists())
+        self.assertFalse(CustomUser.objects.exists())
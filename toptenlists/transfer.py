@@ -0,0 +1,198 @@
+"""
+Export and import topTenLists as NDJSON, one topTenList per line with its topTenItems
+
+{"name": "...", "description": "...", "is_public": true, "topTenItem": [{"name": "...", "description": "...", "order": 1, "reusableItem_id": "..."}, ...]}
+
+Each imported field is checked by a REST framework serializer field, as the API would check it, so e.g. "false" is false;
+a line with a field that is not valid is reported as an error and not imported.
+
+Both directions work a chunk of topTenLists at a time, so memory does not grow with the number of topTenLists.
+Import checks the referenced reusableItems with one query per chunk and creates each chunk's topTenLists and topTenItems
+with bulk_create in a transaction. bulk_create does not send signals, so the work of the post_save signals is done here.
+
+Imported topTenLists belong to the importing user and get new ids. parent_topTenItem is not exported,
+because the parent topTenItem would not exist in the importing database.
+"""
+
+import json
+import uuid
+
+from django.db import transaction
+from django.db.models import Q
+from rest_framework import serializers
+
+from .models import TopTenList, TopTenItem, ReusableItem
+from .references import update_reusable_item_users
+from .search import get_search_backend
+
+TOPTENLIST_FIELDS = ('id', 'name', 'description', 'is_public', 'created_by_username', 'created_at')
+TOPTENITEM_FIELDS = ('topTenList_id', 'name', 'description', 'order', 'reusableItem_id')
+MAX_ERRORS = 100
+
+def export_topTenLists(queryset, chunk_size=1000):
+    """
+    Yield a line of NDJSON for each topTenList in queryset
+    """
+    queryset = queryset.prefetch_related(None).order_by('id')
+    last_id = None
+
+    while True:
+        chunk = queryset if last_id is None else queryset.filter(id__gt=last_id)
+        topTenLists = list(chunk.values(*TOPTENLIST_FIELDS)[:chunk_size])
+
+        if len(topTenLists) == 0:
+            return
+
+        topTenItems = {}
+
+        for topTenItem in TopTenItem.objects.filter(topTenList_id__in=[topTenList['id'] for topTenList in topTenLists]).values(*TOPTENITEM_FIELDS):
+            topTenItems.setdefault(topTenItem.pop('topTenList_id'), []).append(topTenItem)
+
+        for topTenList in topTenLists:
+            topTenList['topTenItem'] = sorted(topTenItems.get(topTenList['id'], []), key=lambda topTenItem: topTenItem['order'])
+
+            yield json.dumps(topTenList, default=str) + '\n'
+
+        last_id = topTenLists[-1]['id']
+
+def validate_field(field, data, name, default, prefix=''):
+    """
+    Return the value of data[name] validated by the serializer field, or raise ValueError
+    A missing value, or null, is given the default
+    """
+    value = data.get(name)
+
+    try:
+        return field.run_validation(default if value is None else value)
+
+    except serializers.ValidationError as error:
+        raise ValueError('%s%s: %s' % (prefix, name, ' '.join(str(detail) for detail in error.detail)))
+
+def parse_topTenList(line):
+    """
+    Return the topTenList data from a line of NDJSON, or raise ValueError
+    """
+    data = json.loads(line)
+
+    if not isinstance(data, dict):
+        raise ValueError('Each line must be a JSON object')
+
+    data['name'] = validate_field(serializers.CharField(max_length=TopTenList._meta.get_field('name').max_length), data, 'name', None)
+    data['description'] = validate_field(serializers.CharField(allow_blank=True, max_length=TopTenList._meta.get_field('description').max_length), data, 'description', '')
+    data['is_public'] = validate_field(serializers.BooleanField(), data, 'is_public', False)
+
+    topTenItems = data.get('topTenItem', [])
+
+    if not isinstance(topTenItems, list) or len(topTenItems) > 10:
+        raise ValueError('topTenItem must be a list of up to 10 topTenItems')
+
+    orders = set()
+
+    for topTenItem in topTenItems:
+        if not isinstance(topTenItem, dict):
+            raise ValueError('Each topTenItem must be a JSON object')
+
+        order = topTenItem.get('order')
+
+        if not isinstance(order, int) or isinstance(order, bool) or order < 1 or order > 10 or order in orders:
+            raise ValueError('Each topTenItem must have a different order from 1 to 10')
+
+        orders.add(order)
+
+        topTenItem['name'] = validate_field(serializers.CharField(allow_blank=True, max_length=TopTenItem._meta.get_field('name').max_length), topTenItem, 'name', '', 'topTenItem %d ' % order)
+        topTenItem['description'] = validate_field(serializers.CharField(allow_blank=True, max_length=TopTenItem._meta.get_field('description').max_length), topTenItem, 'description', '', 'topTenItem %d ' % order)
+
+        if topTenItem.get('reusableItem_id') is not None:
+            topTenItem['reusableItem_id'] = uuid.UUID(str(topTenItem['reusableItem_id']))
+
+    return data
+
+def _import_chunk(chunk, user, result):
+    """
+    chunk is a list of topTenList data
+    """
+    # one query finds which of the referenced reusableItems exist and the user may use
+    reusableItem_ids = {topTenItem['reusableItem_id'] for data in chunk for topTenItem in data.get('topTenItem', []) if topTenItem.get('reusableItem_id') is not None}
+
+    if len(reusableItem_ids) > 0:
+        allowed_ids = set(ReusableItem.objects.filter(id__in=reusableItem_ids).filter(Q(is_public=True) | Q(created_by=user)).values_list('id', flat=True))
+    else:
+        allowed_ids = set()
+
+    topTenLists = []
+    topTenItems = []
+
+    for data in chunk:
+        topTenList = TopTenList(
+            name=data['name'],
+            description=data['description'],
+            is_public=data['is_public'],
+            created_by=user,
+            created_by_username=user.username,
+        )
+        topTenLists.append(topTenList)
+
+        for topTenItem in data.get('topTenItem', []):
+            reusableItem_id = topTenItem.get('reusableItem_id')
+
+            if reusableItem_id is not None and reusableItem_id not in allowed_ids:
+                result['skipped_references'] = result['skipped_references'] + 1
+                reusableItem_id = None
+
+            topTenItems.append(TopTenItem(
+                topTenList=topTenList,
+                name=topTenItem['name'],
+                description=topTenItem['description'],
+                order=topTenItem['order'],
+                reusableItem_id=reusableItem_id,
+            ))
+
+    with transaction.atomic():
+        TopTenList.objects.bulk_create(topTenLists)
+        TopTenItem.objects.bulk_create(topTenItems)
+
+        # bulk_create does not send signals, so record the new references and index the new topTenLists and topTenItems here
+        update_reusable_item_users([(topTenItem.reusableItem_id, user.id) for topTenItem in topTenItems])
+
+    get_search_backend().update(TopTenList, topTenLists)
+    get_search_backend().update(TopTenItem, topTenItems)
+
+    result['topTenLists'] = result['topTenLists'] + len(topTenLists)
+    result['topTenItems'] = result['topTenItems'] + len(topTenItems)
+
+def import_topTenLists(lines, user, chunk_size=1000):
+    """
+    Create topTenLists for user from lines of NDJSON
+    A line that is not valid is skipped and reported in errors, with its line number
+    A reference to a reusableItem that does not exist, or is private to another user, is removed
+    """
+    result = {'topTenLists': 0, 'topTenItems': 0, 'skipped_references': 0, 'invalid_lines': 0, 'errors': []}
+    chunk = []
+
+    for line_number, line in enumerate(lines, start=1):
+        try:
+            if isinstance(line, bytes):
+                line = line.decode('utf-8')
+
+            if line.strip() == '':
+                continue
+
+            chunk.append(parse_topTenList(line))
+
+        except ValueError as error:
+            result['invalid_lines'] = result['invalid_lines'] + 1
+
+            # only the first errors are reported
+            if len(result['errors']) < MAX_ERRORS:
+                result['errors'].append({'line': line_number, 'message': str(error)})
+
+            continue
+
+        if len(chunk) >= chunk_size:
+            _import_chunk(chunk, user, result)
+            chunk = []
+
+    if len(chunk) > 0:
+        _import_chunk(chunk, user, result)
+
+    return result
@@ -0,0 +1,84 @@
+"""
+Find the ancestors and descendants of a topTenList
+
+A topTenList's parent is the topTenList containing its parent_topTenItem,
+and its children are the topTenLists whose parent_topTenItem is one of its topTenItems.
+
+Where the database supports recursive common table expressions the whole tree is found in one query,
+whatever the depth. Otherwise there is one query per level.
+"""
+
+from django.db import connection
+
+from .models import TopTenList, TopTenItem
+
+def supports_recursive_cte():
+    if connection.vendor == 'sqlite':
+        return connection.Database.sqlite_version_info >= (3, 8, 3)
+
+    if connection.vendor == 'mysql':
+        return connection.mysql_version >= (8, 0) # also true for MariaDB 10.2+
+
+    return connection.vendor == 'postgresql'
+
+def get_tree_sql():
+    qn = connection.ops.quote_name
+
+    return """
+        WITH RECURSIVE ancestors (id, depth) AS (
+            SELECT %s, 0
+            UNION ALL
+            SELECT item.{item_list}, ancestors.depth + 1
+            FROM ancestors
+            INNER JOIN {list_table} lst ON lst.{list_id} = ancestors.id
+            INNER JOIN {item_table} item ON item.{item_id} = lst.{list_parent}
+            WHERE ancestors.depth < %s
+        ),
+        descendants (id, depth) AS (
+            SELECT %s, 0
+            UNION ALL
+            SELECT child.{list_id}, descendants.depth + 1
+            FROM descendants
+            INNER JOIN {item_table} item ON item.{item_list} = descendants.id
+            INNER JOIN {list_table} child ON child.{list_parent} = item.{item_id}
+            WHERE descendants.depth < %s
+        )
+        SELECT id FROM ancestors UNION SELECT id FROM descendants
+    """.format(
+        list_table=qn(TopTenList._meta.db_table),
+        list_id=qn(TopTenList._meta.pk.column),
+        list_parent=qn(TopTenList._meta.get_field('parent_topTenItem').column),
+        item_table=qn(TopTenItem._meta.db_table),
+        item_id=qn(TopTenItem._meta.pk.column),
+        item_list=qn(TopTenItem._meta.get_field('topTenList').column),
+    )
+
+def get_tree_ids(topTenList_id, depth):
+    """
+    Return the ids of the topTenList and of its ancestors and descendants up to depth levels away
+    """
+    pk = TopTenList._meta.pk
+
+    if supports_recursive_cte():
+        db_id = pk.get_db_prep_value(pk.to_python(topTenList_id), connection)
+
+        with connection.cursor() as cursor:
+            cursor.execute(get_tree_sql(), [db_id, depth, db_id, depth])
+
+            return {pk.to_python(row[0]) for row in cursor.fetchall()}
+
+    topTenList_ids = {pk.to_python(topTenList_id)}
+    parent_ids = set(topTenList_ids)
+    child_ids = set(topTenList_ids)
+
+    # a topTenList can be an ancestor of itself, so stop at topTenLists already found
+    for level in range(depth):
+        if len(parent_ids) > 0:
+            parent_ids = set(TopTenItem.objects.filter(parent_topTenItem__in=parent_ids).values_list('topTenList_id', flat=True)) - topTenList_ids
+            topTenList_ids |= parent_ids
+
+        if len(child_ids) > 0:
+            child_ids = set(TopTenList.objects.filter(parent_topTenItem__topTenList__in=child_ids).values_list('id', flat=True)) - topTenList_ids
+            topTenList_ids |= child_ids
+
+    return topTenList_ids
@@ -0,0 +1,289 @@
+"""
+Votes on change requests to reusableItems
+
+Each vote is a row in the reusableItem's yes or no vote table. The reusableItem keeps change_request_votes_yes_count
+and change_request_votes_no_count in step with the tables, so deciding a change request does not count the tables.
+
+A vote locks the reusableItem's row, changes the vote tables and updates the counts with F() in one transaction,
+so concurrent voters are counted one after another and each sees the counts including its own vote.
+Each resolution of a change request changes change_request_version. A vote only applies to the version its request read,
+so a vote on a change request that has already been resolved is rolled back and StaleChangeRequest is raised.
+
+A change request is resolved exactly once: the resolution is claimed by a compare-and-swap of change_request_version
+in the same transaction as the vote that decides it, and only the request that claims it calls resolve.
+The compare-and-swap also protects databases that do not lock rows, such as SQLite.
+
+If the database reports a deadlock or that it is locked, the transaction is retried up to TOPTENLISTS_VOTE_ATTEMPTS times.
+"""
+
+import random
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, OperationalError, transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .cache import invalidate_topTenLists
+from .models import ReusableItem, TopTenItem
+
+# vote: (vote table, count field)
+VOTE_FIELDS = {
+    'yes': ('change_request_votes_yes', 'change_request_votes_yes_count'),
+    'no': ('change_request_votes_no', 'change_request_votes_no_count'),
+}
+
+""" voting rules
+Once a quorum is reached, the change request is approved if enough users have voted for it, otherwise it is rejected.
+
+number_of_users: rule applies to reusableItem referenced by this number of users, or fewer
+quorum: number of votes that must be cast to resolve change request
+accept_percentage: this % of votes must be cast for the change, for it to be accepted
+elibibility_scheme: who is eligible to vote. Initially just 'A', but with the potential to have different schemes depending on the popularity of the reusableItem ('B', 'C' etc). For example, can people vote even if they only reference the reusableItem in private topTenLists?
+"""
+VOTING_RULES = [
+    { # one user so change will happen immediately
+    'number_of_users': 1,
+    'quorum': 1,
+    'accept_percentage': 100,
+    'voting_scheme': 'A'
+    },
+    { # 2 users: all must vote
+    'number_of_users': 2,
+    'quorum': 2,
+    'accept_percentage': 100,
+    'voting_scheme': 'A'
+    },
+    { # 3 users
+    'number_of_users': 3,
+    'quorum': 3,
+    'accept_percentage': 60,
+    'voting_scheme': 'A'
+    },
+    { # 4 or 5 users
+    'number_of_users': 5,
+    'quorum': 3,
+    'accept_percentage': 60,
+    'voting_scheme': 'A'
+    },
+    { # 6 - 10 users
+    'number_of_users': 10,
+    'quorum': 4,
+    'accept_percentage': 70,
+    'voting_scheme': 'A'
+    },
+    { # 11 - 20 users
+    'number_of_users': 20,
+    'quorum': 6,
+    'accept_percentage': 80,
+    'voting_scheme': 'A'
+    },
+    { # 21 - 100 users
+    'number_of_users': 100,
+    'quorum': 10,
+    'accept_percentage': 80,
+    'voting_scheme': 'A'
+    },
+    { # 101 - 1000 users
+    'number_of_users': 1000,
+    'quorum': 20,
+    'accept_percentage': 80,
+    'voting_scheme': 'A'
+    },
+    { # 1001 - 5000 users
+    'number_of_users': 5000,
+    'quorum': 30,
+    'accept_percentage': 80,
+    'voting_scheme': 'A'
+    }
+]
+
+
+class StaleChangeRequest(Exception):
+    """
+    The change request has been resolved since the reusableItem was read
+    """
+    pass
+
+
+def get_voting_rule(number_of_users):
+    for rule in VOTING_RULES:
+        if number_of_users <= rule['number_of_users']:
+            return rule
+
+    # this default will apply if there are more users than the last voting rule covers
+    return VOTING_RULES[-1]
+
+def get_resolution(votes_yes, votes_no, number_of_users):
+    """
+    'accepted' or 'rejected' if the votes decide the change request, otherwise None
+    """
+    total_votes = votes_yes + votes_no
+
+    if total_votes == 0:
+        return None
+
+    rule = get_voting_rule(number_of_users)
+
+    # if total_votes is > quorum
+    # use % of votes not of quorum
+    # in case for example people dereference a reusable item with a pending change request
+    max_votes = max(total_votes, rule['quorum'])
+
+    # enough have voted 'yes'
+    if 100 * votes_yes / max_votes >= rule['accept_percentage']:
+        return 'accepted'
+
+    # even if all remaining users vote 'yes', the accept percentage cannot be reached
+    if 100 * votes_no / max_votes > 100 - rule['accept_percentage']:
+        return 'rejected'
+
+    return None
+
+def get_vote_table(vote):
+    field = ReusableItem._meta.get_field(VOTE_FIELDS[vote][0])
+
+    return field.remote_field.through, field
+
+def recount_votes(reusableItem_ids):
+    """
+    Count the vote tables again for these reusableItems, with one UPDATE
+    For votes changed other than by cast_vote, e.g. by the admin; see signals.py
+    """
+    counts = {}
+
+    for vote, (field_name, count_field) in VOTE_FIELDS.items():
+        through, field = get_vote_table(vote)
+        votes = through.objects.filter(**{field.m2m_field_name(): OuterRef('pk')}).order_by().values(field.m2m_field_name()).annotate(count=Count('pk')).values('count')
+
+        counts[count_field] = Coalesce(Subquery(votes, output_field=IntegerField()), Value(0))
+
+    ReusableItem.objects.filter(pk__in=list(reusableItem_ids)).update(**counts)
+
+def run_in_transaction(reusableItem, function):
+    """
+    Call function in a transaction and return its result
+    Retry if the database reports a deadlock, a lock, or a vote row inserted by a concurrent request by the same user
+    Within an outer transaction the error is raised, because only the outer transaction could be retried
+    """
+    attempts = getattr(settings, 'TOPTENLISTS_VOTE_ATTEMPTS', 5)
+    version = reusableItem.change_request_version
+
+    for attempt in range(1, attempts + 1):
+        try:
+            with transaction.atomic():
+                return function()
+
+        except (OperationalError, IntegrityError):
+            if attempt == attempts or transaction.get_connection().in_atomic_block:
+                raise
+
+        time.sleep(random.uniform(0, min(0.005 * 2 ** attempt, 0.1)))
+
+        # resolve may have changed the reusableItem before the transaction was rolled back
+        # the version the request read is kept, so that a change request resolved meanwhile is not voted on
+        reusableItem.refresh_from_db()
+        reusableItem.change_request_version = version
+
+def read_votes(reusableItem, lock=False):
+    """
+    Read the counts for the version of the change request the reusableItem was read with, into the reusableItem
+    """
+    queryset = ReusableItem.objects.filter(pk=reusableItem.pk, change_request_version=reusableItem.change_request_version)
+
+    if lock:
+        queryset = queryset.select_for_update()
+
+    row = queryset.values_list('change_request_votes_yes_count', 'change_request_votes_no_count', 'users_count').first()
+
+    if row is None:
+        raise StaleChangeRequest()
+
+    reusableItem.change_request_votes_yes_count, reusableItem.change_request_votes_no_count, reusableItem.users_count = row
+
+def claim_resolution(reusableItem, resolution, resolve):
+    """
+    Move the reusableItem to the next version, and call resolve(reusableItem, resolution) if this request did so
+    The reusableItem keeps the final counts, for its history
+    """
+    version = reusableItem.change_request_version
+
+    claimed = ReusableItem.objects.filter(pk=reusableItem.pk, change_request_version=version).update(
+        change_request_version=version + 1,
+        change_request_votes_yes_count=0,
+        change_request_votes_no_count=0,
+    )
+
+    if claimed == 0:
+        raise StaleChangeRequest()
+
+    reusableItem.change_request_version = version + 1
+    resolve(reusableItem, resolution)
+
+def invalidate_reusableItem(reusableItem):
+    # the votes are shown with the topTenLists that reference the reusableItem, see cache.py
+    invalidate_topTenLists(TopTenItem.objects.filter(reusableItem=reusableItem).values_list('topTenList_id', flat=True))
+
+def cast_vote(reusableItem, user, vote, resolve):
+    """
+    Record the user's vote on the reusableItem's change request: 'yes', 'no', or '' to withdraw their vote
+    If the vote decides the change request, resolve(reusableItem, resolution) is called in the same transaction
+    Returns the resolution, or None if the change request is still open
+    """
+    def vote_once():
+        read_votes(reusableItem, lock=True)
+
+        counts = {}
+
+        for choice, (field_name, count_field) in VOTE_FIELDS.items():
+            through, field = get_vote_table(choice)
+            removed = through.objects.filter(**{field.m2m_field_name(): reusableItem.pk, field.m2m_reverse_field_name(): user.pk}).delete()[0]
+            added = 0
+
+            if vote == choice:
+                through.objects.create(**{field.m2m_field_name(): reusableItem, field.m2m_reverse_field_name(): user})
+                added = 1
+
+            counts[count_field] = F(count_field) + added - removed
+
+        if ReusableItem.objects.filter(pk=reusableItem.pk, change_request_version=reusableItem.change_request_version).update(**counts) == 0:
+            raise StaleChangeRequest()
+
+        read_votes(reusableItem)
+        resolution = get_resolution(reusableItem.change_request_votes_yes_count, reusableItem.change_request_votes_no_count, reusableItem.users_count)
+
+        if resolution is not None:
+            claim_resolution(reusableItem, resolution, resolve)
+
+        return resolution
+
+    resolution = run_in_transaction(reusableItem, vote_once)
+    invalidate_reusableItem(reusableItem)
+
+    return resolution
+
+def count_votes(reusableItem, resolve):
+    """
+    Resolve the change request if the votes cast now decide it, e.g. because the number of users has changed
+    Returns the resolution, or None if the change request is still open
+    """
+    def count_once():
+        read_votes(reusableItem, lock=True)
+        resolution = get_resolution(reusableItem.change_request_votes_yes_count, reusableItem.change_request_votes_no_count, reusableItem.users_count)
+
+        if resolution is not None:
+            claim_resolution(reusableItem, resolution, resolve)
+
+        return resolution
+
+    return run_in_transaction(reusableItem, count_once)
+
+def resolve_change_request(reusableItem, resolution, resolve):
+    """
+    Resolve the change request without a vote, e.g. 'cancelled' by the user who submitted it
+    """
+    def resolve_once():
+        read_votes(reusableItem, lock=True)
+        claim_resolution(reusableItem, resolution, resolve)
+
+    run_in_transaction(reusableItem, resolve_once)
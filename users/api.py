@@ -2,7 +2,7 @@
 from allauth.account.signals import email_confirmed
 from django.dispatch import receiver
 from rest_framework import generics
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 
 from allauth.account.utils import send_email_confirmation
 from rest_framework.views import APIView
@@ -11,14 +11,14 @@ from allauth.account.models import EmailAddress
 from . import models
 from . import serializers
 
-from rest_framework.authentication import TokenAuthentication
+from .authentication import CachedTokenAuthentication, token_cache_stats
 from rest_framework import status
 from rest_framework.response import Response
 
 class UserListView(generics.ListCreateAPIView):
     queryset = models.CustomUser.objects.all()
     serializer_class = serializers.UserSerializer
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
 
 # this has been replaced by a live check on the email status in serializers.py
 # for now I'm leaving it in as reference for receiving signals
@@ -43,3 +43,17 @@ class EmailConfirmation(APIView):
 
         send_email_confirmation(request, request.user)
         return Response({'message': 'Email confirmation sent'}, status=status.HTTP_201_CREATED)
+
+class TokenCacheStatsView(APIView):
+    """
+    Hits and misses for cached authentication tokens in this process, see authentication.py
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(token_cache_stats.as_dict())
+
+    def delete(self, request):
+        token_cache_stats.reset()
+
+        return Response(status=status.HTTP_204_NO_CONTENT)
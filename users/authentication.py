@@ -0,0 +1,185 @@
+"""
+Token authentication without reading the token and its user on every request
+
+TokenAuthentication reads the token joined to its user for every API request. CachedTokenAuthentication
+keeps each authenticated token in two tiers:
+
+- a least recently used cache in this process, holding up to USERS_TOKEN_CACHE_SIZE tokens for
+  USERS_TOKEN_CACHE_LOCAL_TIMEOUT seconds, so a request is usually authenticated from memory
+- the USERS_CACHE cache, shared by all processes, for USERS_TOKEN_CACHE_TIMEOUT seconds.
+  production.py uses the database cache. A local memory cache is not shared, so it is not used as a tier:
+  another process would go on accepting a deleted token from it
+
+A token is forgotten by both tiers in this process and by the shared tier when it is deleted, e.g. on logout,
+and all of a user's tokens are forgotten when the user is saved, e.g. on a password change, or deleted; see signals.py.
+Other processes forget a token from their own memory after USERS_TOKEN_CACHE_LOCAL_TIMEOUT seconds,
+so keep that short.
+
+Each request is given its own copy of the user and token. Hits and misses are counted by token_cache_stats.
+"""
+
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.utils.translation import ugettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+def get_cache():
+    return caches[getattr(settings, 'USERS_CACHE', 'default')]
+
+def use_shared_cache():
+    return not isinstance(get_cache(), LocMemCache)
+
+def get_token_key(key):
+    # the token itself is not used as the key, so it is not visible to anyone who can list the cache
+    return 'user:token:%s' % hashlib.sha256(key.encode()).hexdigest()
+
+
+class LocalTokenCache(object):
+    """
+    Pickled tokens in this process, least recently used first, each with the time it expires
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.tokens = OrderedDict()
+
+    def get(self, key):
+        now = time.monotonic()
+
+        with self.lock:
+            try:
+                expires, data = self.tokens[key]
+
+            except KeyError:
+                return None
+
+            if expires <= now:
+                del self.tokens[key]
+                return None
+
+            self.tokens.move_to_end(key)
+
+            return data
+
+    def set(self, key, data):
+        size = getattr(settings, 'USERS_TOKEN_CACHE_SIZE', 10000)
+        expires = time.monotonic() + getattr(settings, 'USERS_TOKEN_CACHE_LOCAL_TIMEOUT', 10)
+
+        with self.lock:
+            self.tokens[key] = (expires, data)
+            self.tokens.move_to_end(key)
+
+            while len(self.tokens) > size:
+                self.tokens.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.tokens.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.tokens.clear()
+
+    def __len__(self):
+        return len(self.tokens)
+
+local_tokens = LocalTokenCache()
+
+
+class TokenCacheStats(object):
+    """
+    Tokens found in this process's memory, in the shared cache, or read from the database, in this process
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.local_hits = 0
+            self.shared_hits = 0
+            self.misses = 0
+
+    def record(self, tier):
+        with self.lock:
+            setattr(self, tier, getattr(self, tier) + 1)
+
+    def as_dict(self):
+        with self.lock:
+            total = self.local_hits + self.shared_hits + self.misses
+
+            return {
+                'local_hits': self.local_hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'hit_rate': (self.local_hits + self.shared_hits) / total if total else None,
+                'local_tokens': len(local_tokens),
+            }
+
+token_cache_stats = TokenCacheStats()
+
+def cache_token(key, token):
+    """
+    Keep the token and its user in both tiers
+    A token read in a transaction is kept when the transaction commits, because the transaction may be rolled back
+    """
+    data = pickle.dumps(token, pickle.HIGHEST_PROTOCOL)
+
+    def set_token():
+        local_tokens.set(key, data)
+
+        if use_shared_cache():
+            get_cache().set(get_token_key(key), data, getattr(settings, 'USERS_TOKEN_CACHE_TIMEOUT', 300))
+
+    transaction.on_commit(set_token)
+
+def forget_token(key):
+    """
+    Forget the token in this process and the shared cache, now and again when the transaction commits
+    """
+    def delete_token():
+        local_tokens.delete(key)
+        get_cache().delete(get_token_key(key))
+
+    delete_token()
+    transaction.on_commit(delete_token)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication, with the token and its user cached, see above
+    """
+    def authenticate_credentials(self, key):
+        data = local_tokens.get(key)
+
+        if data is not None:
+            token_cache_stats.record('local_hits')
+
+        elif use_shared_cache():
+            data = get_cache().get(get_token_key(key))
+
+            if data is not None:
+                token_cache_stats.record('shared_hits')
+                local_tokens.set(key, data)
+
+        if data is None:
+            token_cache_stats.record('misses')
+            user, token = super(CachedTokenAuthentication, self).authenticate_credentials(key)
+            cache_token(key, token)
+
+            return (user, token)
+
+        token = pickle.loads(data)
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+
+        return (token.user, token)
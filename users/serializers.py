@@ -1,7 +1,7 @@
 # users/serializers.py
 from rest_framework import serializers
 from . import models
-from allauth.account.models import EmailAddress 
+from .verified import is_email_verified
 
 class UserSerializer(serializers.ModelSerializer):
     """
@@ -14,9 +14,5 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ('email', 'username', 'id', 'email_verified', 'notifications')
 
     def get_email_verified(self, obj):
-        try:
-            email_address = EmailAddress.objects.get(user_id=obj.id)
-            return email_address.verified
-            
-        except EmailAddress.DoesNotExist:
-            return None
\ No newline at end of file
+        # None if the user has no email address, see verified.py
+        return is_email_verified(obj, self.context.get('request'))
\ No newline at end of file
@@ -0,0 +1,35 @@
+# users/signals.py
+
+from allauth.account.models import EmailAddress
+from allauth.account.signals import email_confirmed
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from . models import CustomUser
+from . verified import invalidate_email_verified
+from . authentication import forget_token
+
+# the user's cached email status is out of date, see verified.py
+@receiver(email_confirmed)
+def email_address_confirmed(request, email_address, **kwargs):
+    invalidate_email_verified(email_address.user_id)
+
+@receiver([post_save, post_delete], sender=EmailAddress)
+def email_address_changed(sender, instance, **kwargs):
+    invalidate_email_verified(instance.user_id)
+
+# forget cached tokens, see authentication.py
+# a token is deleted on logout, and with its user
+@receiver([post_delete], sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    forget_token(instance.key)
+
+# the cached user is out of date, e.g. their password has been changed
+@receiver([post_save, post_delete], sender=CustomUser)
+def user_changed(sender, instance, created=False, **kwargs):
+    if created:
+        return
+
+    for key in Token.objects.filter(user_id=instance.pk).values_list('key', flat=True):
+        forget_token(key)
@@ -0,0 +1,139 @@
+"""
+Test the cached token authentication
+"""
+
+from unittest import mock
+
+from allauth.account.models import EmailAddress
+from django.db import connection
+from django.test import SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITransactionTestCase
+from users.models import CustomUser
+from users.authentication import LocalTokenCache, local_tokens, token_cache_stats
+
+user_detail_url = reverse('rest_user_details')
+
+class TokenAuthenticationTest(APITransactionTestCase):
+    """
+    Tokens are only cached when a transaction commits, so these tests commit
+    """
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('Test user', 'person@example.com', '12345abcde')
+        EmailAddress.objects.create(user=self.user, email='person@example.com', primary=True, verified=True)
+        self.token = Token.objects.create(user=self.user)
+
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        token_cache_stats.reset()
+
+    def get_token_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(user_detail_url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['username'], 'Test user')
+
+        return [query for query in context.captured_queries if 'authtoken_token' in query['sql']]
+
+    def test_cached(self):
+        # the tests run in one process, so pretend the local memory cache is shared
+        with mock.patch('users.authentication.use_shared_cache', return_value=True):
+            self.assertEqual(len(self.get_token_queries()), 1)
+            self.assertEqual(self.get_token_queries(), [])
+
+            # another process finds the token in the shared cache
+            local_tokens.clear()
+            self.assertEqual(self.get_token_queries(), [])
+
+        stats = token_cache_stats.as_dict()
+        self.assertEqual((stats['local_hits'], stats['shared_hits'], stats['misses']), (1, 1, 1))
+        self.assertAlmostEqual(stats['hit_rate'], 2 / 3)
+
+    def test_local_memory_not_shared(self):
+        """
+        A local memory cache is not used as the shared tier, so another process reads the token again
+        """
+        self.assertEqual(len(self.get_token_queries()), 1)
+        self.assertEqual(self.get_token_queries(), [])
+
+        local_tokens.clear()
+        self.assertEqual(len(self.get_token_queries()), 1)
+
+        stats = token_cache_stats.as_dict()
+        self.assertEqual((stats['local_hits'], stats['shared_hits'], stats['misses']), (1, 0, 2))
+
+    def test_logout(self):
+        self.get_token_queries()
+
+        response = self.client.post(reverse('rest_logout'))
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get(user_detail_url)
+        self.assertEqual(response.status_code, 401)
+
+    def test_password_change(self):
+        self.get_token_queries()
+
+        response = self.client.post(reverse('rest_password_change'), {'old_password': '12345abcde', 'new_password1': 'a new password 1', 'new_password2': 'a new password 1'})
+        self.assertEqual(response.status_code, 200)
+
+        # the token is still valid, and its user is read again with their new password
+        self.assertEqual(len(self.get_token_queries()), 1)
+        self.assertTrue(CustomUser.objects.get(pk=self.user.pk).check_password('a new password 1'))
+
+    def test_user_deleted(self):
+        self.get_token_queries()
+
+        self.user.delete()
+
+        response = self.client.get(user_detail_url)
+        self.assertEqual(response.status_code, 401)
+
+    def test_stats(self):
+        self.get_token_queries()
+
+        response = self.client.get(reverse('tokencachestats'))
+        self.assertEqual(response.status_code, 403)
+
+        # saving the user replaces their cached copy
+        self.user.is_staff = True
+        self.user.save()
+
+        response = self.client.get(reverse('tokencachestats'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('hit_rate', response.data)
+
+        response = self.client.delete(reverse('tokencachestats'))
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(token_cache_stats.as_dict()['misses'], 0)
+
+class LocalTokenCacheTest(SimpleTestCase):
+    @override_settings(USERS_TOKEN_CACHE_SIZE=2)
+    def test_least_recently_used(self):
+        tokens = LocalTokenCache()
+        tokens.set('a', b'1')
+        tokens.set('b', b'2')
+        tokens.get('a')
+        tokens.set('c', b'3')
+
+        self.assertEqual(len(tokens), 2)
+        self.assertIsNone(tokens.get('b'))
+        self.assertEqual(tokens.get('a'), b'1')
+        self.assertEqual(tokens.get('c'), b'3')
+
+    @override_settings(USERS_TOKEN_CACHE_LOCAL_TIMEOUT=10)
+    def test_expires(self):
+        tokens = LocalTokenCache()
+
+        with mock.patch('users.authentication.time.monotonic', return_value=100):
+            tokens.set('a', b'1')
+
+        with mock.patch('users.authentication.time.monotonic', return_value=109):
+            self.assertEqual(tokens.get('a'), b'1')
+
+        with mock.patch('users.authentication.time.monotonic', return_value=110):
+            self.assertIsNone(tokens.get('a'))
+
+        self.assertEqual(len(tokens), 0)
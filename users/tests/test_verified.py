@@ -0,0 +1,96 @@
+"""
+Test the cached status of users' email addresses
+"""
+
+from allauth.account.models import EmailAddress
+from allauth.account.signals import email_confirmed
+from django.db import connection
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITransactionTestCase
+from users.models import CustomUser
+from users.verified import get_cache, get_verified_key, is_email_verified
+from toptenlists.models import TopTenList
+
+# disable throttling for testing
+from toptenlists.api import TopTenListViewSet
+
+TopTenListViewSet.throttle_classes = ()
+
+class Request(object):
+    pass
+
+class VerifiedEmailTest(TransactionTestCase):
+    """
+    Statuses are only cached when a transaction commits, so these tests commit
+    """
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('Test user', 'person@example.com', '12345')
+        self.email_address = EmailAddress.objects.create(user=self.user, email='person@example.com', primary=True, verified=False)
+
+    def test_cached(self):
+        self.assertFalse(is_email_verified(self.user))
+
+        with self.assertNumQueries(0):
+            self.assertFalse(is_email_verified(self.user))
+
+    def test_request(self):
+        """
+        The status is kept for the request even if the cache is emptied
+        """
+        request = Request()
+        self.assertFalse(is_email_verified(self.user, request))
+        get_cache().clear()
+
+        with self.assertNumQueries(0):
+            self.assertFalse(is_email_verified(self.user, request))
+
+    def test_confirmed(self):
+        self.assertFalse(is_email_verified(self.user))
+
+        # allauth marks the address verified, then sends email_confirmed
+        EmailAddress.objects.filter(pk=self.email_address.pk).update(verified=True)
+        email_confirmed.send(sender=EmailAddress, request=None, email_address=self.email_address)
+
+        self.assertTrue(is_email_verified(self.user))
+
+    def test_saved(self):
+        self.assertFalse(is_email_verified(self.user))
+
+        self.email_address.verified = True
+        self.email_address.save()
+
+        self.assertTrue(is_email_verified(self.user))
+
+        self.email_address.delete()
+
+        self.assertIsNone(is_email_verified(self.user))
+        self.assertIsNone(get_cache().get(get_verified_key(self.user.id)))
+
+class VerifiedEmailRequestTest(APITransactionTestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('Test user', 'person@example.com', '12345')
+        EmailAddress.objects.create(user=self.user, email='person@example.com', primary=True, verified=True)
+        self.client.force_authenticate(user=self.user)
+
+    def test_write_request(self):
+        """
+        Once the status is cached, a write request does not read the user's email address
+        """
+        url = reverse('topTenLists:TopTenLists-list')
+        data = {'name': 'Writers', 'description': '', 'topTenItem': [{'name': '', 'description': '', 'order': order} for order in range(1, 11)]}
+
+        self.client.post(url, data, format='json')
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(url, data, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(TopTenList.objects.count(), 2)
+        self.assertFalse([query for query in context.captured_queries if 'account_emailaddress' in query['sql']])
+
+    def test_user_details(self):
+        response = self.client.get(reverse('rest_user_details'))
+
+        self.assertTrue(response.data['email_verified'])
@@ -5,4 +5,5 @@ from . import api
 
 urlpatterns = [
     path('', api.UserListView.as_view(), name='UsersPath'),
+    path('tokencachestats/', api.TokenCacheStatsView.as_view(), name='tokencachestats'),
 ]
\ No newline at end of file
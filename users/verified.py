@@ -0,0 +1,84 @@
+"""
+Whether a user's email address is verified, without reading EmailAddress on every request
+
+The status is kept for the request, so the permission check and the serializers that ask again during the same
+request share one lookup, and in the USERS_CACHE cache for later requests. The cached status is deleted when
+an email address is confirmed, saved or deleted, see signals.py, and expires after USERS_VERIFIED_EMAIL_TIMEOUT seconds.
+"""
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from allauth.account.models import EmailAddress
+
+def get_cache():
+    return caches[getattr(settings, 'USERS_CACHE', 'default')]
+
+def get_verified_key(user_id):
+    return 'user:email_verified:%s' % user_id
+
+def read_email_verified(user_id):
+    """
+    True or False from the user's email address, or None if they have none
+    A user with more than one email address is not treated as verified, as before
+    """
+    verified = list(EmailAddress.objects.filter(user_id=user_id).values_list('verified', flat=True)[:2])
+
+    if len(verified) == 0:
+        return None
+
+    return len(verified) == 1 and verified[0]
+
+def cache_email_verified(key, verified):
+    """
+    A status read in a transaction is cached when the transaction commits, because it may have been read
+    from a change to the email address that is then rolled back
+    """
+    def set_status():
+        get_cache().set(key, verified, getattr(settings, 'USERS_VERIFIED_EMAIL_TIMEOUT', 3600))
+
+    transaction.on_commit(set_status)
+
+def is_email_verified(user, request=None):
+    """
+    Whether the user's email address is verified, or None if they have none
+    Pass the request to share the answer with anything else that asks during the same request
+    """
+    if user is None or not user.is_authenticated:
+        return None
+
+    statuses = None
+
+    if request is not None:
+        statuses = getattr(request, '_email_verified', None)
+
+        if statuses is None:
+            statuses = request._email_verified = {}
+
+        elif user.id in statuses:
+            return statuses[user.id]
+
+    key = get_verified_key(user.id)
+    verified = get_cache().get(key)
+
+    if verified is None:
+        verified = read_email_verified(user.id)
+
+        # a user without an email address is not cached, so the address is found as soon as it is added
+        if verified is not None:
+            cache_email_verified(key, verified)
+
+    if statuses is not None:
+        statuses[user.id] = verified
+
+    return verified
+
+def invalidate_email_verified(user_id):
+    """
+    Forget the user's cached status now, and again when the transaction commits
+    so that a status read before the change was committed is not kept
+    """
+    key = get_verified_key(user_id)
+
+    get_cache().delete(key)
+    transaction.on_commit(lambda: get_cache().delete(key))